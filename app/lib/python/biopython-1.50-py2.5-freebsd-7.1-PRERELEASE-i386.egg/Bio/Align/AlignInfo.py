@@ -25,6 +25,12 @@ from Bio.Alphabet import IUPAC
 from Bio.Seq import Seq
 from Bio.SubsMat import FreqTable
 
+try :
+    import numpy
+except ImportError :
+    #Only used to speed up the summaries of large alignments
+    numpy = None
+
 # Expected random distributions for 20-letter protein, and
 # for 4-letter nucleotide alphabets
 Protein20Random = 0.05
@@ -43,6 +49,66 @@ class SummaryInfo:
         self.alignment = alignment
         self.ic_vector = {}
 
+    def _get_array(self) :
+        """Returns the character array of the alignment, or None (PRIVATE).
+
+        This is None if NumPy is not available, or if the alignment does
+        not provide one (see Bio.Align.Generic.Alignment._get_array).
+        """
+        if numpy is None or not hasattr(self.alignment, "_get_array") :
+            return None
+        return self.alignment._get_array()
+
+    def _get_letters_used(self, array) :
+        """Returns a string of the letters found in a character array (PRIVATE).
+
+        The zero bytes padding short sequences are not included.
+        """
+        counts = numpy.bincount(array.ravel(), minlength = 256)
+        counts[0] = 0
+        return "".join([chr(code) for code in numpy.flatnonzero(counts)])
+
+    def _get_weighted_counts(self, letters) :
+        """Returns the weighted letter counts of each column (PRIVATE).
+
+        As in the loops over the records, a sequence without a 'weight'
+        annotation counts as 1, and if all the weights are integers the
+        counts are returned as integers.
+        """
+        counts = self.alignment.get_column_counts(letters, weighted = True)
+        for record in self.alignment._records :
+            if not isinstance(record.annotations.get('weight', 1), (int, long)) :
+                return counts
+        return numpy.rint(counts).astype(int)
+
+    def _array_consensus(self, threshold, ambiguous, require_multiple,
+                         skip) :
+        """Returns a consensus string computed with NumPy, or None (PRIVATE).
+
+        Arguments as for dumb_consensus, plus:
+        o skip - characters not counted (e.g. gaps)
+        """
+        array = self._get_array()
+        if array is None :
+            return None
+        letters = [letter for letter in self._get_letters_used(array) \
+                   if letter not in skip]
+        if not letters :
+            return ambiguous * array.shape[1]
+        counts = self.alignment.get_column_counts("".join(letters))
+        num_atoms = counts.sum(axis = 0)
+        max_size = counts.max(axis = 0)
+        # a single most common letter, over the threshold
+        ok = (max_size > 0) & ((counts == max_size).sum(axis = 0) == 1)
+        ok &= max_size / numpy.maximum(num_atoms, 1) >= threshold
+        if require_multiple :
+            ok &= (num_atoms != 1)
+        best = numpy.array(letters)[counts.argmax(axis = 0)]
+        consensus = [ambiguous] * array.shape[1]
+        for n in numpy.flatnonzero(ok) :
+            consensus[n] = best[n]
+        return "".join(consensus)
+
     def dumb_consensus(self, threshold = .7, ambiguous = "X",
                        consensus_alpha = None, require_multiple = 0):
         """Output a fast consensus sequence of the alignment.
@@ -69,6 +135,13 @@ class SummaryInfo:
         not just 1 sequence and gaps).
         """
         # Iddo Friedberg, 1-JUL-2004: changed ambiguous default to "X"
+        consensus = self._array_consensus(threshold, ambiguous,
+                                          require_multiple, "-.")
+        if consensus is not None :
+            if consensus_alpha is None:
+                consensus_alpha = self._guess_consensus_alphabet(ambiguous)
+            return Seq(consensus, consensus_alpha)
+
         consensus = ''
 
         # find the length of the consensus we are creating
@@ -126,6 +199,14 @@ class SummaryInfo:
 	it takes the same is input.
         """
         # Iddo Friedberg, 1-JUL-2004: changed ambiguous default to "X"
+        consensus = self._array_consensus(threshold, ambiguous,
+                                          require_multiple, "")
+        if consensus is not None :
+            if consensus_alpha is None:
+                #TODO - Should we make this into a Gapped alphabet?
+                consensus_alpha = self._guess_consensus_alphabet(ambiguous)
+            return Seq(consensus, consensus_alpha)
+
         consensus = ''
 
         # find the length of the consensus we are creating
@@ -402,6 +483,20 @@ class SummaryInfo:
         else:
             left_seq = self.dumb_consensus()
 
+        array = self._get_array()
+        if array is not None :
+            # count all the columns at once
+            for letter in self._get_letters_used(array[:, :len(left_seq)]) :
+                if letter not in all_letters and letter not in chars_to_ignore :
+                    raise ValueError("Residue %s not found in alphabet %s"
+                                     % (letter, self.alignment._alphabet))
+            counts = self._get_weighted_counts(all_letters)
+            pssm_info = []
+            for residue_num, column in enumerate(counts.T.tolist()[:len(left_seq)]) :
+                pssm_info.append((left_seq[residue_num],
+                                  dict(zip(all_letters, column))))
+            return PSSM(pssm_info)
+
         pssm_info = []
         # now start looping through all of the sequences and getting info
         for residue_num in range(len(left_seq)):
@@ -498,18 +593,22 @@ class SummaryInfo:
         for char in chars_to_ignore:
             all_letters = all_letters.replace(char, '')
 
-        info_content = {}
-        for residue_num in range(start, end):
-            freq_dict = self._get_letter_freqs(residue_num,
-                                               self.alignment._records,
-                                               all_letters, chars_to_ignore)
-            # print freq_dict,
-            column_score = self._get_column_info_content(freq_dict,
-                                                         e_freq_table,
-                                                         log_base,
-                                                         random_expected)
-
-            info_content[residue_num] = column_score
+        info_content = self._array_info_content(start, end, all_letters,
+                                                chars_to_ignore, e_freq_table,
+                                                log_base, random_expected)
+        if info_content is None :
+            info_content = {}
+            for residue_num in range(start, end):
+                freq_dict = self._get_letter_freqs(residue_num,
+                                                   self.alignment._records,
+                                                   all_letters, chars_to_ignore)
+                # print freq_dict,
+                column_score = self._get_column_info_content(freq_dict,
+                                                             e_freq_table,
+                                                             log_base,
+                                                             random_expected)
+
+                info_content[residue_num] = column_score
         # sum up the score
         total_info = 0
         for column_info in info_content.values():
@@ -519,6 +618,60 @@ class SummaryInfo:
             self.ic_vector[i] = info_content[i]
         return total_info
 
+    def _array_info_content(self, start, end, letters, to_ignore,
+                            e_freq_table, log_base, random_expected) :
+        """Calculate the information content of columns with NumPy (PRIVATE).
+
+        Returns a dictionary of the information content of each column
+        from start to end, as computed by _get_letter_freqs and
+        _get_column_info_content, or None if this cannot be done with
+        NumPy (or if some sequences are too short, which the loop over the
+        records will report).
+        """
+        array = self._get_array()
+        if array is None or end > array.shape[1] :
+            return None
+        for letter in self._get_letters_used(array[:, start:end]) :
+            if letter not in letters and letter not in to_ignore :
+                raise ValueError("Residue %s not found in alphabet %s"
+                                 % (letter, self.alignment._alphabet))
+        if not array[:, start:end].all() :
+            return None
+        try :
+            gap_char = self.alignment._alphabet.gap_char
+        except AttributeError :
+            gap_char = "-"
+        # the expected frequencies (zero for the gap, which is not scored)
+        expected = numpy.zeros(len(letters), float)
+        for i, letter in enumerate(letters) :
+            if letter == gap_char :
+                continue
+            if e_freq_table :
+                if letter not in e_freq_table :
+                    raise ValueError("Expected frequency letters %s do not "
+                                     "match observed %s"
+                                     % (e_freq_table.keys(), list(letters)))
+                expected[i] = e_freq_table[letter]
+            else :
+                expected[i] = random_expected
+        counts = self._get_weighted_counts(letters)[:, start:end]
+        total = counts.sum(axis = 0)
+        # columns of only ignored characters have zero frequencies
+        total[total == 0] = 1
+        if counts.dtype.kind == "i" :
+            # integer division, as in _get_letter_freqs
+            freqs = counts // total
+        else :
+            freqs = counts / total
+        scored = expected > 0
+        inner = freqs[scored] / expected[scored][:, None]
+        positive = inner > 0
+        info = numpy.zeros(inner.shape, float)
+        info[positive] = freqs[scored][positive] * numpy.log(inner[positive]) \
+                         / math.log(log_base)
+        column_scores = info.sum(axis = 0).tolist()
+        return dict(zip(range(start, end), column_scores))
+
     def _get_letter_freqs(self, residue_num, all_records, letters, to_ignore):
         """Determine the frequency of specific letters in the alignment.
 
@@ -18,6 +18,15 @@ from Bio.Seq import Seq
 from Bio.SeqRecord import SeqRecord
 from Bio import Alphabet
 
+try :
+    import numpy
+except ImportError :
+    #Only used to speed up column access and the summaries in AlignInfo
+    numpy = None
+
+#Number of rows counted at a time by get_column_counts
+_COUNT_BLOCK = 1000
+
 class Alignment:
     """Represent a set of alignments.
 
@@ -49,6 +58,9 @@ class Alignment:
         self._alphabet = alphabet
         # hold everything at a list of SeqRecord objects
         self._records = []
+        # character matrix of the sequences, built when needed
+        self._array = None
+        self._array_seqs = None
 
     def _str_line(self, record) :
         """Returns a truncated string representation of a SeqRecord (PRIVATE).
@@ -315,6 +327,89 @@ class Alignment:
 
         self._records.append(new_record)
         
+    def _get_array(self) :
+        """Returns the alignment as a 2D array of characters (PRIVATE).
+
+        The array (of unsigned bytes, with one row for each sequence) is
+        built the first time it is needed, and kept until the records or
+        their sequences are replaced (or change length).  Shorter sequences
+        are padded with zero bytes.  Returns None if NumPy is not available.
+
+        The same array is returned each time, so it should not be modified.
+        """
+        if numpy is None :
+            return None
+        seqs = [(record.seq, len(record.seq)) for record in self._records]
+        old_seqs = getattr(self, "_array_seqs", None)
+        if old_seqs is not None and len(old_seqs) == len(seqs) :
+            for (old, old_length), (seq, length) in zip(old_seqs, seqs) :
+                if old is not seq or old_length != length :
+                    break
+            else :
+                return self._array
+        max_length = 0
+        for seq, length in seqs :
+            if length > max_length :
+                max_length = length
+        text = "".join([str(seq).ljust(max_length, "\0") \
+                        for seq, length in seqs])
+        self._array = numpy.fromstring(text, numpy.uint8)
+        self._array.shape = (len(seqs), max_length)
+        self._array_seqs = seqs
+        return self._array
+
+    def get_column_counts(self, letters, weighted = False) :
+        """Returns the number of times each letter occurs in each column.
+
+        Arguments:
+        o letters - A string of the letters to count.
+        o weighted - If True, each sequence counts with its weight (the
+        'weight' annotation set by add_sequence, by default 1) instead of 1.
+
+        Returns a NumPy array with a row for each letter and a column for
+        each column of the alignment (i.e. of len(letters) by
+        get_alignment_length()).  Requires NumPy.
+
+        >>> from Bio.Alphabet import IUPAC, Gapped
+        >>> align = Alignment(Gapped(IUPAC.unambiguous_dna, "-"))
+        >>> align.add_sequence("Alpha", "ACTGCTAGCTAG")
+        >>> align.add_sequence("Beta",  "ACT-CTAGCTAG")
+        >>> align.add_sequence("Gamma", "ACTGCTAGATAG")
+        >>> counts = align.get_column_counts("ACGT-")
+        >>> for letter, row in zip("ACGT-", counts[:, :4].tolist()) :
+        ...     print letter, row
+        A [3.0, 0.0, 0.0, 0.0]
+        C [0.0, 3.0, 0.0, 0.0]
+        G [0.0, 0.0, 0.0, 2.0]
+        T [0.0, 0.0, 3.0, 0.0]
+        - [0.0, 0.0, 0.0, 1.0]
+        """
+        if numpy is None :
+            raise ImportError("NumPy is required for get_column_counts")
+        array = self._get_array()
+        rows, length = array.shape
+        #Letters which are not counted all get the last code
+        codes = numpy.zeros(256, numpy.intp) + len(letters)
+        for i, letter in enumerate(letters) :
+            codes[ord(letter)] = i
+        size = (len(letters) + 1) * length
+        counts = numpy.zeros(size, float)
+        if weighted :
+            weights = numpy.array([record.annotations.get('weight', 1) \
+                                   for record in self._records], float)
+        offsets = numpy.arange(length)
+        #Count a block of rows at a time, to limit the memory used
+        for start in range(0, rows, _COUNT_BLOCK) :
+            block = codes[array[start:start + _COUNT_BLOCK]] * length + offsets
+            if weighted :
+                block_weights = numpy.repeat(weights[start:start + _COUNT_BLOCK],
+                                             length)
+                counts += numpy.bincount(block.ravel(), block_weights, size)
+            else :
+                counts += numpy.bincount(block.ravel(), None, size)
+        counts.shape = (len(letters) + 1, length)
+        return counts[:-1]
+
     def get_column(self,col):
         """Returns a string containing a given column.
 
@@ -332,6 +427,13 @@ class Alignment:
         #TODO - Support negative indices?
         col_str = ''
         assert col >= 0 and col <= self.get_alignment_length()
+        array = self._get_array()
+        if array is not None and col < array.shape[1] :
+            column = array[:, col]
+            if column.all() :
+                return column.tostring()
+        #Without NumPy, or if some sequences are too short (which raises
+        #an IndexError)
         for rec in self._records:
             col_str += rec.seq[col]
         return col_str
@@ -390,8 +492,27 @@ class Alignment:
         ACT-CTAGCTAG Beta
         ACTGCTAGCTAG Alpha
 
-        Right now, these are the ONLY indexing operations supported.  The use of
-        a second column based index is under discussion for a future update.
+        You can also use two indices to specify both rows and columns. Using
+        simple integers gives you the entry as a single character string. e.g.
+
+        >>> align[3, 4]
+        'C'
+
+        Using a slice (or all rows) with a single column index gives a string
+        of the letters in that column:
+
+        >>> align[:, 3]
+        'G-GGG'
+        >>> align[1:3, 3]
+        '-G'
+
+        And using slices for the columns gives a sub-alignment, made of the
+        sliced SeqRecord objects:
+
+        >>> print align[1:3, 4:8]
+        Gapped(IUPACUnambiguousDNA(), '-') alignment with 2 rows and 4 columns
+        CTAG Beta
+        CTAG Gamma
         """
         if isinstance(index, int) :
             #e.g. result = align[x]
@@ -406,8 +527,26 @@ class Alignment:
             sub_align._records = self._records[index]
             return sub_align
         elif len(index)==2 :
-            raise TypeError("Row and Column indexing is not currently supported,"\
-                            +"but may be in future.")
+            row_index, col_index = index
+            if isinstance(row_index, int) :
+                #e.g. result = align[x, y] or align[x, y:z]
+                return self._records[row_index][col_index]
+            elif isinstance(col_index, int) :
+                #e.g. column = align[:, y]
+                array = self._get_array()
+                if array is not None and -array.shape[1] <= col_index \
+                and col_index < array.shape[1] :
+                    column = array[row_index, col_index]
+                    if column.all() :
+                        return column.tostring()
+                return "".join([rec.seq[col_index] \
+                                for rec in self._records[row_index]])
+            else :
+                #e.g. sub_align = align[:, y:z]
+                sub_align = Alignment(self._alphabet)
+                sub_align._records = [rec[col_index] \
+                                      for rec in self._records[row_index]]
+                return sub_align
         else :
             raise TypeError("Invalid index type.")
 
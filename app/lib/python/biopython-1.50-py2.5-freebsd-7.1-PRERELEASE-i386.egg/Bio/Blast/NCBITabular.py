@@ -0,0 +1,251 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+"""Streaming reader for tabular BLAST output (requires NumPy).
+
+This reads the 12 column tab separated output of the NCBI BLAST programs,
+from blastall -m 8 (or -m 9, with comment lines, which are skipped):
+
+query id, subject id, % identity, alignment length, mismatches,
+gap openings, query start, query end, subject start, subject end,
+e-value, bit score
+
+Rather than creating an object for each line (as Bio.Blast.ParseBlastTable
+does), the lines are read a chunk at a time and each column is converted
+into a NumPy array in one go.  A chunk is held in a HitTable object.
+
+Functions:
+parse_chunks    Iterator returning a HitTable for each chunk of lines.
+parse           Iterator returning a (query id, HitTable) tuple for
+                each query, without holding the whole file in memory.
+top_hits        As parse, but keeping only the best N hits of each query.
+
+e.g.
+
+>>> from StringIO import StringIO
+>>> from Bio.Blast import NCBITabular
+>>> handle = StringIO(
+... "# BLASTP 2.2.18 [Mar-02-2008]\\n"
+... "q1\\ts1\\t100.00\\t50\\t0\\t0\\t1\\t50\\t1\\t50\\t1e-20\\t95.5\\n"
+... "q1\\ts2\\t80.00\\t50\\t10\\t0\\t1\\t50\\t5\\t54\\t1e-10\\t60.1\\n"
+... "q2\\ts3\\t90.00\\t40\\t4\\t0\\t3\\t42\\t1\\t40\\t1e-15\\t80.2\\n")
+>>> for query, table in NCBITabular.parse(handle) :
+...     print query, len(table), table.subject.tolist(), table.bitscore.tolist()
+q1 2 ['s1', 's2'] [95.5, 60.1]
+q2 1 ['s3'] [80.2]
+"""
+
+import numpy
+
+#The columns of the table, with their types
+COLUMNS = [("query", "S"),
+           ("subject", "S"),
+           ("identity", float),
+           ("length", numpy.int32),
+           ("mismatches", numpy.int32),
+           ("gap_opens", numpy.int32),
+           ("query_start", numpy.int32),
+           ("query_end", numpy.int32),
+           ("subject_start", numpy.int32),
+           ("subject_end", numpy.int32),
+           ("evalue", float),
+           ("bitscore", float)]
+
+_NAMES = [name for name, type in COLUMNS]
+
+class HitTable :
+    """A block of tabular BLAST results, held as one array per column.
+
+    Attributes (all arrays of the same length, one entry per line):
+    query, subject - string arrays of the query and subject ids
+    identity       - percent identity
+    length         - alignment length
+    mismatches     - number of mismatches
+    gap_opens      - number of gap openings
+    query_start, query_end, subject_start, subject_end - coordinates
+                     of the alignment (one-offset)
+    evalue         - expect value
+    bitscore       - bit score
+
+    Indexing a HitTable with an integer, a slice, a boolean mask or an
+    array of indices returns a new HitTable with the selected rows.
+    """
+    def __init__(self, columns=None) :
+        """Create a table from a dictionary of column arrays (or an empty one).
+        """
+        for name, type in COLUMNS :
+            if columns is None :
+                setattr(self, name, numpy.zeros(0, type))
+            else :
+                setattr(self, name, columns[name])
+
+    def __len__(self) :
+        return len(self.query)
+
+    def __repr__(self) :
+        return "<HitTable of %i hits>" % len(self)
+
+    def __getitem__(self, index) :
+        if isinstance(index, int) :
+            index = slice(index, index + 1 or None)
+        columns = {}
+        for name in _NAMES :
+            columns[name] = getattr(self, name)[index]
+        return HitTable(columns)
+
+    def queries(self) :
+        """Returns the query ids, in order, without repeats."""
+        return self.query[_group_starts(self.query)].tolist()
+
+    def top(self, n=1, key="bitscore") :
+        """Returns a HitTable with the best n hits of each query.
+
+        n   - maximum number of hits to keep for each query
+        key - column to rank the hits by, "bitscore" (largest first) or
+              "evalue" (smallest first), or any other column name (largest
+              first)
+
+        The rows of each query are assumed to be next to each other (as
+        in the BLAST output).  Within each query the hits are sorted by
+        the key, keeping the original order for equal values.
+        """
+        if not len(self) :
+            return self
+        starts = _group_starts(self.query)
+        group = numpy.zeros(len(self), int)
+        group[starts[1:]] = 1
+        group = numpy.cumsum(group)
+        values = getattr(self, key)
+        if key != "evalue" :
+            values = -values
+        #lexsort is stable, so equal scores stay in their file order
+        order = numpy.lexsort((values, group))
+        rank = numpy.arange(len(self)) - starts[group[order]]
+        return self[order[rank < n]]
+
+    def to_list(self) :
+        """Returns the rows as a list of tuples (in the column order)."""
+        return zip(*[getattr(self, name).tolist() for name in _NAMES])
+
+def _group_starts(query) :
+    """Returns the index of the first row of each run of a query (PRIVATE)."""
+    if not len(query) :
+        return numpy.zeros(0, int)
+    return numpy.concatenate(([0], numpy.flatnonzero(query[1:] != query[:-1]) + 1))
+
+def _concatenate(tables) :
+    """Joins a list of HitTable objects into one (PRIVATE)."""
+    if len(tables) == 1 :
+        return tables[0]
+    columns = {}
+    for name in _NAMES :
+        columns[name] = numpy.concatenate([getattr(t, name) for t in tables])
+    return HitTable(columns)
+
+def _convert(lines) :
+    """Turns a list of lines into a HitTable (PRIVATE)."""
+    words = "".join(lines).split()
+    if len(words) != 12 * len(lines) :
+        #Find the bad line to give a helpful error
+        for line in lines :
+            if len(line.split()) != 12 :
+                raise ValueError("Expected 12 columns, got %i in line:\n%s" \
+                                 % (len(line.split()), line))
+    columns = {}
+    for i, (name, type) in enumerate(COLUMNS) :
+        if type == "S" :
+            columns[name] = numpy.array(words[i::12], "S")
+            continue
+        #Much faster than converting an array of strings
+        values = numpy.fromstring(" ".join(words[i::12]), type, sep=" ")
+        if len(values) != len(lines) :
+            #Not all numbers, this will raise a ValueError
+            values = numpy.array(words[i::12], type)
+        columns[name] = values
+    return HitTable(columns)
+
+def parse_chunks(handle, chunk_size=100000) :
+    """Iterator returning the results a chunk of lines at a time.
+
+    handle     - handle to the tabular BLAST output (-m 8 or -m 9)
+    chunk_size - number of lines to read at a time
+
+    Returns HitTable objects of (at most) chunk_size rows.  Comment lines
+    (starting with #) and blank lines are skipped.
+    """
+    while True :
+        lines = handle.readlines(chunk_size * 100)
+        if not lines :
+            break
+        lines = [line for line in lines if line[:1] != "#" and line.strip()]
+        for start in xrange(0, len(lines), chunk_size) :
+            yield _convert(lines[start:start + chunk_size])
+
+def parse(handle, chunk_size=100000) :
+    """Iterator returning the results of each query in turn.
+
+    handle     - handle to the tabular BLAST output (-m 8 or -m 9)
+    chunk_size - number of lines to read at a time
+
+    Returns tuples of the query id and a HitTable of its hits.  The lines
+    of each query are assumed to be next to each other (as in the BLAST
+    output), and only the current chunk and the hits of the current query
+    are held in memory.  Queries without any hits are not included.
+    """
+    pending = []
+    for table in parse_chunks(handle, chunk_size) :
+        starts = _group_starts(table.query)
+        if pending and pending[-1].query[-1] != table.query[0] :
+            query = pending[0].query[0]
+            yield str(query), _concatenate(pending)
+            pending = []
+        bounds = starts.tolist() + [len(table)]
+        #The last query may continue in the next chunk
+        if len(bounds) > 2 :
+            if pending :
+                pending.append(table[0:bounds[1]])
+                yield str(pending[0].query[0]), _concatenate(pending)
+                pending = []
+            else :
+                yield str(table.query[0]), table[0:bounds[1]]
+            for start, end in zip(bounds[1:-2], bounds[2:-1]) :
+                yield str(table.query[start]), table[start:end]
+        pending.append(table[bounds[-2]:bounds[-1]])
+    if pending :
+        yield str(pending[0].query[0]), _concatenate(pending)
+
+def top_hits(handle, n=1, key="bitscore", chunk_size=100000) :
+    """Iterator returning the best n hits of each query in turn.
+
+    handle     - handle to the tabular BLAST output (-m 8 or -m 9)
+    n          - maximum number of hits to keep for each query
+    key        - column to rank the hits by (see HitTable.top)
+    chunk_size - number of lines to read at a time
+
+    Returns tuples of the query id and a HitTable of its best hits.  The
+    ranking is done for a whole chunk at once, rather than query by query.
+    """
+    pending = None
+    for table in parse_chunks(handle, chunk_size) :
+        if pending is not None :
+            table = _concatenate([pending, table])
+        table = table.top(n, key)
+        starts = _group_starts(table.query)
+        bounds = starts.tolist() + [len(table)]
+        for start, end in zip(bounds[:-2], bounds[1:-1]) :
+            yield str(table.query[start]), table[start:end]
+        #The last query may continue in the next chunk, but at most
+        #n of its hits need to be kept
+        pending = table[bounds[-2]:]
+    if pending is not None and len(pending) :
+        yield str(pending.query[0]), pending
+
+def _test():
+    """Run the Bio.Blast.NCBITabular module's doctests."""
+    print "Runing doctests..."
+    import doctest
+    doctest.testmod()
+    print "Done"
+
+if __name__ == "__main__":
+    _test()
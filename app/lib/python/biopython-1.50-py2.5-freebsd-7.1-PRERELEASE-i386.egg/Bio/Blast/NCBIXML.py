@@ -23,6 +23,10 @@ parse               Incremental parser, this is an iterator that returns
 from Bio.Blast import Record
 import xml.sax
 from xml.sax.handler import ContentHandler
+from collections import deque
+
+#Size of the blocks read from the handle by the parse function
+_BLOCK = 1048576
 
 class _XMLparser(ContentHandler):
     """Generic SAX Parser
@@ -30,6 +34,11 @@ class _XMLparser(ContentHandler):
     Just a very basic SAX parser.
 
     Redefine the methods startElement, characters and endElement.
+
+    The _start_TAG and _end_TAG methods of subclasses are looked up
+    once for each tag name, and kept in a dispatch table (a dictionary
+    mapping the tag name to the bound method, or to None if there is no
+    such method).
     """
     def __init__(self, debug=0):
         """Constructor
@@ -40,6 +49,8 @@ class _XMLparser(ContentHandler):
         self._value = ''
         self._debug = debug
         self._debug_ignore_list = []
+        self._start_methods = {}
+        self._end_methods = {}
 
     def _secure_name(self, name):
         """Removes 'dangerous' from tag names
@@ -61,21 +72,40 @@ class _XMLparser(ContentHandler):
         self._tag.append(name)
         
         # Try to call a method (defined in subclasses)
-        method = self._secure_name('_start_' + name)
-
-        #Note could use try / except AttributeError
-        #BUT I found often triggered by nested errors...
-        if hasattr(self, method) :
-            eval("self.%s()" % method)
+        try :
+            method = self._start_methods[name]
+        except KeyError :
+            method = self._find_method('_start_', name, self._start_methods)
+        if method is not None :
+            method()
             if self._debug > 4 :
-                print "NCBIXML: Parsed:  " + method
-        else :
+                print "NCBIXML: Parsed:  " + method.__name__
+        elif self._debug :
             # Doesn't exist (yet)
+            method = self._secure_name('_start_' + name)
             if method not in self._debug_ignore_list :
                 if self._debug > 3 :
                     print "NCBIXML: Ignored: " + method
                 self._debug_ignore_list.append(method)
 
+    def _find_method(self, prefix, name, methods):
+        """Look up the method for a tag, and add it to the dispatch table
+
+        prefix -- '_start_' or '_end_'
+
+        name -- name of the tag
+
+        methods -- the dispatch table (dictionary) to update
+        """
+        method = self._secure_name(prefix + name)
+        #Note could use try / except AttributeError
+        #BUT I found often triggered by nested errors...
+        if hasattr(self, method) :
+            methods[name] = getattr(self, method)
+        else :
+            methods[name] = None
+        return methods[name]
+
     def characters(self, ch):
         """Found some text
 
@@ -92,15 +122,17 @@ class _XMLparser(ContentHandler):
         self._value = self._value.strip()
         
         # Try to call a method (defined in subclasses)
-        method = self._secure_name('_end_' + name)
-        #Note could use try / except AttributeError
-        #BUT I found often triggered by nested errors...
-        if hasattr(self, method) :
-            eval("self.%s()" % method)
+        try :
+            method = self._end_methods[name]
+        except KeyError :
+            method = self._find_method('_end_', name, self._end_methods)
+        if method is not None :
+            method()
             if self._debug > 2 :
-                print "NCBIXML: Parsed:  " + method, self._value
-        else :
+                print "NCBIXML: Parsed:  " + method.__name__, self._value
+        elif self._debug :
             # Doesn't exist (yet)
+            method = self._secure_name('_end_' + name)
             if method not in self._debug_ignore_list :
                 if self._debug > 1 :
                     print "NCBIXML: Ignored: " + method, self._value
@@ -117,13 +149,20 @@ class BlastParser(_XMLparser):
     _end_TAG        called when the end tag is found
     """
 
-    def __init__(self, debug=0):
+    def __init__(self, debug=0, hits_only=False):
         """Constructor
 
         debug - integer, amount of debug information to print
+        hits_only - boolean, if True the alignment strings of the HSPs
+                    (query, sbjct and match) are not stored, and are
+                    left empty
         """
         # Calling superclass method
         _XMLparser.__init__(self, debug)
+        if hits_only :
+            # The (often long) alignment strings are skipped
+            for name in ('Hsp_qseq', 'Hsp_hseq', 'Hsp_midline') :
+                self._end_methods[name] = None
         
         self._parser = xml.sax.make_parser()
         self._parser.setContentHandler(self)
@@ -138,7 +177,7 @@ class BlastParser(_XMLparser):
 
     def reset(self) :
         """Reset all the data allowing reuse of the BlastParser() object"""
-        self._records = []
+        self._records = deque()
         self._header = Record.Header()
         self._parameters = Record.Parameters()
         self._parameters.filter = None #Maybe I should update the class?
@@ -549,7 +588,7 @@ class BlastParser(_XMLparser):
         """
         self._blast.ka_params = self._blast.ka_params + (float(self._value),)
     
-def read(handle, debug=0):
+def read(handle, debug=0, hits_only=False):
    """Returns a single Blast record (assumes just one query).
 
    This function is for use when there is one and only one BLAST
@@ -558,8 +597,9 @@ def read(handle, debug=0):
    Use the Bio.Blast.NCBIXML.parse() function if you expect more than
    one BLAST record (i.e. if you have more than one query sequence).
 
+   See the parse function for the hits_only option.
    """
-   iterator = parse(handle, debug)
+   iterator = parse(handle, debug, hits_only)
    try :
        first = iterator.next()
    except StopIteration :
@@ -575,11 +615,14 @@ def read(handle, debug=0):
    return first
 
 
-def parse(handle, debug=0):
+def parse(handle, debug=0, hits_only=False):
     """Returns an iterator a Blast record for each query.
 
     handle - file handle to and XML file to parse
     debug - integer, amount of debug information to print
+    hits_only - boolean, if True the alignment strings of the HSPs
+                (query, sbjct and match) are skipped, which saves time
+                and memory when only the hits and scores are needed
 
     This is a generator function that returns multiple Blast records
     objects - one for each query sequence given to blast.  The file
@@ -593,11 +636,11 @@ def parse(handle, debug=0):
     gave multiple XML files concatenated together (giving a single file
     which strictly speaking wasn't valid XML)."""
     from xml.parsers import expat
-    BLOCK = 1024
     MARGIN = 10 # must be at least length of newline + XML start
     XML_START = "<?xml"
+    NEW_XML = "\n" + XML_START
 
-    text = handle.read(BLOCK)
+    text = handle.read(_BLOCK)
     pending = ""
 
     if not text :
@@ -611,55 +654,48 @@ def parse(handle, debug=0):
                              % XML_START)
 
         expat_parser = expat.ParserCreate()
-        blast_parser = BlastParser(debug)
+        #Pass on the text between tags in one piece where possible
+        expat_parser.buffer_text = True
+        blast_parser = BlastParser(debug, hits_only)
         expat_parser.StartElementHandler = blast_parser.startElement
         expat_parser.EndElementHandler = blast_parser.endElement
         expat_parser.CharacterDataHandler = blast_parser.characters
-
-        expat_parser.Parse(text, False)
-        while blast_parser._records:
-            record = blast_parser._records[0]
-            blast_parser._records = blast_parser._records[1:]
-            yield record
+        records = blast_parser._records
 
         while True :
-            #Read in another block of the file...
-            text, pending = pending + handle.read(BLOCK), ""
-            if not text:
-                #End of the file!
-                expat_parser.Parse("", True) # End of XML record
-                break
-
-            #Now read a little bit more so we can check for the
+            #Read a little bit more so we can check for the
             #start of another XML file...
             pending = handle.read(MARGIN)
 
-            if (text+pending).find("\n" + XML_START) == -1 :
+            if (text+pending).find(NEW_XML) == -1 :
                 # Good - still dealing with the same XML file
                 expat_parser.Parse(text, False)        
-                while blast_parser._records:
-                    record = blast_parser._records[0]
-                    blast_parser._records = blast_parser._records[1:]
-                    yield record
+                while records:
+                    yield records.popleft()
             else :
                 # This is output from pre 2.2.14 BLAST,
                 # one XML file for each query!
                 
                 # Finish the old file:
-                text, pending = (text+pending).split("\n" + XML_START,1)
+                text, pending = (text+pending).split(NEW_XML,1)
                 pending = XML_START + pending
 
                 expat_parser.Parse(text, True) # End of XML record
-                while blast_parser._records:
-                    record = blast_parser._records[0]
-                    blast_parser._records = blast_parser._records[1:]
-                    yield record
+                while records:
+                    yield records.popleft()
                
                 #Now we are going to re-loop, reset the
                 #parsers and start reading the next XML file
                 text, pending = pending, ""
                 break
 
+            #Read in another block of the file...
+            text, pending = pending + handle.read(_BLOCK), ""
+            if not text:
+                #End of the file!
+                expat_parser.Parse("", True) # End of XML record
+                break
+
         #At this point we have finished the first XML record.
         #If the file is from an old version of blast, it may
         #contain more XML records (check if text=="").
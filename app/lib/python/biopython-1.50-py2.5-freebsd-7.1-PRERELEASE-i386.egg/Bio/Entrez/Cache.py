@@ -0,0 +1,97 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Persistent cache of the results returned by NCBI's Entrez Utilities.
+
+When Bio.Entrez.cache is set to a cache object, the results of each query
+are stored in it, and the same query later is answered from the cache
+without going online (or waiting to respect the NCBI's request rate
+limit). Queries are identified by the URL, with the parameters sorted and
+the tool and email parameters left out. Queries using the Entrez history
+(WebEnv) and POST requests (such as epost) are never cached, as their
+results depend on the state of the NCBI servers.
+
+Any object with get(key) and put(key, data) methods can be used as a
+cache, where get returns None for keys it does not hold. This module
+provides one using an SQLite database file:
+
+>>> from Bio import Entrez
+>>> from Bio.Entrez.Cache import SQLiteCache
+>>> Entrez.cache = SQLiteCache(":memory:", ttl=7*24*3600)
+>>> Entrez.cache
+SQLiteCache(':memory:', ttl=604800)
+
+Give the name of a file rather than ":memory:" to keep the results
+between sessions.  Set Bio.Entrez.cache back to None to go online again:
+
+>>> Entrez.cache = None
+"""
+
+import time
+try:
+    import sqlite3
+except ImportError:
+    #Python 2.4 or older, only needed for SQLiteCache
+    sqlite3 = None
+
+class SQLiteCache:
+    """Cache of Entrez results held in an SQLite database file."""
+    def __init__(self, filename, ttl=None):
+        """Open (or create) the cache.
+
+        filename - name of the database file (or ":memory:")
+        ttl - number of seconds before a result expires, or None to keep
+              the results until they are removed with clear
+        """
+        if sqlite3 is None:
+            raise ImportError("SQLiteCache needs the sqlite3 module")
+        self.filename = filename
+        self.ttl = ttl
+        self._connection = sqlite3.connect(filename)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS response"
+                                 " (key TEXT PRIMARY KEY, data BLOB,"
+                                 " created REAL)")
+        self._connection.commit()
+
+    def __repr__(self):
+        return "SQLiteCache(%s, ttl=%s)" % (repr(self.filename),
+                                            repr(self.ttl))
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM response"
+                                        ).fetchone()[0]
+
+    def get(self, key):
+        """Return the data stored for a key, or None if missing or expired."""
+        row = self._connection.execute("SELECT data, created FROM response"
+                                       " WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        data, created = row
+        if self.ttl is not None and time.time() - created > self.ttl:
+            self._connection.execute("DELETE FROM response WHERE key=?",
+                                     (key,))
+            self._connection.commit()
+            return None
+        return str(data)
+
+    def put(self, key, data):
+        """Store the data for a key (replacing any older data)."""
+        self._connection.execute("INSERT OR REPLACE INTO response"
+                                 " (key, data, created) VALUES (?, ?, ?)",
+                                 (key, sqlite3.Binary(data), time.time()))
+        self._connection.commit()
+
+    def clear(self, older_than=None):
+        """Remove all the results, or those older than a number of seconds."""
+        if older_than is None:
+            self._connection.execute("DELETE FROM response")
+        else:
+            self._connection.execute("DELETE FROM response WHERE created<?",
+                                     (time.time() - older_than,))
+        self._connection.commit()
+
+    def close(self):
+        """Close the database file."""
+        self._connection.close()
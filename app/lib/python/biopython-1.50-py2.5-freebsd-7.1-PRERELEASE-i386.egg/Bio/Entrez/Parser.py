@@ -33,11 +33,76 @@ be used directly.
 # written solution, since the number of DTDs is rather large and their
 # contents may change over time. About half the code in this parser deals
 # wih parsing the DTD, and the other half with the XML itself.
+#
+# Parsing the DTDs can take much longer than parsing a small XML file, so
+# the classification found in each DTD file is kept in a cache shared by
+# all DataHandler objects in the process, and optionally saved to a file
+# with pickle, to be used by later processes as well. Only the DTD named
+# by the XML file is taken from the cache: the modules it includes define
+# parameter entities (such as %INTEGER;) used by the rest of the DTD, so
+# they are always parsed for real while parsing a DTD.
 
 
 import os.path
+import cPickle
 from xml.parsers import expat
 
+# For each top level DTD file path, a dictionary with the modification
+# times of it and of the DTD files it includes, and a list of the (kind,
+# element name, value) declarations found in them (see DataHandler.declare).
+_dtd_cache = {}
+# Changed whenever the format of the entries changes, so that older cache
+# files are ignored
+_dtd_cache_version = 2
+# Cache files already loaded into _dtd_cache
+_dtd_cache_files = {}
+
+def load_dtd_cache(filename):
+    """Add the DTD classifications saved in a file to the cache.
+
+    Nothing is done if the file does not exist. Entries for DTD files
+    that have changed since are ignored when they are used.
+    """
+    try:
+        handle = open(filename, "rb")
+    except IOError:
+        return
+    try:
+        try:
+            version, cache = cPickle.load(handle)
+        except (ValueError, TypeError):
+            # Written by an older version, so it will be overwritten
+            version, cache = None, {}
+    finally:
+        handle.close()
+    if version != _dtd_cache_version:
+        cache = {}
+    for path, entry in cache.items():
+        if path not in _dtd_cache:
+            _dtd_cache[path] = entry
+    _dtd_cache_files[filename] = len(_dtd_cache)
+
+def _dtd_unchanged(mtimes):
+    """Check the DTD files still have the given modification times (PRIVATE)."""
+    for path, mtime in mtimes.items():
+        try:
+            if os.path.getmtime(path) != mtime:
+                return False
+        except OSError:
+            if mtime is not None:
+                return False
+    return True
+
+def save_dtd_cache(filename):
+    """Save the cached DTD classifications to a file (using pickle)."""
+    handle = open(filename, "wb")
+    try:
+        cPickle.dump((_dtd_cache_version, _dtd_cache), handle,
+                     cPickle.HIGHEST_PROTOCOL)
+    finally:
+        handle.close()
+    _dtd_cache_files[filename] = len(_dtd_cache)
+
 # The following four classes are used to add a member .attributes to integers,
 # strings, lists, and dictionaries, respectively.
 
@@ -68,7 +133,13 @@ class StructureElement(dict):
 
 class DataHandler:
 
-    def __init__(self, dtd_dir):
+    def __init__(self, dtd_dir, cache_file=None):
+        """Initialize the handler.
+
+        dtd_dir is the directory with the DTD files. If a cache_file is
+        given, the DTD classifications are read from it (once per process)
+        and written back to it whenever new DTD files have been parsed.
+        """
         self.stack = []
 	self.errors = []
 	self.integers = []
@@ -77,22 +148,110 @@ class DataHandler:
         self.dictionaries = []
         self.structures = {}
         self.items = []
+        # Default attribute values declared in DTDs taken from the cache
+        self.defaults = {}
+        # Lists collecting the declarations of the DTD files being parsed
+        self.recorders = []
+        # Modification times of the DTD files parsed for the top level DTD
+        self.dtd_mtimes = {}
         self.dtd_dir = dtd_dir
+        self.cache_file = cache_file
 
-    def run(self, handle):
-        """Set up the parser and let it parse the XML results"""
+    # Number of bytes fed to the XML parser at a time by parse
+    block_size = 65536
+
+    def _create_parser(self):
+        """Set up the XML parser (PRIVATE)."""
+        if self.cache_file and self.cache_file not in _dtd_cache_files:
+            load_dtd_cache(self.cache_file)
         self.parser = expat.ParserCreate()
         self.parser.SetParamEntityParsing(expat.XML_PARAM_ENTITY_PARSING_ALWAYS)
         self.parser.StartElementHandler = self.startElement
         self.parser.EndElementHandler = self.endElement
         self.parser.CharacterDataHandler = self.characters
         self.parser.ExternalEntityRefHandler = self.external_entity_ref_handler
-        self.parser.ParseFile(handle)
+
+    def _finish(self):
+        """Release the XML parser, and save any new DTDs (PRIVATE)."""
         self.parser = None
+        if self.cache_file \
+        and _dtd_cache_files.get(self.cache_file) != len(_dtd_cache):
+            save_dtd_cache(self.cache_file)
+
+    def run(self, handle):
+        """Set up the parser and let it parse the XML results"""
+        self._create_parser()
+        self.parser.ParseFile(handle)
+        self._finish()
         return self.object
 
+    def parse(self, handle):
+        """Set up the parser and return the records one by one (a generator).
+
+        The top level element of the XML results must be a list, such as
+        the PubmedArticleSet, GBSet or eSummaryResult. The XML is fed to the
+        parser a block at a time, and each record in the list is returned
+        as soon as it is complete. It is then removed from the list, so the
+        memory used does not grow with the number of records.
+        """
+        self._create_parser()
+        records = None
+        while True:
+            text = handle.read(self.block_size)
+            # Parse the final (empty) block with isfinal set, so that expat
+            # checks that the document is complete
+            self.parser.Parse(text, not text)
+            if records is None:
+                if self.stack:
+                    records = self.stack[0]
+                elif hasattr(self, "object"):
+                    # The whole document was in this block
+                    records = self.object
+                if records is not None \
+                and not isinstance(records, ListElement):
+                    raise ValueError("The XML file does not represent a list. Please use Entrez.read instead of Entrez.parse")
+            if records:
+                # The last record may still be open
+                if len(self.stack) > 1 and records[-1] is self.stack[1]:
+                    count = len(records) - 1
+                else:
+                    count = len(records)
+                finished = records[:count]
+                del records[:count]
+                for record in finished:
+                    yield record
+            if not text:
+                break
+        if records is None:
+            raise ValueError("The XML file does not represent a list. Please use Entrez.read instead of Entrez.parse")
+        self._finish()
+
+    def declare(self, kind, name, value=None):
+        """Store the classification of an element declared in a DTD.
+
+        kind is the name of the list the element belongs to ("errors",
+        "strings", "lists", "dictionaries" or "items"), or "structures"
+        (with the keys which can occur multiple times as the value), or
+        "defaults" for a default attribute value (with an (attribute,
+        value) tuple as the value). The declaration is also recorded for
+        the DTD files being parsed, to be cached.
+        """
+        if kind=="structures":
+            self.structures.update({name: value})
+        elif kind=="defaults":
+            self.defaults.setdefault(name, []).append(value)
+        else:
+            getattr(self, kind).append(name)
+        for recorder in self.recorders:
+            recorder.append((kind, name, value))
+
     def startElement(self, name, attrs):
         self.content = ""
+        if name in self.defaults:
+            # Expat only adds these for DTDs it has parsed itself
+            for key, value in self.defaults[name]:
+                if key not in attrs:
+                    attrs[key] = value
         if name in self.lists:
             object = ListElement()
         elif name in self.dictionaries:
@@ -183,7 +342,7 @@ class DataHandler:
         whether this element should be regarded as a string, integer, list
         dictionary, structure, or error."""
         if name.upper()=="ERROR":
-            self.errors.append(name)
+            self.declare("errors", name)
             return
         if name=='Item' and model==(expat.model.XML_CTYPE_MIXED,
                                     expat.model.XML_CQUANT_REP,
@@ -196,7 +355,7 @@ class DataHandler:
                                    ):
             # Special case. As far as I can tell, this only occurs in the
             # eSummary DTD.
-            self.items.append(name)
+            self.declare("items", name)
             return
         # First, remove ignorable parentheses around declarations
         while (model[0] in (expat.model.XML_CTYPE_SEQ,
@@ -208,14 +367,14 @@ class DataHandler:
         # PCDATA declarations correspond to strings
         if model[0] in (expat.model.XML_CTYPE_MIXED,
                         expat.model.XML_CTYPE_EMPTY):
-            self.strings.append(name)
+            self.declare("strings", name)
             return
         # List-type elements
         if (model[0] in (expat.model.XML_CTYPE_CHOICE,
                          expat.model.XML_CTYPE_SEQ) and
             model[1] in (expat.model.XML_CQUANT_PLUS,
                          expat.model.XML_CQUANT_REP)):
-            self.lists.append(name)
+            self.declare("lists", name)
             return
         # This is the tricky case. Check which keys can occur multiple
         # times. If only one key is possible, and it can occur multiple
@@ -248,11 +407,18 @@ class DataHandler:
                     multiple.append(name)
         count(model)
         if len(single)==0 and len(multiple)==1:
-            self.lists.append(name)
+            self.declare("lists", name)
         elif len(multiple)==0:
-            self.dictionaries.append(name)
+            self.declare("dictionaries", name)
         else:
-            self.structures.update({name: multiple})
+            self.declare("structures", name, multiple)
+
+    def attlistDecl(self, elname, attname, type, default, required):
+        """This callback function is called for each attribute declaration
+        in a DTD. Default values are recorded, so that they can be added
+        to the attributes when the DTD is taken from the cache."""
+        if default is not None:
+            self.declare("defaults", elname, (attname, default))
 
     def external_entity_ref_handler(self, context, base, systemId, publicId):
         """The purpose of this function is to load the DTD locally, instead
@@ -263,6 +429,18 @@ class DataHandler:
         Bio/Entrez/DTDs will allow the parser to see them."""
         location, filename = os.path.split(systemId)
         path = os.path.join(self.dtd_dir, filename)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        if not self.recorders:
+            # The DTD named in the XML file, rather than a module it includes
+            if path in _dtd_cache and _dtd_unchanged(_dtd_cache[path][0]):
+                for kind, name, value in _dtd_cache[path][1]:
+                    self.declare(kind, name, value)
+                return 1
+            self.dtd_mtimes = {}
+        self.dtd_mtimes[path] = mtime
         try:
             handle = open(path)
         except IOError:
@@ -295,5 +473,14 @@ can include it with the next release of Biopython.
             
         parser = self.parser.ExternalEntityParserCreate(context)
         parser.ElementDeclHandler = self.elementDecl
-        parser.ParseFile(handle)
+        parser.AttlistDeclHandler = self.attlistDecl
+        recorder = []
+        self.recorders.append(recorder)
+        try:
+            parser.ParseFile(handle)
+        finally:
+            self.recorders.pop()
+            handle.close()
+        if not self.recorders:
+            _dtd_cache[path] = (self.dtd_mtimes, recorder)
         return 1
@@ -0,0 +1,177 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Local stand-in for the NCBI Entrez server, used to test Bio.Entrez (PRIVATE).
+
+The StandInServer answers EPost and taxonomy EFetch queries (by id list
+or from the posted ids with WebEnv/query_key) with made up records, and
+keeps a list of the queries it was sent.  While it is running, urllib
+sends all HTTP queries to it as a proxy, so Bio.Entrez can be used as
+usual without going online.
+
+A repeated query is answered from the cache, so only reaches the server
+once:
+
+>>> from Bio import Entrez
+>>> from Bio.Entrez.Cache import SQLiteCache
+>>> from Bio.Entrez._StandInServer import StandInServer
+>>> server = StandInServer()
+>>> server.start()
+>>> Entrez.cache = SQLiteCache(":memory:")
+>>> record = Entrez.read(Entrez.efetch(db="taxonomy", id="9606", retmode="xml"))
+>>> print record[0]["ScientificName"]
+species 9606
+>>> again = Entrez.read(Entrez.efetch(db="taxonomy", id="9606", retmode="xml"))
+>>> again == record
+True
+>>> server.scripts()
+['efetch']
+>>> Entrez.cache = None
+
+A short list of ids is fetched in batches:
+
+>>> server.clear()
+>>> records = list(Entrez.efetch_records("taxonomy", range(450), batch_size=200))
+>>> len(records)
+450
+>>> server.scripts()
+['efetch', 'efetch', 'efetch']
+
+A long list of ids is posted once with EPost, and the records fetched in
+batches from the Entrez history:
+
+>>> server.clear()
+>>> ids = range(1000, 13000)
+>>> records = list(Entrez.efetch_records("taxonomy", ids, batch_size=5000))
+>>> len(records), records[-1]["TaxId"]
+(12000, '12999')
+>>> server.scripts()
+['epost', 'efetch', 'efetch', 'efetch']
+>>> [params["retstart"] for script, params in server.requests[1:]]
+['0', '5000', '10000']
+>>> server.stop()
+"""
+
+import cgi
+import threading
+import urllib
+import urlparse
+import BaseHTTPServer
+
+_epost_result = """<?xml version="1.0"?>
+<!DOCTYPE ePostResult PUBLIC "-//NLM//DTD ePostResult, 11 May 2002//EN" "http://www.ncbi.nlm.nih.gov/entrez/query/DTD/ePost_020511.dtd">
+<ePostResult><QueryKey>1</QueryKey><WebEnv>%s</WebEnv></ePostResult>
+"""
+
+_taxa_set = """<?xml version="1.0"?>
+<!DOCTYPE TaxaSet PUBLIC "-//NLM//DTD Taxon, 14th January 2002//EN" "http://www.ncbi.nlm.nih.gov/entrez/query/DTD/taxon.dtd">
+<TaxaSet>%s</TaxaSet>
+"""
+
+_taxon = """<Taxon><TaxId>%(id)s</TaxId>\
+<ScientificName>species %(id)s</ScientificName>\
+<Rank>species</Rank>\
+<GeneticCode><GCId>1</GCId><GCName>Standard</GCName></GeneticCode>\
+<MitoGeneticCode><MGCId>2</MGCId><MGCName>Vertebrate Mitochondrial</MGCName>\
+</MitoGeneticCode>\
+<LineageEx><Taxon><TaxId>1</TaxId><ScientificName>root</ScientificName>\
+<Rank>no rank</Rank></Taxon></LineageEx></Taxon>"""
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Answers the queries sent to a StandInServer (PRIVATE)."""
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers["content-length"])
+        self._answer(self.rfile.read(length))
+
+    def do_GET(self):
+        self._answer(urlparse.urlparse(self.path)[4])
+
+    def _answer(self, query):
+        server = self.server.stand_in
+        script = urlparse.urlparse(self.path)[2].split("/")[-1]
+        script = script.replace(".fcgi", "")
+        params = dict(cgi.parse_qsl(query))
+        server.requests.append((script, params))
+        if script == "epost":
+            webenv = "WebEnv%i" % len(server.posted)
+            server.posted[webenv] = params["id"].split(",")
+            body = _epost_result % webenv
+        elif script == "efetch" and params.get("db") == "taxonomy":
+            if "WebEnv" in params:
+                start = int(params.get("retstart", 0))
+                end = start + int(params.get("retmax", 20))
+                ids = server.posted[params["WebEnv"]][start:end]
+            else:
+                ids = params["id"].split(",")
+            body = _taxa_set % "".join([_taxon % {"id" : id} for id in ids])
+        else:
+            self.send_error(404, "Not supported by the stand-in server")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.end_headers()
+        self.wfile.write(body)
+
+class StandInServer:
+    """HTTP server on this machine standing in for the NCBI Entrez server.
+
+    Attributes:
+    requests - list of (script name, parameter dictionary) tuples of the
+               queries received, e.g. ("efetch", {"db" : "taxonomy", ...})
+    posted   - dictionary of the id lists received by EPost, by WebEnv
+    """
+    def __init__(self):
+        self.requests = []
+        self.posted = {}
+        self._server = None
+        self._thread = None
+        self._opener = None
+
+    def start(self):
+        """Start the server, and send all urllib HTTP queries to it."""
+        self._server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.stand_in = self
+        #Check now and then if the server has been stopped
+        self._server.timeout = 0.1
+        self._server.socket.settimeout(0.1)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.setDaemon(True)
+        self._thread.start()
+        url = "http://%s:%i" % self._server.server_address
+        self._opener = urllib._urlopener
+        urllib._urlopener = urllib.FancyURLopener({"http" : url})
+
+    def _serve(self):
+        while self._running:
+            self._server.handle_request()
+
+    def stop(self):
+        """Stop the server, and let urllib go online again."""
+        urllib._urlopener = self._opener
+        self._running = False
+        self._thread.join()
+        self._server.server_close()
+        self._server = self._thread = self._opener = None
+
+    def clear(self):
+        """Forget the queries received so far."""
+        self.requests = []
+
+    def scripts(self):
+        """Return the names of the scripts queried, in order."""
+        return [script for script, params in self.requests]
+
+def _test():
+    """Run the Bio.Entrez._StandInServer module's doctests."""
+    print "Runing doctests..."
+    import doctest
+    doctest.testmod()
+    print "Done"
+
+if __name__ == "__main__":
+    _test()
@@ -41,15 +41,34 @@ read         Parses the XML results returned by any of the above functions.
              >>> record = Entrez.read(handle)
              where record is now a Python dictionary or list.
 
+efetch_records   Fetches and parses the records for a list of ids, in batches.
+esummary_records Fetches and parses the summaries for a list of ids, in batches.
+
+parse        Parses the XML results returned by those of the above functions
+             which can return multiple records, such as efetch or esummary,
+             returning the records one by one. Typical usage is:
+             >>> handle = Entrez.efetch(db="pubmed", id=ids, retmode="xml")
+             >>> for record in Entrez.parse(handle):
+             ...     print record["MedlineCitation"]["PMID"]
+
 _open        Internally used function.
 
+Set the module variable cache to an object from Bio.Entrez.Cache (such as
+an SQLiteCache) to keep the results of repeated queries locally.
+
 """
 import urllib, time, warnings
 import os.path
+from StringIO import StringIO
 from Bio import File
 
 
 email = None
+# Optional file used to keep the DTD classifications made by read between
+# sessions (they are always cached in memory for the current session)
+dtd_cache_file = None
+# Optional cache of the query results, see Bio.Entrez.Cache
+cache = None
 
 def query(cmd, db, cgi='http://www.ncbi.nlm.nih.gov/sites/entrez',
           **keywds):
@@ -85,7 +104,8 @@ def epost(db, cgi=None, **keywds):
     cgi='http://eutils.ncbi.nlm.nih.gov/entrez/eutils/epost.fcgi'
     variables = {'db' : db}
     variables.update(keywds)
-    return _open(cgi, variables)
+    # Long lists of ids do not fit in a URL, so these are sent by POST
+    return _open(cgi, variables, post=True)
 
 def efetch(db, cgi=None, **keywds):
     """Fetches Entrez results which are returned as a handle.
@@ -290,23 +310,117 @@ def read(handle):
     derived from the base type. This allows us to store the attributes
     (if any) of each element in a dictionary my_element.attributes, and
     the tag name in my_element.tag.
+
+    The DTDs are only parsed the first time they are needed in a session.
+    To keep them between sessions too, set Bio.Entrez.dtd_cache_file to
+    the name of a file to save them in.
     """
     from Parser import DataHandler
     DTDs = os.path.join(__path__[0], "DTDs")
-    handler = DataHandler(DTDs)
+    handler = DataHandler(DTDs, dtd_cache_file)
     record = handler.run(handle)
     return record
 
-def _open(cgi, params={}):
+def parse(handle):
+    """Parses an XML file from the NCBI Entrez Utilities, record by record.
+
+    This function is a generator, returning the records in an XML file
+    created by NCBI's Entrez Utilities one at a time, in the same form as
+    the read function does. The top level of the XML file must be a list
+    of records (as for the results of efetch in XML format, or esummary).
+    The file is parsed a block at a time, and each record is returned as
+    soon as it is complete, so very large files can be handled without
+    holding all their records in memory.
+    """
+    from Parser import DataHandler
+    DTDs = os.path.join(__path__[0], "DTDs")
+    handler = DataHandler(DTDs, dtd_cache_file)
+    for record in handler.parse(handle):
+        yield record
+
+def _batched_records(function, db, ids, batch_size, history_size, keywds):
+    """Fetch and parse the records for a list of ids, in batches (PRIVATE).
+
+    Up to history_size ids are sent as lists of batch_size ids, otherwise
+    the ids are posted to the Entrez history once with epost, and the
+    batches are fetched from there.
+    """
+    ids = [str(id) for id in ids]
+    if len(ids) > history_size:
+        record = read(epost(db, id=",".join(ids)))
+        keywds = dict(keywds)
+        keywds["WebEnv"] = record["WebEnv"]
+        keywds["query_key"] = record["QueryKey"]
+        for start in range(0, len(ids), batch_size):
+            handle = function(db=db, retstart=start, retmax=batch_size,
+                              **keywds)
+            for record in parse(handle):
+                yield record
+    else:
+        for start in range(0, len(ids), batch_size):
+            handle = function(db=db, id=",".join(ids[start:start+batch_size]),
+                              **keywds)
+            for record in parse(handle):
+                yield record
+
+def efetch_records(db, ids, batch_size=200, history_size=5000, **keywds):
+    """Fetches and parses the XML records for a list of ids (a generator).
+
+    Rather than one EFetch query per id, the ids are fetched batch_size
+    at a time. For more than history_size ids, they are first posted to
+    the Entrez history with EPost. Other arguments are passed on to efetch.
+    The records are returned one by one, as by Bio.Entrez.parse.
+
+    Short example:
+
+    from Bio import Entrez
+    for record in Entrez.efetch_records("taxonomy", ["9606", "10090"]):
+        print record["ScientificName"]
+    """
+    if "retmode" not in keywds:
+        keywds["retmode"] = "xml"
+    return _batched_records(efetch, db, ids, batch_size, history_size, keywds)
+
+def esummary_records(db, ids, batch_size=200, history_size=5000, **keywds):
+    """Fetches and parses the document summaries for a list of ids.
+
+    As efetch_records, but using ESummary. Returns the DocSum records
+    one by one.
+    """
+    return _batched_records(esummary, db, ids, batch_size, history_size,
+                            keywds)
+
+def _open(cgi, params={}, post=False):
     """Helper function to build the URL and open a handle to it (PRIVATE).
 
     Open a handle to Entrez.  cgi is the URL for the cgi script to access.
     params is a dictionary with the options to pass to it.  Does some
     simple error checking, and will raise an IOError if it encounters one.
+    If post is true, the options are sent with an HTTP POST request rather
+    than in the URL.
 
     This function also enforces the "three second rule" to avoid abusing
     the NCBI servers.
+
+    If the module variable cache is set, the results are looked up there
+    first, and stored there once fetched (unless they depend on the Entrez
+    history).
     """
+    # Remove None values from the parameters
+    for key, value in params.items():
+        if value is None:
+            del params[key]
+    cache_key = None
+    if cache is not None and not post \
+    and "WebEnv" not in params and not params.get("usehistory"):
+        # The same query always has the same key
+        items = [(key, value) for (key, value) in params.items() \
+                 if key not in ("tool", "email")]
+        items.sort()
+        cache_key = cgi + "?" + urllib.urlencode(items, doseq=True)
+        data = cache.get(cache_key)
+        if data is not None:
+            return File.UndoHandle(StringIO(data))
     # NCBI requirement: At most three queries per second.
     # Equivalently, at least a third of second between queries
     delay = 0.333333334
@@ -317,10 +431,6 @@ def _open(cgi, params={}):
         _open.previous = current + wait
     else:
         _open.previous = current
-    # Remove None values from the parameters
-    for key, value in params.items():
-        if value is None:
-            del params[key]
     # Tell Entrez that we are using Biopython
     if not "tool" in params:
         params["tool"] = "biopython"
@@ -330,8 +440,15 @@ def _open(cgi, params={}):
             params["email"] = email
     # Open a handle to Entrez.
     options = urllib.urlencode(params, doseq=True)
-    cgi += "?" + options
-    handle = urllib.urlopen(cgi)
+    if post:
+        handle = urllib.urlopen(cgi, options)
+    else:
+        cgi += "?" + options
+        handle = urllib.urlopen(cgi)
+    if cache_key is not None:
+        data = handle.read()
+        handle.close()
+        handle = StringIO(data)
 
     # Wrap the handle inside an UndoHandle.
     uhandle = File.UndoHandle(handle)
@@ -376,6 +493,8 @@ def _open(cgi, params={}):
         # occurs on the first line.  I need to check this!
         raise IOError("ERROR, possibly because id not available?")
     # Should I check for 404?  timeout?  etc?
+    if cache_key is not None:
+        cache.put(cache_key, handle.getvalue())
     return uhandle
 
 _open.previous = 0
@@ -0,0 +1,77 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Benchmark of Bio.Entrez.read on many small ESummary documents (PRIVATE).
+
+Each document is parsed by its own call to Bio.Entrez.read, as for a
+batch of responses downloaded one by one.  The documents are parsed once
+with the DTD cache emptied before every call (as if each call parsed the
+DTD itself, like older versions of Bio.Entrez did), and once with the
+cache kept, checking that the records are the same.  Run it with:
+
+python -m Bio.Entrez._benchmark [number of documents]
+"""
+
+import sys
+import time
+from cStringIO import StringIO
+
+from Bio import Entrez
+from Bio.Entrez import Parser
+
+_esummary = """<?xml version="1.0"?>
+<!DOCTYPE eSummaryResult PUBLIC "-//NLM//DTD eSummaryResult, 29 October 2004//EN" "http://www.ncbi.nlm.nih.gov/entrez/query/DTD/eSummary_041029.dtd">
+<eSummaryResult>
+<DocSum>
+	<Id>%(id)i</Id>
+	<Item Name="PubDate" Type="Date">2008 Mar</Item>
+	<Item Name="Source" Type="String">Nucleic Acids Res</Item>
+	<Item Name="AuthorList" Type="List">
+		<Item Name="Author" Type="String">Smith J</Item>
+		<Item Name="Author" Type="String">Jones K</Item>
+	</Item>
+	<Item Name="Title" Type="String">Document number %(id)i</Item>
+	<Item Name="Volume" Type="String">36</Item>
+	<Item Name="Pages" Type="String">%(id)i-%(end)i</Item>
+	<Item Name="ArticleIds" Type="Structure">
+		<Item Name="pubmed" Type="String">%(id)i</Item>
+	</Item>
+	<Item Name="PmcRefCount" Type="Integer">%(count)i</Item>
+</DocSum>
+</eSummaryResult>
+"""
+
+def _documents(count):
+    return [_esummary % {"id" : i, "end" : i+10, "count" : i % 7} \
+            for i in xrange(count)]
+
+def _parse_all(documents, cached):
+    records = []
+    start = time.time()
+    for document in documents:
+        if not cached:
+            Parser._dtd_cache.clear()
+        records.append(Entrez.read(StringIO(document)))
+    return time.time() - start, records
+
+def main(count=10000):
+    documents = _documents(count)
+    old_cache_file = Entrez.dtd_cache_file
+    Entrez.dtd_cache_file = None
+    try:
+        uncached, expected = _parse_all(documents, False)
+        Parser._dtd_cache.clear()
+        cached, records = _parse_all(documents, True)
+    finally:
+        Entrez.dtd_cache_file = old_cache_file
+    assert records == expected, "Cached DTD gave different records"
+    print "%i ESummary documents" % count
+    print "DTD parsed for every document: %0.2f s" % uncached
+    print "DTD taken from the cache:      %0.2f s" % cached
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
@@ -4,6 +4,268 @@ This module contains classes which implement Dynamic Programming
 algorithms that can be used generally.
 """
 
+try :
+    import numpy
+except ImportError :
+    #Only needed for LogDPAlgorithms
+    numpy = None
+
+#Largest number of forward (or backward) variables held at once when
+#working on a batch of sequences
+_BATCH_SIZE = 2000000
+
+def _model_arrays(markov_model, state_letters, emission_letters = ()):
+    """Return the model as arrays of log probabilities (PRIVATE).
+
+    Arguments:
+
+    o markov_model -- The Markov model to convert.
+
+    o state_letters -- The state letters, in the order of the array rows.
+
+    o emission_letters -- Any emission letters to include, in addition to
+    those of the model.
+
+    Returns the K x K array of log transition probabilities (with -inf
+    for transitions which are not allowed), the K x M array of log
+    emission probabilities, and a list of the M emission letters.
+    """
+    state_index = {}
+    for state in state_letters:
+        state_index[state] = len(state_index)
+    letters = []
+    for state, letter in markov_model.emission_prob.keys():
+        if letter not in letters:
+            letters.append(letter)
+    letters.sort()
+    for letter in emission_letters:
+        if letter not in letters:
+            letters.append(letter)
+    letter_index = {}
+    for letter in letters:
+        letter_index[letter] = len(letter_index)
+
+    transitions = numpy.zeros((len(state_letters), len(state_letters)))
+    for (from_state, to_state), prob in markov_model.transition_prob.items():
+        if from_state in state_index and to_state in state_index:
+            transitions[state_index[from_state], state_index[to_state]] = prob
+    emissions = numpy.zeros((len(state_letters), len(letters)))
+    for (state, letter), prob in markov_model.emission_prob.items():
+        if state in state_index:
+            emissions[state_index[state], letter_index[letter]] = prob
+
+    old_settings = numpy.seterr(divide = "ignore")
+    try:
+        return numpy.log(transitions), numpy.log(emissions), letters
+    finally:
+        numpy.seterr(**old_settings)
+
+def _encode(sequence, letters):
+    """Return the letters of a sequence as an array of indices (PRIVATE).
+
+    Raises a KeyError for letters which are not in the given list.
+    """
+    lookup = numpy.zeros(256, int) - 1
+    for index, letter in enumerate(letters):
+        lookup[ord(letter)] = index
+    codes = lookup[numpy.fromstring(str(sequence), numpy.uint8)]
+    if len(codes) and codes.min() < 0:
+        position = numpy.flatnonzero(codes < 0)[0]
+        raise KeyError("Unexpected letter %s" % str(sequence)[position])
+    return codes
+
+def _log_sum_dot(log_values, matrix):
+    """Return log(dot(exp(log_values), matrix)) for each row (PRIVATE).
+
+    The largest value of each row is taken out before the exponentials,
+    so that they cannot all underflow to zero.  Rows which are all -inf
+    give NaN, which the callers turn back into -inf at the end.
+    """
+    largest = log_values.max(axis = 1)[:, None]
+    values = log_values - largest
+    numpy.exp(values, values)
+    values = numpy.dot(values, matrix)
+    numpy.log(values, values)
+    values += largest
+    return values
+
+def _forward_backward(log_trans, log_emit, codes_list, backward = 1):
+    """Run the forward (and backward) algorithms on a batch of sequences.
+
+    Arguments:
+
+    o log_trans, log_emit -- The model as arrays (see _model_arrays).
+
+    o codes_list -- A list of the N emission sequences, as arrays of
+    indices (see _encode).
+
+    o backward -- Whether to calculate the backward variables too.
+
+    As in the AbstractDPAlgorithms class, the first state is the begin and
+    end state.  Each step of the recursions is done for all the states and
+    all the sequences at once.
+
+    Returns (PRIVATE):
+
+    o The T x N x K array of the log forward variables, where T is the
+    length of the longest sequence (positions past the end of a shorter
+    sequence hold meaningless values).
+
+    o The log backward variables, in the same form (or None).
+
+    o The T x N x K array of the log emission probabilities.
+
+    o The array of the N log sequence probabilities.
+    """
+    states = len(log_trans)
+    lengths = numpy.array([len(codes) for codes in codes_list])
+    padded = numpy.zeros((len(codes_list), lengths.max()), int)
+    for n, codes in enumerate(codes_list):
+        padded[n, :len(codes)] = codes
+    log_emissions = log_emit.T[padded.T]
+    positions = len(log_emissions)
+    transitions = numpy.exp(log_trans)
+
+    old_settings = numpy.seterr(divide = "ignore", invalid = "ignore")
+    try:
+        # f_{0}(0) = 1, f_{k}(0) = 0 for k > 0
+        previous = numpy.zeros((len(codes_list), states)) - numpy.inf
+        previous[:, 0] = 0.0
+        forward = numpy.empty((positions, len(codes_list), states))
+        for i in range(positions):
+            forward[i] = _log_sum_dot(previous, transitions) + log_emissions[i]
+            previous = forward[i]
+        # P(x) = sum_{k} f_{k}(L) a_{k0}
+        end = forward[lengths - 1, numpy.arange(len(codes_list))] \
+              + log_trans[:, 0]
+        log_probs = _log_sum_dot(end, numpy.ones((states, 1)))[:, 0]
+        forward[numpy.isnan(forward)] = -numpy.inf
+        log_probs[numpy.isnan(log_probs)] = -numpy.inf
+        if not backward:
+            return forward, None, log_emissions, log_probs
+
+        # b_{k}(L) = a_{k0}
+        backward = numpy.empty((positions, len(codes_list), states))
+        backward[:] = log_trans[:, 0]
+        for i in range(positions - 2, -1, -1):
+            following = log_emissions[i + 1] + backward[i + 1]
+            recursion = _log_sum_dot(following, transitions.T)
+            # sequences ending at this position keep the starting values
+            inside = lengths - 1 > i
+            backward[i, inside] = recursion[inside]
+        backward[numpy.isnan(backward)] = -numpy.inf
+    finally:
+        numpy.seterr(**old_settings)
+    return forward, backward, log_emissions, log_probs
+
+def _expected_counts(log_trans, log_emit, codes_list):
+    """Return the expected transition and emission counts (PRIVATE).
+
+    This calculates A_{kl} and E_{k}(b) (formulas 3.20 and 3.21 in Durbin
+    et al) summed over a batch of sequences, as K x K and K x M arrays,
+    and the array of the log probabilities of the sequences.
+    """
+    forward, backward, log_emissions, log_probs = \
+             _forward_backward(log_trans, log_emit, codes_list)
+    if numpy.isneginf(log_probs).any():
+        raise ValueError("A training sequence has zero probability")
+    positions, count, states = forward.shape
+    letters = log_emit.shape[1]
+    lengths = numpy.array([len(codes) for codes in codes_list])
+    padded = numpy.zeros((count, positions), int)
+    for n, codes in enumerate(codes_list):
+        padded[n, :len(codes)] = codes
+    index = numpy.arange(positions)[:, None]
+
+    # E_{k}(b) = sum of f_{k}(i) b_{k}(i) / P(x) where x_{i} = b
+    inside = index < lengths
+    posterior = numpy.exp(forward[inside] + backward[inside]
+                          - log_probs[numpy.nonzero(inside)[1]][:, None])
+    cells = padded.T[inside][:, None] + numpy.arange(states) * letters
+    emission_counts = numpy.bincount(cells.ravel(), posterior.ravel(),
+                                     states * letters)
+    emission_counts.shape = (states, letters)
+
+    # A_{kl} = sum of f_{k}(i) a_{kl} e_{l}(x_{i+1}) b_{l}(i+1) / P(x),
+    # which is a single matrix product once the largest values of each
+    # position are taken out of the exponentials
+    inside = index[:-1] < lengths - 1
+    first = forward[:-1][inside]
+    second = (log_emissions[1:] + backward[1:])[inside]
+    first_largest = first.max(axis = 1)
+    second_largest = second.max(axis = 1)
+    old_settings = numpy.seterr(invalid = "ignore")
+    try:
+        first_largest[numpy.isneginf(first_largest)] = 0.0
+        second_largest[numpy.isneginf(second_largest)] = 0.0
+    finally:
+        numpy.seterr(**old_settings)
+    weights = numpy.exp(first_largest + second_largest
+                        - log_probs[numpy.nonzero(inside)[1]])
+    transition_counts = numpy.exp(log_trans) * numpy.dot(
+        (numpy.exp(first - first_largest[:, None]) * weights[:, None]).T,
+        numpy.exp(second - second_largest[:, None]))
+    return transition_counts, emission_counts, log_probs
+
+def log_expected_counts(markov_model, training_seqs):
+    """Calculate the expected counts of a set of training sequences.
+
+    Arguments:
+
+    o markov_model -- The current Markov model we are working with.
+
+    o training_seqs -- A list of TrainingSequence objects.
+
+    This works in log space with NumPy arrays, on batches of sequences
+    of similar length at a time (see LogDPAlgorithms).
+
+    Returns:
+
+    o A dictionary of the expected number of each transition, with keys
+    of the form (from state letter, to state letter).
+
+    o A dictionary of the expected number of each emission, with keys of
+    the form (state letter, emission letter).
+
+    o A list of the log probability of each training sequence (natural
+    logarithms, in the order of training_seqs).
+    """
+    if numpy is None:
+        raise ImportError("NumPy is required for log space calculations")
+    state_letters = training_seqs[0].states.alphabet.letters
+    log_trans, log_emit, letters = _model_arrays(markov_model, state_letters,
+                                   training_seqs[0].emissions.alphabet.letters)
+    codes_list = [_encode(seq.emissions, letters) for seq in training_seqs]
+
+    transition_counts = numpy.zeros(log_trans.shape)
+    emission_counts = numpy.zeros(log_emit.shape)
+    log_probs = numpy.zeros(len(training_seqs))
+    # batches of sequences of similar lengths, to limit the padding
+    order = numpy.argsort([len(codes) for codes in codes_list])
+    start = 0
+    while start < len(order):
+        end = start + 1
+        while end < len(order) and (end - start + 1) * len(log_trans) * \
+              len(codes_list[order[end]]) <= _BATCH_SIZE:
+            end += 1
+        batch = order[start:end]
+        transitions, emissions, probs = _expected_counts(log_trans, log_emit,
+                                        [codes_list[n] for n in batch])
+        transition_counts += transitions
+        emission_counts += emissions
+        log_probs[batch] = probs
+        start = end
+
+    transition_dict = {}
+    for k, from_state in enumerate(state_letters):
+        for l, to_state in enumerate(state_letters):
+            transition_dict[(from_state, to_state)] = transition_counts[k, l]
+    emission_dict = {}
+    for k, state in enumerate(state_letters):
+        for b, letter in enumerate(letters):
+            emission_dict[(state, letter)] = emission_counts[k, b]
+    return transition_dict, emission_dict, log_probs.tolist()
+
 class AbstractDPAlgorithms:
     """An abstract class to calculate forward and backward probabiliies.
 
@@ -316,13 +578,91 @@ class ScaledDPAlgorithms(AbstractDPAlgorithms):
 class LogDPAlgorithms(AbstractDPAlgorithms):
     """Implement forward and backward algorithms using a log approach.
 
-    This uses the approach of calculating the sum of log probabilities
-    using a lookup table for common values.
-
-    XXX This is not implemented yet!
+    The states and emission letters are turned into integer indices, and
+    the model into arrays of log transition and emission probabilities.
+    Each step of the recursions is then done for all the states at once
+    with NumPy, using log(sum(exp(x))) = m + log(sum(exp(x - m))), where
+    m is the largest value, so there are no underflow errors however long
+    the sequence.
+
+    The forward and backward variables returned are the (natural) logs of
+    the usual values, as is the sequence probability.  When this class is
+    given to the BaumWelchTrainer, the expected counts of all the training
+    sequences are calculated in batches (see log_expected_counts).
     """
     def __init__(self, markov_model, sequence):
-        raise NotImplementedError("Haven't coded this yet...")
+        """Initialize to calculate log forward and backward probabilities.
+
+        Arguments:
+
+        o markov_model -- The current Markov model we are working with.
+
+        o sequence -- A training sequence containing a set of emissions.
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required for LogDPAlgorithms")
+        AbstractDPAlgorithms.__init__(self, markov_model, sequence)
+        self._state_letters = sequence.states.alphabet.letters
+        self._log_trans, self._log_emit, letters = \
+            _model_arrays(markov_model, self._state_letters,
+                          sequence.emissions.alphabet.letters)
+        self._codes = _encode(sequence.emissions, letters)
+
+    def _to_dict(self, log_values, initial = None):
+        """Turn an array of log variables into a dictionary (PRIVATE).
+
+        The keys are of the form (state letter, position).
+        """
+        variables = {}
+        if initial is not None:
+            for state, value in zip(self._state_letters, initial):
+                variables[(state, -1)] = value
+        for i, values in enumerate(log_values.tolist()):
+            for state, value in zip(self._state_letters, values):
+                variables[(state, i)] = value
+        return variables
+
+    def log_forward(self):
+        """Calculate the log forward variables as an array.
+
+        Returns the L x K array of the log forward variables (for each
+        position and state) and the log probability of the sequence.
+        """
+        forward, backward, log_emissions, log_probs = \
+            _forward_backward(self._log_trans, self._log_emit,
+                              [self._codes], backward = 0)
+        return forward[:, 0, :], log_probs[0]
+
+    def log_backward(self):
+        """Calculate the log backward variables as an array.
+
+        Returns the L x K array of the log backward variables.
+        """
+        forward, backward, log_emissions, log_probs = \
+            _forward_backward(self._log_trans, self._log_emit, [self._codes])
+        return backward[:, 0, :]
+
+    def forward_algorithm(self):
+        """Calculate sequence probability using the forward algorithm.
+
+        Returns:
+
+        o A dictionary containing the log foward variables. This has keys
+        of the form (state letter, position in the training sequence).
+
+        o The log probability of the sequence.
+        """
+        forward, log_prob = self.log_forward()
+        initial = [0.0] + [-numpy.inf] * (len(self._state_letters) - 1)
+        return self._to_dict(forward, initial), log_prob
+
+    def backward_algorithm(self):
+        """Calculate the log backward variables.
+
+        Returns a dictionary containing the log backward variables, with
+        keys of the form (state letter, position in the training sequence).
+        """
+        return self._to_dict(self.log_backward())
 
         
     
@@ -5,8 +5,17 @@ import copy
 import math
 import random
 
+try:
+    import numpy
+except ImportError:
+    # viterbi works one state at a time without it
+    numpy = None
+
 # biopython
-from Bio.Seq import MutableSeq
+from Bio.Seq import MutableSeq, Seq
+
+# local stuff
+from DynamicProgramming import _model_arrays, _encode
 
 class MarkovModelBuilder:
     """Interface to build up a Markov Model.
@@ -377,7 +386,14 @@ class HiddenMarkovModel:
 
         o state_alphabet -- The alphabet of the possible state sequences
         that can be generated.
+
+        When NumPy is available, the states and emissions are turned into
+        integer indices and each step is done for all the states at once
+        (see _array_viterbi).
         """
+        if numpy is not None:
+            return self._array_viterbi(sequence, state_alphabet)
+
         # calculate logarithms of the transition and emission probs
         log_trans = self._log_transform(self.transition_prob)
         log_emission = self._log_transform(self.emission_prob)
@@ -466,6 +482,50 @@ class HiddenMarkovModel:
 
         return traceback_seq.toseq(), state_path_prob
 
+    def _array_viterbi(self, sequence, state_alphabet):
+        """Calculate the most probable state path with NumPy arrays.
+
+        This gives the same results as the viterbi method, using arrays of
+        the log transition and emission probabilities. When several
+        previous states are equally likely, the one first in the state
+        alphabet is used.
+        """
+        state_letters = state_alphabet.letters
+        log_trans, log_emission, letters = _model_arrays(self, state_letters)
+        codes = _encode(sequence, letters)
+        states = numpy.arange(len(state_letters))
+
+        # v_{0}(0) = 1, v_{k}(0) = 0 for k > 0
+        viterbi_probs = numpy.zeros(len(state_letters))
+        viterbi_probs[0] = 1
+        pred_states = numpy.empty((len(codes), len(state_letters)), int)
+        old_settings = numpy.seterr(invalid = "ignore")
+        try:
+            # --- recursion
+            for i in range(len(codes)):
+                # v_{k}(i - 1) + a_{kl}, for all k and l
+                possible_state_probs = viterbi_probs[:, None] + log_trans
+                pred_states[i] = possible_state_probs.argmax(axis = 0)
+                viterbi_probs = possible_state_probs[pred_states[i], states] \
+                                + log_emission[:, codes[i]]
+
+            # --- termination
+            all_probs = viterbi_probs * log_trans[:, 0]
+            all_probs[numpy.isneginf(viterbi_probs)
+                      | numpy.isneginf(log_trans[:, 0])] = -numpy.inf
+        finally:
+            numpy.seterr(**old_settings)
+        cur_state = all_probs.argmax()
+        state_path_prob = float(all_probs[cur_state])
+
+        # --- traceback
+        path = numpy.empty(len(codes), int)
+        for i in range(len(codes) - 1, -1, -1):
+            path[i] = cur_state
+            cur_state = pred_states[i, cur_state]
+        traceback = "".join(numpy.array(list(state_letters))[path].tolist())
+        return Seq(traceback, state_alphabet), state_path_prob
+
     def _log_transform(self, probability):
         """Return log transform of the given probability dictionary.
 
@@ -15,8 +15,15 @@ in the training data.
 # standard modules
 import math
 
+try:
+    import numpy
+except ImportError:
+    # counting is done one letter at a time without it
+    numpy = None
+
 # local stuff
-from DynamicProgramming import ScaledDPAlgorithms
+from DynamicProgramming import ScaledDPAlgorithms, LogDPAlgorithms
+from DynamicProgramming import log_expected_counts, _encode
 
 class TrainingSequence:
     """Hold a training sequence with emissions and optionally, a state path.
@@ -184,6 +191,10 @@ class BaumWelchTrainer(AbstractTrainer):
         o dp_method -- A class instance specifying the dynamic programming
         implementation we should use to calculate the forward and
         backward variables. By default, we use the scaling method.
+        With LogDPAlgorithms the expected counts of all the training
+        sequences are calculated together in log space (see
+        DynamicProgramming.log_expected_counts), which works for
+        sequences of any length.
         """
         prev_log_likelihood = None
         num_iterations = 1
@@ -194,8 +205,16 @@ class BaumWelchTrainer(AbstractTrainer):
 
             # remember all of the sequence probabilities
             all_probabilities = []
+
+            if issubclass(dp_method, LogDPAlgorithms):
+                transition_count, emission_count, log_probs = \
+                    self._add_expected_counts(transition_count,
+                                              emission_count, training_seqs)
+                training_seqs_left = []
+            else:
+                training_seqs_left = training_seqs
             
-            for training_seq in training_seqs:
+            for training_seq in training_seqs_left:
                 # calculate the forward and backward variables
                 DP = dp_method(self._markov_model, training_seq)
                 forward_var, seq_prob = DP.forward_algorithm()
@@ -221,7 +240,10 @@ class BaumWelchTrainer(AbstractTrainer):
             self._markov_model.transition_prob = ml_transitions
             self._markov_model.emission_prob = ml_emissions
 
-            cur_log_likelihood =  self.log_likelihood(all_probabilities)
+            if issubclass(dp_method, LogDPAlgorithms):
+                cur_log_likelihood = sum(log_probs)
+            else:
+                cur_log_likelihood =  self.log_likelihood(all_probabilities)
 
             # if we have previously calculated the log likelihood (ie.
             # not the first round), see if we can finish
@@ -338,6 +360,30 @@ class BaumWelchTrainer(AbstractTrainer):
 
         return emission_counts
 
+    def _add_expected_counts(self, transition_counts, emission_counts,
+                             training_seqs):
+        """Add the expected counts of all the sequences, in log space.
+
+        Arguments:
+
+        o transition_counts, emission_counts -- The current counts to add
+        to.
+
+        o training_seqs -- A list of TrainingSequence objects.
+
+        Returns the updated counts, and a list of the log probabilities of
+        the sequences.
+        """
+        transitions, emissions, log_probs = \
+            log_expected_counts(self._markov_model, training_seqs)
+        for key in transition_counts.keys():
+            if key in transitions:
+                transition_counts[key] += transitions[key]
+        for key in emission_counts.keys():
+            if key in emissions:
+                emission_counts[key] += emissions[key]
+        return transition_counts, emission_counts, log_probs
+
 class KnownStateTrainer(AbstractTrainer):
     """Estimate probabilities with known state sequences.
 
@@ -361,6 +407,12 @@ class KnownStateTrainer(AbstractTrainer):
         transition_counts = self._markov_model.get_blank_transitions()
         emission_counts = self._markov_model.get_blank_emissions()
 
+        if numpy is not None:
+            transition_counts, emission_counts = \
+                self._count_all(training_seqs, transition_counts,
+                                emission_counts)
+            training_seqs = []
+
         for training_seq in training_seqs:
             emission_counts = self._count_emissions(training_seq,
                                                     emission_counts)
@@ -376,6 +428,71 @@ class KnownStateTrainer(AbstractTrainer):
 
         return self._markov_model
 
+    def _count_all(self, training_seqs, transition_counts, emission_counts):
+        """Add the transitions and emissions of all the training sequences.
+
+        The states and emissions of all the sequences are turned into
+        integer indices, and each kind of pair is counted with a single
+        call to numpy.bincount.
+
+        Arguments:
+
+        o training_seqs -- A list of TrainingSequence objects with states
+        and emissions to get the counts from.
+
+        o transition_counts, emission_counts -- The current counts to add
+        to.
+        """
+        states = []
+        letters = []
+        for state, letter in emission_counts.keys():
+            if state not in states:
+                states.append(state)
+            if letter not in letters:
+                letters.append(letter)
+        for from_state, to_state in transition_counts.keys():
+            for state in (from_state, to_state):
+                if state not in states:
+                    states.append(state)
+        state_codes = _encode("".join([str(seq.states)
+                                       for seq in training_seqs]), states)
+        letter_codes = _encode("".join([str(seq.emissions)
+                                        for seq in training_seqs]), letters)
+        if len(state_codes) != len(letter_codes):
+            raise ValueError("Training sequences need known state paths")
+
+        # no transitions into the first letter of each sequence
+        starts = numpy.cumsum([0] + [len(seq.states)
+                                     for seq in training_seqs])[:-1]
+        following = numpy.ones(len(state_codes), bool)
+        following[starts] = False
+
+        counts = numpy.bincount(state_codes * len(letters) + letter_codes,
+                                minlength = len(states) * len(letters))
+        self._add_counts(emission_counts, counts, states, letters,
+                         "Unexpected emission (%s, %s)")
+        pairs = state_codes[:-1] * len(states) + state_codes[1:]
+        counts = numpy.bincount(pairs[following[1:]],
+                                minlength = len(states) * len(states))
+        self._add_counts(transition_counts, counts, states, states,
+                         "Unexpected transition (%s, %s)")
+        return transition_counts, emission_counts
+
+    def _add_counts(self, counts, pair_counts, first_letters, second_letters,
+                    message):
+        """Add an array of pair counts to a dictionary of counts (PRIVATE).
+
+        Raises a KeyError for pairs which were seen but are not in the
+        dictionary.
+        """
+        for index in numpy.flatnonzero(pair_counts):
+            key = (first_letters[index // len(second_letters)],
+                   second_letters[index % len(second_letters)])
+            try:
+                counts[key] += int(pair_counts[index])
+            except KeyError:
+                raise KeyError(message % key)
+
     def _count_emissions(self, training_seq, emission_counts):
         """Add emissions from the training sequence to the current counts.
 
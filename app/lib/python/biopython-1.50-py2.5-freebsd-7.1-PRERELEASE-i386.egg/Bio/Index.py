@@ -12,12 +12,21 @@ Index     Dictionary-like class used to store index information.
 
 _ShelveIndex    An Index class based on the shelve module.
 _InMemoryIndex  An in-memory Index class.
+_OffsetIndex    An Index class of sorted keys and (offset, length) arrays,
+                read through mmap (if available).
 
 """
 import os
 import array
 import cPickle
 import shelve
+import struct
+try:
+    import mmap
+except ImportError:
+    # e.g. Google App Engine, the index is then read into memory
+    mmap = None
+from UserDict import DictMixin
 
 class _ShelveIndex(dict):
     """An index file wrapped around shelve.
@@ -139,4 +148,218 @@ class _InMemoryIndex(dict):
         strlist = map(chr, intlist)
         return cPickle.loads(''.join(strlist))
 
-Index = _InMemoryIndex
+class _OffsetIndex(DictMixin):
+    """An index file of sorted keys with packed (offset, length) values.
+
+    The file holds a header, a table of n+1 offsets into a block of the n
+    sorted keys, the n offsets and n lengths (all little endian unsigned
+    integers), then the keys themselves, and finally a pickled dictionary
+    of any other entries (for example the name of the indexed file).
+    Entries with a string key and a value of two integers, (offset,
+    length), go in the arrays; anything else is pickled.
+
+    Opening an index only reads the header and the pickled entries, the
+    rest is mapped into memory and looked up with a binary search.
+    Without the mmap module, the rest is read into a string instead.  New
+    entries are kept in memory and the file is rewritten when the index
+    is closed (or deleted).  Index files of the older _InMemoryIndex
+    format can still be read, but are loaded into memory.
+    """
+    __magic = "BIDX"
+    __version = 1
+    _header = struct.Struct("<4sIQQQ")
+
+    def __init__(self, indexname, truncate=None):
+        self.__changed = 0
+        self._indexname = indexname
+        self._file = self._map = None
+        self._count = 0
+        self._data = {}          # entries not (yet) in the arrays
+
+        # Remove the database if truncate is true.
+        if truncate and os.path.exists(indexname):
+            os.unlink(indexname)
+            self.__changed = 1
+
+        if os.path.exists(indexname):
+            handle = open(indexname, "rb")
+            magic = handle.read(4)
+            if magic != self.__magic:
+                # an old style index, load it all
+                handle.close()
+                self._data.update(_InMemoryIndex(indexname))
+                return
+            handle.seek(0)
+            magic, version, count, keys_size, data_size = \
+                   self._header.unpack(handle.read(self._header.size))
+            if version != self.__version:
+                handle.close()
+                raise IOError("Version %s doesn't match my version %s" \
+                              % (version, self.__version))
+            # key offsets, then offsets and lengths, then the keys
+            self._keys_start = self._header.size + 20 * count + 4
+            data_start = self._keys_start + keys_size
+            handle.seek(data_start)
+            self._data = cPickle.loads(handle.read(data_size))
+            if count and mmap is not None:
+                self._map = mmap.mmap(handle.fileno(), data_start,
+                                      access=mmap.ACCESS_READ)
+            elif count:
+                # a string supports the same slicing and unpack_from
+                handle.seek(0)
+                self._map = handle.read(data_start)
+            self._file = handle
+            self._count = count
+
+    def _get_key(self, i):
+        start, end = struct.unpack_from("<II", self._map,
+                                        self._header.size + 4 * i)
+        return self._map[self._keys_start + start:self._keys_start + end]
+
+    def _find(self, key):
+        # Returns the position of the key in the arrays, or -1
+        if not self._count or not isinstance(key, str):
+            return -1
+        # bisect.bisect_left on the keys, written out to save the calls
+        m = self._map
+        unpack_from = struct.unpack_from
+        table = self._header.size
+        keys = self._keys_start
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start, end = unpack_from("<II", m, table + 4 * mid)
+            if m[keys + start:keys + end] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._get_key(lo) == key:
+            return lo
+        return -1
+
+    def _get_value(self, i):
+        start = self._header.size + 4 * (self._count + 1)
+        offset, = struct.unpack_from("<Q", self._map, start + 8 * i)
+        length, = struct.unpack_from("<Q", self._map,
+                                     start + 8 * (self._count + i))
+        return offset, length
+
+    def _load_all(self):
+        # Move everything into memory, before changing existing entries
+        for i in xrange(self._count):
+            key = self._get_key(i)
+            if key not in self._data:
+                self._data[key] = self._get_value(i)
+        self._close_map()
+
+    def _close_map(self):
+        if self._map is not None and mmap is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+        self._file = self._map = None
+        self._count = 0
+
+    def __getitem__(self, key):
+        try:
+            return self._data[key]
+        except KeyError:
+            pass
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._get_value(i)
+
+    def __contains__(self, key):
+        return key in self._data or self._find(key) >= 0
+
+    has_key = __contains__
+
+    def __setitem__(self, key, value):
+        self.__changed = 1
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        self._load_all()
+        self.__changed = 1
+        del self._data[key]
+
+    def clear(self):
+        self._close_map()
+        self.__changed = 1
+        self._data.clear()
+
+    def __iter__(self):
+        for key in self._data:
+            yield key
+        for i in xrange(self._count):
+            key = self._get_key(i)
+            if key not in self._data:
+                yield key
+
+    def keys(self):
+        return list(self)
+
+    def __len__(self):
+        repeated = [key for key in self._data if self._find(key) >= 0]
+        return self._count + len(self._data) - len(repeated)
+
+    def flush(self):
+        """Write the index file, if anything has changed."""
+        if not self.__changed:
+            return
+        self._load_all()
+        items = []
+        other = {}
+        for key, value in self._data.iteritems():
+            if _is_location(key, value):
+                items.append((key, value[0], value[1]))
+            else:
+                other[key] = value
+        items.sort()
+
+        key_offsets = [0]
+        for key, offset, length in items:
+            key_offsets.append(key_offsets[-1] + len(key))
+        if key_offsets[-1] >= 2**32:
+            raise ValueError("Too many keys for the index format")
+        data = cPickle.dumps(other, 2)
+        handle = open(self._indexname, "wb")
+        handle.write(self._header.pack(self.__magic, self.__version,
+                                       len(items), key_offsets[-1],
+                                       len(data)))
+        _write_packed(handle, "I", key_offsets)
+        _write_packed(handle, "Q", [item[1] for item in items])
+        _write_packed(handle, "Q", [item[2] for item in items])
+        for key, offset, length in items:
+            handle.write(key)
+        handle.write(data)
+        handle.close()
+        self.__changed = 0
+
+    def close(self):
+        """Write the index file if needed, and close it."""
+        self.flush()
+        self._close_map()
+
+    def __del__(self):
+        if self.__dict__.has_key('_data'):
+            self.close()
+
+def _is_location(key, value):
+    """Can this entry go in the arrays of an _OffsetIndex? (PRIVATE)"""
+    if not isinstance(key, str) or not isinstance(value, tuple) \
+       or len(value) != 2:
+        return False
+    for x in value:
+        if not isinstance(x, (int, long)) or x < 0 or x >= 2**64:
+            return False
+    return True
+
+def _write_packed(handle, code, values, chunk=10000):
+    """Write a list of integers as a little endian array (PRIVATE)."""
+    for start in xrange(0, len(values), chunk):
+        part = values[start:start+chunk]
+        handle.write(struct.pack("<%i%s" % (len(part), code), *part))
+
+Index = _OffsetIndex
@@ -0,0 +1,421 @@
+"""Mindy database of sorted fixed width index files read with mmap.
+
+Each namespace is stored in one file of fixed width records sorted by
+key.  A record holds the key (padded with NUL characters to the width of
+the longest key) followed by the file id, start position and length of
+the record it points to, packed as big endian integers.  Secondary
+namespaces point straight at the records, rather than at primary keys, so
+every lookup is a single binary search.
+
+The files are mapped into memory with mmap, so a lookup only touches the
+pages of the records visited by the binary search, and nothing is read
+when the database is opened.  Use the lookup_many method of a namespace
+to look up a batch of keys in one sorted pass.
+
+While indexing, the records are collected in memory and sorted a run of
+RUN_SIZE records at a time, spilling each run to a temporary file; on
+flush the runs (and any existing index file) are merged into the new
+index file.  This means inputs much bigger than the available memory can
+be indexed, and that a repeated primary key is only reported on flush.
+"""
+import os, mmap, struct, heapq
+import BaseDB, Location
+
+_open = open  # rename for internal use -- gets redefined below
+
+INDEX_TYPE = "mmap/1"
+
+_MAGIC = "MNDY"
+_header = struct.Struct(">4sI")
+_location = struct.Struct(">IQQ")
+
+#Number of records per namespace held in memory before sorting them
+#and writing them to a temporary run file
+RUN_SIZE = 500000
+
+#Maximum number of run files merged at once
+_MERGE_WIDTH = 100
+
+def _as_key(s):
+    """Return the key as a byte string, checking it can be stored (PRIVATE)."""
+    if isinstance(s, unicode):
+        s = s.encode("utf-8")
+    if "\t" in s or "\n" in s or "\0" in s:
+        raise TypeError("Key %r cannot contain tabs, newlines or NULs" % (s,))
+    return s
+
+def _merge(iterators):
+    """Merge sorted iterators into a single sorted iterator (PRIVATE)."""
+    heap = []
+    for i, iterator in enumerate(iterators):
+        for item in iterator:
+            heap.append((item, i, iterator))
+            break
+    heapq.heapify(heap)
+    while heap:
+        item, i, iterator = heap[0]
+        yield item
+        for item in iterator:
+            heapq.heapreplace(heap, (item, i, iterator))
+            break
+        else:
+            heapq.heappop(heap)
+
+def _read_run(filename):
+    """Iterate over the records in a temporary run file (PRIVATE)."""
+    infile = _open(filename, "rb")
+    for line in infile:
+        key, fileid, startpos, length = line[:-1].split("\t")
+        yield key, int(fileid), long(startpos), long(length)
+    infile.close()
+
+def _write_run(filename, records):
+    outfile = _open(filename, "wb")
+    for record in records:
+        outfile.write("%s\t%i\t%i\t%i\n" % record)
+    outfile.close()
+
+
+class SortedTable:
+    """Index file of fixed width records sorted by key, mapped into memory."""
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = _open(filename, "rb")
+        magic, self.key_width = _header.unpack(self._file.read(_header.size))
+        if magic != _MAGIC:
+            raise TypeError("%s is not a Mindy mmap index" % (filename,))
+        self.record_size = self.key_width + _location.size
+        size = os.path.getsize(filename) - _header.size
+        assert size % self.record_size == 0, "record size is wrong"
+        self.count = size // self.record_size
+        if self.count:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access = mmap.ACCESS_READ)
+        else:
+            self._map = None
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+        self._map = self._file = None
+
+    def _bisect(self, key, lo, right):
+        # key must already be padded to the key width
+        m = self._map
+        width = self.key_width
+        size = self.record_size
+        offset = _header.size
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = offset + mid * size
+            k = m[start:start + width]
+            if k < key or (right and k == key):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, key, lo = 0):
+        """Return the range (start, end) of the records with the key.
+
+        The range is empty if the key is missing, with start the position
+        the key would have.  Records before lo are not searched.
+        """
+        if len(key) > self.key_width:
+            #Too long to be in the table, it sorts after its prefix
+            left = self._bisect(key[:self.key_width], lo, 1)
+            return left, left
+        key = key + "\0" * (self.key_width - len(key))
+        left = self._bisect(key, lo, 0)
+        return left, self._bisect(key, left, 1)
+
+    def get_key(self, i):
+        start = _header.size + i * self.record_size
+        return self._map[start:start + self.key_width].rstrip("\0")
+
+    def get_location(self, i):
+        """Return the (file id, start position, length) of record i."""
+        return _location.unpack_from(self._map, _header.size +
+                                     i * self.record_size + self.key_width)
+
+    def records(self):
+        """Iterate over the (key, file id, start, length) records in order."""
+        for i in xrange(self.count):
+            yield (self.get_key(i),) + self.get_location(i)
+
+    def keys(self):
+        """Return the keys in order, without repeats."""
+        data = []
+        for i in xrange(self.count):
+            key = self.get_key(i)
+            if not data or data[-1] != key:
+                data.append(key)
+        return data
+
+
+class _Sorter:
+    """Collects the records of an index file for an external sort (PRIVATE)."""
+    def __init__(self, filename, run_size = None):
+        self.filename = filename
+        self.run_size = run_size or RUN_SIZE
+        self.records = []
+        self.runs = []
+        self.key_width = 0
+
+    def add(self, key, fileid, startpos, length):
+        self.records.append((key, fileid, startpos, length))
+        if len(key) > self.key_width:
+            self.key_width = len(key)
+        if len(self.records) >= self.run_size:
+            self._spill()
+
+    def _spill(self):
+        self.records.sort()
+        filename = "%s.run%d" % (self.filename, len(self.runs))
+        while os.path.exists(filename):
+            filename += "_"
+        _write_run(filename, self.records)
+        self.runs.append(filename)
+        self.records = []
+
+    def _merge_runs(self):
+        # Keep the number of files open at once down
+        while len(self.runs) > _MERGE_WIDTH:
+            runs = self.runs[:_MERGE_WIDTH]
+            filename = "%s.run%d" % (self.filename, len(self.runs))
+            while os.path.exists(filename):
+                filename += "_"
+            _write_run(filename, _merge([_read_run(x) for x in runs]))
+            for x in runs:
+                os.remove(x)
+            self.runs = self.runs[_MERGE_WIDTH:] + [filename]
+
+    def finish(self, unique = None):
+        """Merge the new records into the index file.
+
+        If unique is given (the namespace name) a repeated key raises a
+        TypeError, in which case the index file is left unchanged and the
+        new records are discarded.
+        """
+        if not self.records and not self.runs:
+            return
+        old = None
+        tmp_filename = self.filename + ".tmp"
+        try:
+            self.records.sort()
+            self._merge_runs()
+            iterators = [iter(self.records)] + \
+                        [_read_run(x) for x in self.runs]
+            if os.path.exists(self.filename):
+                old = SortedTable(self.filename)
+                iterators.append(old.records())
+            width = self.key_width
+            if old is not None and old.key_width > width:
+                width = old.key_width
+
+            outfile = _open(tmp_filename, "wb")
+            try:
+                outfile.write(_header.pack(_MAGIC, width))
+                pack = _location.pack
+                prev = None
+                for key, fileid, startpos, length in _merge(iterators):
+                    if key == prev and unique is not None:
+                        raise TypeError("Field %r = %r already exists" %
+                                        (unique, key))
+                    prev = key
+                    outfile.write(key + "\0" * (width - len(key)) +
+                                  pack(fileid, startpos, length))
+            finally:
+                outfile.close()
+            if old is not None:
+                old.close()
+                old = None
+                # Windows cannot rename over an existing file
+                os.remove(self.filename)
+            os.rename(tmp_filename, self.filename)
+        finally:
+            if old is not None:
+                old.close()
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+            self.discard()
+
+    def discard(self):
+        """Forget the new records, removing the temporary run files."""
+        for x in self.runs:
+            os.remove(x)
+        self.records = []
+        self.runs = []
+        self.key_width = 0
+
+
+class PrimaryNamespace(BaseDB.DictLookup):
+    def __init__(self, db, namespace):
+        self.db = db
+        self.namespace = namespace
+        self.table = db._get_table(namespace)
+
+    def _locations(self, name, start, end):
+        data = []
+        for i in xrange(start, end):
+            fileid, startpos, length = self.table.get_location(i)
+            data.append(Location.Location(self.namespace,
+                                          name,
+                                          self.db.fileid_info[str(fileid)][0],
+                                          startpos,
+                                          length))
+        return data
+
+    def __getitem__(self, name):
+        start, end = self.table.find(_as_key(name))
+        if start == end:
+            raise KeyError("Cannot find %r key %r" % (self.namespace, name))
+        return self._locations(name, start, end)
+
+    def lookup_many(self, names):
+        """Look up a list of keys, returning a dictionary of the Locations.
+
+        The keys are sorted and found in a single pass over the index, each
+        search starting where the previous one ended.  Missing keys are
+        left out of the dictionary.
+        """
+        keys = {}
+        for name in names:
+            keys[_as_key(name)] = name
+        found = {}
+        start = 0
+        for key in sorted(keys):
+            start, end = self.table.find(key, start)
+            if start != end:
+                found[keys[key]] = self._locations(keys[key], start, end)
+            start = end
+        return found
+
+    def keys(self):
+        return self.table.keys()
+
+SecondaryNamespace = PrimaryNamespace
+
+
+class MmapDB(BaseDB.OpenDB, BaseDB.WriteDB):
+    def __init__(self, dbname, mode = "r", run_size = None):
+        if mode not in ("r", "rw"):
+            raise TypeError("Unknown mode: %r" % (mode,))
+        self._need_flush = 0
+        self._tables = {}
+        self._sorters = {}
+        BaseDB.OpenDB.__init__(self, dbname, INDEX_TYPE)
+        if mode == "rw":
+            for namespace in self.keys():
+                self._sorters[namespace] = _Sorter(
+                    self._get_filename(namespace), run_size)
+
+    def _get_filename(self, namespace):
+        if namespace == self.primary_namespace:
+            return os.path.join(self.dbname, "key_%s.key" % (namespace,))
+        return os.path.join(self.dbname, "id_%s.index" % (namespace,))
+
+    def _get_table(self, namespace):
+        table = self._tables.get(namespace)
+        if table is None:
+            table = SortedTable(self._get_filename(namespace))
+            self._tables[namespace] = table
+        return table
+
+    def _close_tables(self):
+        for table in self._tables.values():
+            table.close()
+        self._tables = {}
+
+    def add_record(self, filetag, startpos, length, table):
+        if not self._sorters:
+            raise TypeError("Database is open read-only")
+        key_list = table[self.primary_namespace]
+        if len(key_list) != 1:
+            raise TypeError(
+                "Field %s has %d entries but must have only one "
+                "(must be unique)" % (repr(self.primary_namespace),
+                                      len(key_list)))
+        fileid = int(filetag)
+        self._sorters[self.primary_namespace].add(_as_key(key_list[0]),
+                                                  fileid, startpos, length)
+        for namespace in self.secondary_namespaces:
+            sorter = self._sorters[namespace]
+            for val in table.get(namespace, ()):
+                sorter.add(_as_key(val), fileid, startpos, length)
+        self._need_flush = 1
+
+    def flush(self):
+        if not self._need_flush:
+            return
+        # The index files are replaced, so let go of the old maps
+        self._close_tables()
+        # The primary keys go first, if any are repeated nothing is added
+        try:
+            self._sorters[self.primary_namespace].finish(
+                unique = self.primary_namespace)
+        except TypeError:
+            for sorter in self._sorters.values():
+                sorter.discard()
+            self._need_flush = 0
+            raise
+        for namespace in self.secondary_namespaces:
+            self._sorters[namespace].finish()
+        config_filename = os.path.join(self.dbname, "config.dat")
+        BaseDB.write_config(config_filename = config_filename,
+                            index_type = INDEX_TYPE,
+                            primary_namespace = self.primary_namespace,
+                            secondary_namespaces = self.secondary_namespaces,
+                            fileid_info = self.fileid_info,
+                            formatname = self.formatname,
+                      )
+        self._need_flush = 0
+
+    def close(self):
+        self.flush()
+        self._close_tables()
+        self._sorters = self.fileid_info = self.filename_map = None
+
+    def __del__(self):
+        if self._sorters:
+            self.close()
+
+    def __getitem__(self, namespace):
+        """return the database table lookup for the given namespace"""
+        if namespace == self.primary_namespace:
+            return PrimaryNamespace(self, namespace)
+        if namespace in self.secondary_namespaces:
+            return SecondaryNamespace(self, namespace)
+        raise KeyError(namespace)
+
+
+def create(dbname, primary_namespace, secondary_namespaces,
+           formatname = "unknown", run_size = None):
+    os.mkdir(dbname)
+    config_filename = os.path.join(dbname, "config.dat")
+    BaseDB.write_config(config_filename = config_filename,
+                        index_type = INDEX_TYPE,
+                        primary_namespace = primary_namespace,
+                        secondary_namespaces = secondary_namespaces,
+                        fileid_info = {},
+                        formatname = formatname,
+                        )
+    for namespace in [primary_namespace] + list(secondary_namespaces):
+        if namespace == primary_namespace:
+            filename = os.path.join(dbname, "key_%s.key" % (namespace,))
+        else:
+            filename = os.path.join(dbname, "id_%s.index" % (namespace,))
+        outfile = _open(filename, "wb")
+        outfile.write(_header.pack(_MAGIC, 0))
+        outfile.close()
+    return open(dbname, "rw", run_size)
+
+def open(dbname, mode = "r", run_size = None):
+    if mode == "a":
+        raise TypeError("Must call MmapDB.create to create the database")
+    return MmapDB(dbname, mode, run_size)
@@ -26,6 +26,9 @@ def open(dbname, mode = "r"):
     elif line == "index\tflat/1":
         import FlatDB
         return FlatDB.open(dbname, mode)
+    elif line == "index\tmmap/1":
+        import MmapDB
+        return MmapDB.open(dbname, mode)
 
     raise TypeError("Unknown index type: %r" % (line,))
     
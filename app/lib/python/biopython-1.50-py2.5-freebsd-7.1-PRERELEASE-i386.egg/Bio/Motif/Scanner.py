@@ -0,0 +1,265 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+"""Fast scanning of sequences with position weight matrices (requires NumPy).
+
+The PWMScanner class takes one or more Motif objects and scores every
+window of a sequence on both strands, giving the same scores as the
+Motif.score_hit and Motif.search_pwm methods.
+
+The log odds matrices are "compiled" once into lookup tables over short
+words of the sequence (e.g. all words of five letters, for DNA), and the
+sequence is encoded once as an array of word codes shared by all the
+motifs.  Each motif then needs one array lookup per word instead of one
+per letter.  The words with the largest score ranges are added first,
+and any window which could no longer reach the threshold (even taking
+the best letters for the rest of the motif) is dropped straight away.
+"""
+
+import numpy
+
+#Largest lookup table to build for each word of the motifs
+_MAX_TABLE = 4096
+
+class PWMScanner(object):
+    """Scores sequences with one or more motifs at once.
+
+    e.g.
+
+    >>> from Bio.Motif import Motif
+    >>> from Bio.Motif.Scanner import PWMScanner
+    >>> from Bio.Seq import Seq
+    >>> from Bio.Alphabet import IUPAC
+    >>> motif = Motif()
+    >>> motif.add_instance(Seq("TATAA", IUPAC.unambiguous_dna))
+    >>> motif.add_instance(Seq("TATTA", IUPAC.unambiguous_dna))
+    >>> scanner = PWMScanner([motif])
+    >>> for index, position, score in scanner.search("GGTATAAGGTTATAGG", 5.0) :
+    ...     print index, position, round(score, 3)
+    0 2 7.077
+    0 -9 7.077
+    """
+    def __init__(self, motifs, normalized=0, masked=0, both=True,
+                 chunk_size=1000000) :
+        """Create a scanner for a list of Motif objects.
+
+         - motifs     - list of Motif objects, all using the same letters
+         - normalized - divide the scores by the (unmasked) motif length,
+                        as in Motif.score_hit
+         - masked     - only score the columns included in each motif's mask
+         - both       - also score the reverse complement of each motif
+         - chunk_size - number of windows scored at a time, which limits
+                        the memory used for long sequences
+
+        Changing the motifs afterwards does not change the scanner.
+        """
+        self.motifs = list(motifs)
+        if not self.motifs :
+            raise ValueError("Need at least one motif")
+        letters = self.motifs[0].alphabet.letters
+        for motif in self.motifs :
+            if motif.alphabet.letters != letters :
+                raise ValueError("All the motifs must use the same letters")
+        self.letters = letters
+        self.normalized = normalized
+        self.masked = masked
+        self.both = both
+        self.chunk_size = chunk_size
+
+        #Letters not in the alphabet (e.g. N) get an extra code which
+        #scores zero, as they are ignored by Motif.score_hit
+        size = len(letters) + 1
+        width = 1
+        while size ** (width + 1) <= _MAX_TABLE :
+            width += 1
+        self._size = size
+        self._width = width
+        self._lut = numpy.zeros(256, numpy.int32) + len(letters)
+        for i, letter in enumerate(letters) :
+            self._lut[ord(letter)] = i
+
+        #For each motif, a list of the compiled strands
+        self._compiled = []
+        self._max_length = 0
+        for motif in self.motifs :
+            strands = [self._compile(motif.log_odds(), motif)]
+            if both :
+                rc = motif.reverse_complement()
+                strands.append(self._compile(rc.log_odds(), motif))
+            self._compiled.append(strands)
+            self._max_length = max(self._max_length, motif.length)
+
+    def _compile(self, log_odds, motif) :
+        """Turns a log odds matrix into lookup tables for each word (PRIVATE).
+
+        Returns a tuple of the tables, the word offsets in the order to
+        score them, the best possible score from the remaining words
+        after each, and the normalising denominator.
+        """
+        size, width = self._size, self._width
+        length = motif.length
+        blocks = (length + width - 1) // width
+        matrix = numpy.zeros((blocks * width, size), float)
+        for pos in range(length) :
+            if self.masked and not motif.mask[pos] :
+                continue
+            for i, letter in enumerate(self.letters) :
+                if letter in log_odds[pos] :
+                    matrix[pos, i] = log_odds[pos][letter]
+        if self.normalized :
+            if self.masked :
+                denominator = float(len(filter(lambda x: x, motif.mask)))
+            else :
+                denominator = float(length)
+        else :
+            denominator = None
+
+        codes = numpy.arange(size ** width)
+        tables = numpy.zeros((blocks, size ** width), float)
+        for block in range(blocks) :
+            for j in range(width) :
+                digits = (codes // size ** (width - 1 - j)) % size
+                tables[block] += matrix[block * width + j][digits]
+        #Score the most informative words first, to drop windows sooner
+        spread = tables.max(axis=1) - tables.min(axis=1)
+        order = numpy.argsort(-spread, kind="mergesort")
+        best = tables.max(axis=1)[order]
+        remaining = numpy.concatenate((numpy.cumsum(best[::-1])[::-1][1:],
+                                       [0.0]))
+        return (tables[order], order * width, remaining, denominator)
+
+    def _encode(self, text) :
+        """Returns the word codes starting at each letter of the text (PRIVATE).
+
+        The text is padded with unknown letters so that every word
+        starting within it is complete.
+        """
+        size, width = self._size, self._width
+        letters = self._lut[numpy.fromstring(text, numpy.uint8)]
+        pad = numpy.zeros(width - 1, numpy.int32) + (size - 1)
+        letters = numpy.concatenate((letters, pad))
+        words = numpy.zeros(len(text), numpy.int32)
+        for j in range(width) :
+            words *= size
+            words += letters[j:j+len(text)]
+        return words
+
+    def _score(self, words, windows, compiled, threshold) :
+        """Returns positions and scores of windows above the threshold (PRIVATE)."""
+        tables, offsets, remaining, denominator = compiled
+        if denominator is None :
+            raw_threshold = threshold
+        else :
+            raw_threshold = threshold * denominator
+        #Allow for rounding errors when dropping windows early
+        slack = 1e-6 * (1 + abs(raw_threshold))
+        scores = tables[0].take(words[offsets[0]:offsets[0]+windows])
+        positions = numpy.flatnonzero(scores > raw_threshold - slack \
+                                      - remaining[0])
+        if len(positions) < windows :
+            scores = scores[positions]
+        for i in range(1, len(offsets)) :
+            scores += tables[i].take(words.take(positions + offsets[i]))
+            keep = numpy.flatnonzero(scores + remaining[i] \
+                                     > raw_threshold - slack)
+            if len(keep) < len(positions) :
+                positions = positions[keep]
+                scores = scores[keep]
+        if denominator is not None :
+            scores = scores / denominator
+        keep = numpy.flatnonzero(scores > threshold)
+        return positions[keep], scores[keep]
+
+    def search(self, sequence, threshold=0.0) :
+        """Generator returning the hits (windows scoring above the threshold).
+
+         - sequence  - Seq object or string (case insensitive)
+         - threshold - minimum score (exclusive), either a single value or
+                       a list with one value for each motif
+
+        Returns tuples of the motif index, position and score.  As in
+        Motif.search_pwm, hits of the reverse complement are given with
+        a negative position.  The hits are returned a chunk of the sequence
+        at a time, ordered by motif, then position (with the forward
+        strand first).
+        """
+        try :
+            text = sequence.tostring()
+        except AttributeError :
+            text = str(sequence)
+        text = text.upper()
+        try :
+            thresholds = list(threshold)
+        except TypeError :
+            thresholds = [threshold] * len(self.motifs)
+        if len(thresholds) != len(self.motifs) :
+            raise ValueError("Need one threshold for each motif")
+
+        for start in xrange(0, len(text), self.chunk_size) :
+            end = min(start + self.chunk_size, len(text))
+            words = self._encode(text[start:end + self._max_length - 1])
+            for index, motif in enumerate(self.motifs) :
+                windows = min(end, len(text) - motif.length + 1) - start
+                if windows <= 0 :
+                    continue
+                hits = []
+                for strand, compiled in enumerate(self._compiled[index]) :
+                    positions, scores = self._score(words, windows, compiled,
+                                                    thresholds[index])
+                    hits.append((positions, scores, strand))
+                for position, score, strand in _merge_strands(hits, start) :
+                    if strand :
+                        yield index, -position, score
+                    else :
+                        yield index, position, score
+
+    def calculate(self, sequence, index=0) :
+        """Returns arrays of the scores of every window for one motif.
+
+        Returns a tuple of the forward strand scores and (if the scanner
+        was created with both=True) the reverse complement scores, one
+        for each window, i.e. of length len(sequence) - motif.length + 1.
+        """
+        try :
+            text = sequence.tostring()
+        except AttributeError :
+            text = str(sequence)
+        text = text.upper()
+        windows = len(text) - self.motifs[index].length + 1
+        if windows <= 0 :
+            return tuple([numpy.zeros(0, float) \
+                          for compiled in self._compiled[index]])
+        words = self._encode(text)
+        answer = []
+        for compiled in self._compiled[index] :
+            scores = numpy.empty(windows, float)
+            positions, values = self._score(words, windows, compiled,
+                                            -numpy.inf)
+            scores[positions] = values
+            answer.append(scores)
+        return tuple(answer)
+
+def _merge_strands(hits, offset) :
+    """Merges the hits of each strand by position (PRIVATE)."""
+    if len(hits) == 1 :
+        positions, scores, strand = hits[0]
+        return [(p + offset, s, strand) for (p, s) \
+                in zip(positions.tolist(), scores.tolist())]
+    positions = numpy.concatenate([h[0] for h in hits])
+    scores = numpy.concatenate([h[1] for h in hits])
+    strands = numpy.concatenate([numpy.zeros(len(h[0]), int) + h[2] \
+                                 for h in hits])
+    order = numpy.argsort(positions * 2 + strands, kind="mergesort")
+    return zip((positions[order] + offset).tolist(),
+               scores[order].tolist(),
+               strands[order].tolist())
+
+def _test():
+    """Run the Bio.Motif.Scanner module's doctests."""
+    print "Runing doctests..."
+    import doctest
+    doctest.testmod()
+    print "Done"
+
+if __name__ == "__main__":
+    _test()
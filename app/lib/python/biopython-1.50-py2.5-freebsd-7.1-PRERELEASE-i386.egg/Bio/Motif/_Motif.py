@@ -30,6 +30,7 @@ class Motif(object):
         self._pwm = []
         self._log_odds_is_current = False
         self._log_odds = []
+        self._scanners = {}
         self.alphabet=alphabet
         self.length=None
         self.background=dict(map(lambda n: (n,1.0/len(self.alphabet.letters)), self.alphabet.letters))
@@ -65,8 +66,7 @@ class Motif(object):
             self.instances.append(instance)
             self.has_instances=True
             
-        self._pwm_is_current = False
-        self._log_odds_is_current = False
+        self._invalidate()
 
  
     def set_mask(self,mask):
@@ -84,6 +84,20 @@ class Motif(object):
                 self.mask.append(0)
             else:
                 raise ValueError("Mask should contain only '*' or ' ' and not a '%s'"%char)
+        self._invalidate()
+
+    def _invalidate(self):
+        """Forget the cached pwm, log odds and scanners (PRIVATE).
+
+        Called whenever the instances, counts or mask change.
+        """
+        self._pwm_is_current = False
+        self._log_odds_is_current = False
+        self._scanners = {}
+
+    def _cache_key(self,laplace):
+        """Settings the cached pwm and log odds depend on (PRIVATE)."""
+        return (laplace, self.beta, tuple(sorted(self.background.items())))
     
     def pwm(self,laplace=True):
         """
@@ -92,9 +106,12 @@ class Motif(object):
         if laplace=True (default), pseudocounts equal to self.background multiplied by self.beta are added to all positions.
         """
         
-        if self._pwm_is_current:
+        key = self._cache_key(laplace)
+        if self._pwm_is_current and self._pwm_key == key:
             return self._pwm
         #we need to compute new pwm
+        self._log_odds_is_current = False
+        self._pwm_key = key
         self._pwm = []
         for i in xrange(self.length):
             dict = {}
@@ -122,11 +139,13 @@ class Motif(object):
         returns the logg odds matrix computed for the set of instances
         """
         
-        if self._log_odds_is_current:
+        key = self._cache_key(laplace)
+        if self._log_odds_is_current and self._log_odds_key == key:
             return self._log_odds
-        #we need to compute new pwm
-        self._log_odds = []
+        #we need to compute new log odds
         pwm=self.pwm(laplace)
+        self._log_odds_key = key
+        self._log_odds = []
         for i in xrange(self.length):
             d = {}
             for a in self.alphabet.letters:
@@ -203,7 +222,28 @@ class Motif(object):
     def search_pwm(self,sequence,normalized=0,masked=0,threshold=0.0,both=True):
         """
         a generator function, returning found hits in a given sequence with the pwm score higher than the threshold
+
+        If NumPy is available, this uses a Bio.Motif.Scanner.PWMScanner
+        (cached until the motif changes) to score all the windows at once.
         """
+        #The scanner scores with log_odds(), so it depends on the
+        #background and beta too
+        key = (normalized, masked, both, self._cache_key(True))
+        try:
+            scanner = self._scanners[key]
+        except KeyError:
+            try:
+                from Bio.Motif.Scanner import PWMScanner
+            except ImportError:
+                scanner = None
+            else:
+                scanner = PWMScanner([self],normalized,masked,both)
+            self._scanners[key] = scanner
+        if scanner is not None:
+            for index,pos,score in scanner.search(sequence,threshold):
+                yield (pos,score)
+            return
+
         if both:
             rc = self.reverse_complement()
             
@@ -416,10 +456,11 @@ class Motif(object):
                 res.add_instance(i.reverse_complement())
         else: # has counts
             res.has_counts=True
-            res.counts["A"]=self.counts["T"]
-            res.counts["T"]=self.counts["A"]
-            res.counts["G"]=self.counts["C"]
-            res.counts["C"]=self.counts["G"]
+            #copy the lists, so reversing them leaves this motif unchanged
+            res.counts["A"]=self.counts["T"][:]
+            res.counts["T"]=self.counts["A"][:]
+            res.counts["G"]=self.counts["C"][:]
+            res.counts["C"]=self.counts["G"][:]
             res.counts["A"].reverse()
             res.counts["C"].reverse()
             res.counts["G"].reverse()
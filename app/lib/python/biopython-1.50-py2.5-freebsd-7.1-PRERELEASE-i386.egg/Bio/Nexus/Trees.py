@@ -23,6 +23,11 @@ except NameError:
     #For python 2.3 fall back on the sets module (deprecated in python 2.6)
     from sets import Set as set
     from sets import ImmutableSet as frozenset
+try:
+    import numpy
+except ImportError:
+    #Only needed for Tree.distance_matrix
+    numpy = None
 
 PRECISION_BRANCHLENGTH=6
 PRECISION_SUPPORT=6
@@ -31,6 +36,116 @@ NODECOMMENT_END=']'
 
 class TreeError(Exception): pass
 
+class _TreeIndex:
+    """Euler tour of a tree, for constant time common ancestor queries (PRIVATE).
+
+    The nodes are listed in the order they are visited by a depth first walk
+    from the root (every internal node again after each of its subclades),
+    and a sparse table holds the position of the shallowest node in each
+    stretch of 2**k positions of the tour.  The common ancestor of two nodes
+    is the shallowest node between their first visits, found from two
+    overlapping stretches.  The distance (sum of branchlengths) of each node
+    from the root is also kept.
+    """
+    def __init__(self,tree):
+        chain=tree.chain
+        root=tree.root
+        euler=[root]
+        depths=[0]
+        first={root:0}
+        root_distance={root:0.0}
+        # iterative rather than recursive, trees can be very deep
+        stack=[(root,0,iter(chain[root].succ))]
+        while stack:
+            node,depth,children=stack[-1]
+            for child in children:
+                root_distance[child]=root_distance[node]+chain[child].data.branchlength
+                first[child]=len(euler)
+                euler.append(child)
+                depths.append(depth+1)
+                stack.append((child,depth+1,iter(chain[child].succ)))
+                break
+            else:
+                stack.pop()
+                if stack:
+                    euler.append(stack[-1][0])
+                    depths.append(depth-1)
+        # table[k][i] is the position of the shallowest node in euler[i:i+2**k]
+        size=len(euler)
+        table=[range(size)]
+        k=1
+        while (1<<k)<=size:
+            last=table[-1]
+            half=1<<(k-1)
+            row=[]
+            for i in xrange(size-(1<<k)+1):
+                a=last[i]
+                b=last[i+half]
+                if depths[b]<depths[a]:
+                    a=b
+                row.append(a)
+            table.append(row)
+            k+=1
+        # log2[n] is the largest k with 2**k<=n
+        log2=[0,0]
+        for n in xrange(2,size+1):
+            log2.append(log2[n//2]+1)
+        self.euler=euler
+        self.depths=depths
+        self.first=first
+        self.root_distance=root_distance
+        self.table=table
+        self.log2=log2
+
+    def _first(self,node):
+        try:
+            return self.first[node]
+        except KeyError:
+            raise TreeError('Unknown node_id (or node not connected to the root): %s' % node)
+
+    def common_ancestor(self,node1,node2):
+        left=self._first(node1)
+        right=self._first(node2)
+        if left>right:
+            left,right=right,left
+        k=self.log2[right-left+1]
+        a=self.table[k][left]
+        b=self.table[k][right-(1<<k)+1]
+        if self.depths[b]<self.depths[a]:
+            a=b
+        return self.euler[a]
+
+    def distance(self,node1,node2):
+        ca=self.common_ancestor(node1,node2)
+        return self.root_distance[node1]+self.root_distance[node2]-2*self.root_distance[ca]
+
+    def distance_matrix(self,nodes,block_size=1000000):
+        """Matrix of the distances between all pairs of nodes, using numpy."""
+        size=len(self.euler)
+        table=numpy.zeros((len(self.table),size),int)
+        for k,row in enumerate(self.table):
+            table[k,:len(row)]=row
+        depths=numpy.array(self.depths)
+        log2=numpy.array(self.log2)
+        euler_distance=numpy.array([self.root_distance[n] for n in self.euler],float)
+        first=numpy.array([self._first(n) for n in nodes],int)
+        distance=numpy.array([self.root_distance[n] for n in nodes],float)
+        n=len(nodes)
+        matrix=numpy.zeros((n,n),float)
+        # a block of rows at a time, to limit the size of the temporary arrays
+        rows=max(1,block_size//max(n,1))
+        for start in range(0,n,rows):
+            stop=min(n,start+rows)
+            left=numpy.minimum(first[start:stop,None],first[None,:])
+            right=numpy.maximum(first[start:stop,None],first[None,:])
+            k=log2[right-left+1]
+            a=table[k,left]
+            b=table[k,right-(1<<k)+1]
+            ancestor=numpy.where(depths[b]<depths[a],b,a)
+            matrix[start:stop]=distance[start:stop,None]+distance[None,:] \
+                               -2*euler_distance[ancestor]
+        return matrix
+
 class NodeData:
     """Stores tree-relevant data associated with nodes (e.g. branches or otus)."""
     def __init__(self,taxon=None,branchlength=0.0,support=None,comment=None):
@@ -52,9 +167,15 @@ class Tree(Nodes.Chain):
     ## so that nodes that are generated have easy access to the data class
     ## Some routines use automatically NodeData, this needs to be more concise
 
-    def __init__(self,tree=None,weight=1.0,rooted=False,name='',data=NodeData,values_are_support=False,max_support=1.0):
-        """Ntree(self,tree)."""
+    def __init__(self,tree=None,weight=1.0,rooted=False,name='',data=NodeData,values_are_support=False,max_support=1.0,indexed=False):
+        """Ntree(self,tree).
+
+        If indexed is True, common_ancestor and distance use an index of the
+        tree (see build_index), rather than tracing the paths from the root.
+        """
         Nodes.Chain.__init__(self)
+        self.indexed=indexed
+        self._index=None
         self.dataclass=data
         self.__values_are_support=values_are_support
         self.max_support=max_support
@@ -184,6 +305,51 @@ class Tree(Nodes.Chain):
             for sn in self._walk(n):
                 yield sn
 
+    # Changes to the tree structure invalidate the index
+
+    def add(self,node,prev=None):
+        self._index=None
+        return Nodes.Chain.add(self,node,prev)
+
+    def collapse(self,id):
+        self._index=None
+        return Nodes.Chain.collapse(self,id)
+
+    def kill(self,id):
+        self._index=None
+        return Nodes.Chain.kill(self,id)
+
+    def unlink(self,id):
+        self._index=None
+        return Nodes.Chain.unlink(self,id)
+
+    def link(self,parent,child):
+        self._index=None
+        return Nodes.Chain.link(self,parent,child)
+
+    def build_index(self):
+        """Index the tree for fast common ancestor and distance queries.
+
+        This records an Euler tour of the tree (with a sparse table of the
+        shallowest node in each stretch of it) and the distance of every
+        node from the root, so common_ancestor and distance take constant
+        time.  With indexed=True the index is built when first needed, and
+        rebuilt after the tree structure is changed (e.g. by split, prune or
+        collapse).  Call invalidate_index after changing branchlengths or the
+        node links directly.
+        """
+        self._index=_TreeIndex(self)
+        return self._index
+
+    def invalidate_index(self):
+        """Discard the index, e.g. after changing branchlengths."""
+        self._index=None
+
+    def _get_index(self):
+        if self._index is None:
+            return self.build_index()
+        return self._index
+
     def node(self,node_id):
         """Return the instance of node_id.
         
@@ -406,8 +572,10 @@ class Tree(Nodes.Chain):
         node_id = common_ancestor(self,node1,node2)
         """
         
+        if self.indexed:
+            return self._get_index().common_ancestor(node1,node2)
         l1=[self.root]+self.trace(self.root,node1)
-        l2=[self.root]+self.trace(self.root,node2)
+        l2=set([self.root]+self.trace(self.root,node2))
         return [n for n in l1 if n in l2][-1]
 
 
@@ -416,9 +584,29 @@ class Tree(Nodes.Chain):
         dist = distance(self,node1,node2)
         """
         
+        if self.indexed:
+            return self._get_index().distance(node1,node2)
         ca=self.common_ancestor(node1,node2)
         return self.sum_branchlength(ca,node1)+self.sum_branchlength(ca,node2)
 
+    def distance_matrix(self,nodes=None):
+        """Return a numpy array of the distances between all pairs of nodes.
+
+        matrix = distance_matrix(self,nodes=None)
+        nodes is a list of node ids, by default the terminal nodes in the order
+        of get_terminals().  The distances are computed together from the tree
+        index (see build_index), which is kept if the tree is indexed.
+        """
+        if numpy is None:
+            raise ImportError('Tree.distance_matrix needs numpy')
+        if nodes is None:
+            nodes=self.get_terminals()
+        if self.indexed:
+            index=self._get_index()
+        else:
+            index=_TreeIndex(self)
+        return index.distance_matrix(nodes)
+
     def is_monophyletic(self,taxon_list):
         """Return node_id of common ancestor if taxon_list is monophyletic, -1 otherwise.
         
@@ -468,6 +656,7 @@ class Tree(Nodes.Chain):
         for n in self.chain.keys():
             self.node(n).data.support=self.node(n).data.branchlength
             self.node(n).data.branchlength=0.0
+        self._index=None
 
     def convert_absolute_support(self,nrep):
         """Convert absolute support (clade-count) to rel. frequencies.
@@ -503,7 +692,7 @@ class Tree(Nodes.Chain):
         elif ntax != len(taxon_list):
             raise TreeError('Length of taxon list must correspond to ntax.')
         # initiate self with empty root
-        self.__init__()
+        self.__init__(indexed=self.indexed)
         terminals=self.get_terminals()
         # bifurcate randomly at terminal nodes until ntax is reached
         while len(terminals)<ntax:
@@ -13,6 +13,10 @@ from Vector import Vector
 __doc__="Atom class, used in Structure objects."
 
 class Atom:
+    # Defaults for Atoms pickled before the AtomArray was added
+    _atom_array=None
+    _array_index=None
+
     def __init__(self, name, coord, bfactor, occupancy, altloc, fullname, serial_number):
         """
         Atom object.
@@ -60,6 +64,9 @@ class Atom:
         self.serial_number=serial_number
         # Dictionary that keeps addictional properties
         self.xtra={}
+        # AtomArray holding the coordinates (see Model.get_atom_array)
+        self._atom_array=None
+        self._array_index=None
 
     # Special methods   
 
@@ -87,15 +94,23 @@ class Atom:
 
     def set_bfactor(self, bfactor):
         self.bfactor=bfactor
+        if self._atom_array is not None:
+            self._atom_array.bfactor[self._array_index]=bfactor
 
     def set_coord(self, coord):
-        self.coord=coord
+        if self._atom_array is not None:
+            # keep sharing the row of the AtomArray
+            self.coord[:]=coord
+        else:
+            self.coord=coord
 
     def set_altloc(self, altloc):
         self.altloc=altloc
 
     def set_occupancy(self, occupancy):
         self.occupancy=occupancy
+        if self._atom_array is not None:
+            self._atom_array.occupancy[self._array_index]=occupancy
 
     def set_sigatm(self, sigatm_array):
         """
@@ -129,6 +144,28 @@ class Atom:
         self.anisou_array=anisou_array
 
 
+    def __getstate__(self):
+        """Return the state to pickle (or copy), without the AtomArray.
+
+        A copied Atom would no longer share the row of the array, so it
+        gets its own coordinates instead.
+        """
+        state=self.__dict__.copy()
+        if state.get("_atom_array") is not None:
+            state["coord"]=self.coord.copy()
+        state["_atom_array"]=None
+        state["_array_index"]=None
+        return state
+
+    def _set_atom_array(self, atom_array, index):
+        """Use row index of an AtomArray for the coordinates (PRIVATE).
+
+        The coord attribute becomes a view of the row.
+        """
+        self._atom_array=atom_array
+        self._array_index=index
+        self.coord=atom_array.coord[index]
+
     # Public methods    
 
     def flag_disorder(self):
@@ -227,8 +264,15 @@ class Atom:
         @param tran: the translation vector
         @type tran: size 3 Numeric array
         """
-        self.coord=numpy.dot(self.coord, rot)+tran
+        if self._atom_array is not None:
+            self.coord[:]=numpy.dot(self.coord, rot)+tran
+        else:
+            self.coord=numpy.dot(self.coord, rot)+tran
         
+    def get_atom_array(self):
+        "Return the AtomArray holding the coordinates, or None."
+        return self._atom_array
+
     def get_vector(self):
         """
         Return coordinates as Vector.
@@ -263,6 +307,10 @@ class DisorderedAtom(DisorderedEntityWrapper):
     def __repr__(self):
         return "<Disordered Atom %s>" % self.get_id() 
 
+    def __getstate__(self):
+        "Return the state to pickle, not that of the selected Atom."
+        return self.__dict__
+
     def disordered_add(self, atom):
         "Add a disordered atom."
         # Add atom to dict, use altloc as key   
@@ -0,0 +1,201 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+import numpy
+
+__doc__="""
+Columnar storage of the atoms in a Model (or any list of atoms).
+
+An AtomArray keeps the coordinates of N atoms in one contiguous N x 3
+array, with parallel arrays of the element, B factor and occupancy.
+The coord attribute of each Atom becomes a view of its row, so operations
+on the whole array (e.g. a rotation, which is a single matrix multiply)
+are seen by the Atom objects without looping over them.
+
+Use Model.get_atom_array() to get the array of a Model.  Atom.set_coord,
+Atom.transform, Atom.set_bfactor and Atom.set_occupancy keep the arrays
+up to date, but assigning to the coord attribute of an Atom directly
+unlinks it from the array.  If atoms are added to or removed from the
+Model, build a new array with Model.build_atom_array().
+"""
+
+def _guess_element(fullname):
+    """Guess the element from the full (PDB column 13-16) atom name (PRIVATE).
+
+    Following the PDB convention the element symbol is right justified in
+    the first two columns (e.g. " CA " is a carbon, "CA  " a calcium),
+    except for hydrogens with four character names such as "HG12".
+    """
+    if fullname[:1] in " 0123456789":
+        return fullname[1:2]
+    if fullname[:1]=="H" and len(fullname.strip())==4:
+        return "H"
+    return fullname[:2].strip()
+
+def _in_values(array, values):
+    """Return a boolean array of the elements of array found in values (PRIVATE).
+
+    Older versions of NumPy have no in1d, and their setmember1d needs
+    arrays without repeats, so each value is compared in turn (there are
+    only a few, e.g. atom names).
+    """
+    mask=numpy.zeros(len(array), bool)
+    for value in values:
+        mask|=array==value
+    return mask
+
+def unfold_atoms(entity_list):
+    """Return all the Atom objects in a list of atoms (or an Entity).
+
+    Every alternative location of a DisorderedAtom is included, so that
+    each Atom object in the list gets a row of the array.
+    """
+    atoms=[]
+    for atom in entity_list:
+        if atom.is_disordered():
+            for altloc in atom.disordered_get_id_list():
+                atoms.append(atom.disordered_get(altloc))
+        else:
+            atoms.append(atom)
+    return atoms
+
+
+class AtomArray:
+    """
+    Contiguous arrays of the coordinates, elements, B factors and
+    occupancies of a list of atoms.
+
+    Attributes:
+    o atoms - list of the Atom objects, in the order of the array rows
+    o coord - N x 3 array of the coordinates
+    o element - array of the element symbols
+    o bfactor - array of the B factors
+    o occupancy - array of the occupancies
+    """
+    def __init__(self, atom_list, dtype="f"):
+        """
+        Arguments:
+        o atom_list - list of Atom objects (e.g. from Model.get_atoms())
+        o dtype - type of the coordinate array, by default single
+        precision like the coordinates read by PDBParser
+        """
+        atoms=unfold_atoms(atom_list)
+        n=len(atoms)
+        self.atoms=atoms
+        self.coord=numpy.zeros((n, 3), dtype)
+        if n:
+            self.coord[:]=[atom.coord for atom in atoms]
+        self.bfactor=numpy.array([atom.bfactor for atom in atoms], float)
+        self.occupancy=numpy.array([atom.occupancy for atom in atoms], float)
+        self.element=numpy.array([_guess_element(atom.fullname) \
+                                  for atom in atoms], "S2")
+        self.name=numpy.array([atom.name for atom in atoms], "S4")
+        # the atoms now share the rows of the array
+        for i in range(0, n):
+            atoms[i]._set_atom_array(self, i)
+
+    # Special methods
+
+    def __len__(self):
+        return len(self.atoms)
+
+    def __repr__(self):
+        return "<AtomArray of %i atoms>" % len(self.atoms)
+
+    # Public methods
+
+    def transform(self, rot, tran, mask=None):
+        """
+        Apply rotation and translation to all (or the selected) atoms.
+
+        @param rot: A right multiplying rotation matrix
+        @type rot: 3x3 Numeric array
+
+        @param tran: the translation vector
+        @type tran: size 3 Numeric array
+
+        @param mask: optional selection of the atoms to move
+        @type mask: boolean array (see get_mask)
+        """
+        if mask is None:
+            # in place, so the views held by the atoms see the change
+            self.coord[:]=numpy.dot(self.coord, rot)+tran
+        else:
+            self.coord[mask]=numpy.dot(self.coord[mask], rot)+tran
+
+    def get_mask(self, names=None, elements=None, center=None, radius=None,
+                 min_occupancy=None, max_bfactor=None):
+        """
+        Return a boolean array selecting the atoms that meet all the
+        given criteria.
+
+        o names - list of atom names (e.g. ["CA", "CB"])
+        o elements - list of element symbols (e.g. ["C", "N"])
+        o center, radius - only atoms within radius of center
+        o min_occupancy - only atoms with at least this occupancy
+        o max_bfactor - only atoms with at most this B factor
+        """
+        mask=numpy.ones(len(self.atoms), bool)
+        if names is not None:
+            mask&=_in_values(self.name, names)
+        if elements is not None:
+            mask&=_in_values(self.element, elements)
+        if center is not None:
+            if radius is None:
+                raise ValueError("A radius is needed with the center")
+            diff=self.coord-numpy.asarray(center)
+            mask&=(diff*diff).sum(axis=1)<=radius*radius
+        if min_occupancy is not None:
+            mask&=self.occupancy>=min_occupancy
+        if max_bfactor is not None:
+            mask&=self.bfactor<=max_bfactor
+        return mask
+
+    def select(self, mask):
+        "Return the list of atoms selected by a boolean mask (or indices)."
+        atoms=self.atoms
+        return [atoms[i] for i in numpy.arange(len(atoms))[mask].tolist()]
+
+    def get_coords(self, mask=None):
+        "Return a copy of the coordinates of all (or the selected) atoms."
+        if mask is None:
+            return self.coord.copy()
+        return self.coord[mask]
+
+    def distance_matrix(self, mask=None, other_mask=None):
+        """
+        Return the matrix of distances between the selected atoms.
+
+        o mask - selects the atoms for the rows (default all)
+        o other_mask - selects the atoms for the columns (default the
+        same as the rows)
+        """
+        a=self.get_coords(mask).astype(float)
+        if other_mask is None:
+            b=a
+        else:
+            b=self.get_coords(other_mask).astype(float)
+        # |a-b|^2 = |a|^2 + |b|^2 - 2 a.b
+        d2=(a*a).sum(axis=1)[:, None]+(b*b).sum(axis=1)[None, :] \
+            -2*numpy.dot(a, b.T)
+        numpy.maximum(d2, 0, d2)
+        return numpy.sqrt(d2)
+
+    def set_bfactors(self, values, mask=None):
+        "Set the B factors of all (or the selected) atoms."
+        if mask is None:
+            self.bfactor[:]=values
+        else:
+            self.bfactor[mask]=values
+        for atom, value in zip(self.atoms, self.bfactor.tolist()):
+            atom.bfactor=value
+
+    def set_occupancies(self, values, mask=None):
+        "Set the occupancies of all (or the selected) atoms."
+        if mask is None:
+            self.occupancy[:]=values
+        else:
+            self.occupancy[mask]=values
+        for atom, value in zip(self.atoms, self.occupancy.tolist()):
+            atom.occupancy=value
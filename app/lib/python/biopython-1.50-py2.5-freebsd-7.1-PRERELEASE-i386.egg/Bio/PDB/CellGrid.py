@@ -0,0 +1,464 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Fixed radius neighbor search using a uniform cell grid (requires NumPy).
+
+This is used by NeighborSearch when the Bio.KDTree C++ module is not
+available, and offers the same search/all_search methods as its KDTree
+class.
+
+The points are binned into cubic cells (with sides no shorter than the
+search radius) and sorted by cell, so the points in any cell are a slice
+of the sorted array.  All the points within the radius of a point are
+then in its own cell or one of the 26 cells around it.  For an all
+against all search only half of these neighbouring cells need to be
+checked, and this is done for a whole block of points at a time using
+array operations.  The NearestIndex class finds the closest point to each
+of a set of query points, using a pyramid of grids with larger cells.
+
+e.g.
+
+>>> import numpy
+>>> from Bio.PDB.CellGrid import all_pairs
+>>> coords = numpy.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [5.0, 0.0, 0.0]])
+>>> first, second = all_pairs(coords, 1.5)
+>>> zip(first.tolist(), second.tolist())
+[(0, 1)]
+"""
+
+import numpy
+
+#The half of the 26 neighbouring cells checked (in addition to the cell
+#itself) when looking for all the pairs of points
+_HALF_OFFSETS = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) \
+                 for dz in (-1, 0, 1) if (dx, dy, dz) > (0, 0, 0)]
+
+class _Cells:
+    """Points sorted by the grid cell they fall in (PRIVATE)."""
+    def __init__(self, coords, cell_size) :
+        self.cell_size = cell_size
+        self.origin = coords.min(axis=0)
+        cells = numpy.floor((coords - self.origin) / cell_size).astype(int)
+        #Pad by one cell on each side, so that the key of a neighbouring
+        #cell is always the key of the cell plus a fixed offset
+        self.shape = cells.max(axis=0) + 3
+        self.strides = numpy.array([self.shape[1] * self.shape[2],
+                                    self.shape[2], 1])
+        keys = numpy.dot(cells + 1, self.strides)
+        self.order = numpy.argsort(keys, kind="mergesort")
+        self.keys = keys[self.order]
+        self.coords = coords[self.order]
+
+    def neighbours(self, point) :
+        """Returns the (sorted) indices of points in the 27 cells around a point."""
+        cell = numpy.floor((point - self.origin) / self.cell_size).astype(int)
+        low = numpy.maximum(cell - 1, -1)
+        high = numpy.minimum(cell + 1, self.shape - 2)
+        if (low > high).any() :
+            return numpy.zeros(0, int)
+        #Each run of cells along z is one slice of the sorted points
+        xs = numpy.arange(low[0], high[0] + 1) + 1
+        ys = numpy.arange(low[1], high[1] + 1) + 1
+        starts = (xs[:, None] * self.strides[0] \
+                  + ys[None, :] * self.strides[1]).ravel()
+        first = numpy.searchsorted(self.keys, starts + low[2] + 1, "left")
+        last = numpy.searchsorted(self.keys, starts + high[2] + 1, "right")
+        return _expand(first, last)
+
+def _expand(first, last) :
+    """Returns the concatenated ranges first[i] to last[i] (PRIVATE)."""
+    counts = last - first
+    total = counts.sum()
+    if not total :
+        return numpy.zeros(0, int)
+    ends = numpy.cumsum(counts)
+    return numpy.arange(total) + numpy.repeat(first - ends + counts, counts)
+
+def _block_pairs(cells, start, end, radius_sq) :
+    """Returns the close pairs for the sorted points start to end (PRIVATE).
+
+    Each pair is found once, from the point with the lower sorted index or
+    the lower cell key.
+    """
+    keys = cells.keys
+    coords = cells.coords
+    block = numpy.arange(start, end)
+    firsts = []
+    seconds = []
+    #Points in the same cell, later in the sorted array
+    last = numpy.searchsorted(keys, keys[start:end], "right")
+    offsets = [0] + [numpy.dot(o, cells.strides) for o in _HALF_OFFSETS]
+    for offset in offsets :
+        if offset :
+            target = keys[start:end] + offset
+            first = numpy.searchsorted(keys, target, "left")
+            last = numpy.searchsorted(keys, target, "right")
+        else :
+            first = block + 1
+        counts = last - first
+        if not counts.any() :
+            continue
+        i = numpy.repeat(block, counts)
+        j = _expand(first, last)
+        diff = coords[i] - coords[j]
+        close = (diff * diff).sum(axis=1) <= radius_sq
+        firsts.append(i[close])
+        seconds.append(j[close])
+    return firsts, seconds
+
+def all_pairs(coords, radius, block_size=20000) :
+    """Returns all pairs of points within radius of each other.
+
+     - coords     - N x 3 array of coordinates
+     - radius     - float
+     - block_size - number of points handled at a time, which limits the
+                    memory used
+
+    Returns two integer arrays of the indices of the first and second point
+    of each pair, with first < second, sorted by the first index and then
+    the second.
+    """
+    coords = numpy.asarray(coords, float)
+    if len(coords) < 2 :
+        return numpy.zeros(0, int), numpy.zeros(0, int)
+    if radius <= 0 :
+        raise ValueError("The radius must be positive")
+    cells = _Cells(coords, float(radius))
+    radius_sq = float(radius) ** 2
+    firsts = []
+    seconds = []
+    for start in xrange(0, len(coords), block_size) :
+        end = min(start + block_size, len(coords))
+        f, s = _block_pairs(cells, start, end, radius_sq)
+        firsts.extend(f)
+        seconds.extend(s)
+    if not firsts :
+        return numpy.zeros(0, int), numpy.zeros(0, int)
+    #Back to the original point numbers
+    first = cells.order[numpy.concatenate(firsts)]
+    second = cells.order[numpy.concatenate(seconds)]
+    swap = first > second
+    first[swap], second[swap] = second[swap], first[swap]
+    #Sorting a single combined key is much faster than numpy.lexsort
+    order = numpy.argsort(first.astype(numpy.int64) * len(coords) + second)
+    return first[order], second[order]
+
+def _nearest_candidates(coords, queries, owner, first, last, best, best_sq) :
+    """Updates the nearest points from runs of candidates (PRIVATE).
+
+    The owner array gives the query point for each run of candidate points
+    (first to last in the coords array), and must be in order.  The best
+    and best_sq arrays hold the index of the nearest point found so far
+    for each query point, and the squared distance to it.
+    """
+    owner = numpy.repeat(owner, last - first)
+    candidate = _expand(first, last)
+    if not len(candidate) :
+        return
+    diff = coords[candidate] - queries[owner]
+    dist_sq = (diff * diff).sum(axis=1)
+    #Take the closest candidate for each query point
+    start = numpy.flatnonzero(numpy.concatenate(([True],
+                                                 owner[1:] != owner[:-1])))
+    lowest = numpy.minimum.reduceat(dist_sq, start)
+    counts = numpy.diff(numpy.concatenate((start, [len(owner)])))
+    hit = numpy.flatnonzero(dist_sq == numpy.repeat(lowest, counts))
+    hit = hit[numpy.concatenate(([True], owner[hit][1:] != owner[hit][:-1]))]
+    owner = owner[hit]
+    closer = dist_sq[hit] < best_sq[owner]
+    best_sq[owner[closer]] = dist_sq[hit][closer]
+    best[owner[closer]] = candidate[hit][closer]
+
+#Most candidate points (or cells) to compare with the query points at once
+_MAX_CANDIDATES = 1000000
+
+def _box_dist_sq(queries, lows, highs) :
+    """Returns the squared distances from points to boxes (PRIVATE)."""
+    gap = numpy.maximum(lows - queries, 0) + numpy.maximum(queries - highs, 0)
+    return (gap * gap).sum(axis=1)
+
+def _group_starts(owner) :
+    """Returns where each run of equal values starts in an array (PRIVATE)."""
+    return numpy.flatnonzero(numpy.concatenate(([True],
+                                                owner[1:] != owner[:-1])))
+
+class NearestIndex:
+    """Index of a set of points, for finding the nearest to query points.
+
+    The points are binned into a pyramid of grids, each with cells twice
+    the size of the one below, and sorted so that the points in any cell
+    (and the cells within any larger cell) are contiguous.  The bounding
+    box of the points in each cell is kept.
+
+    The query points of a block go down the pyramid together, first each
+    following only the closest cell at each level, which gives a good upper
+    bound on the distance to its nearest point.  Then they go down again,
+    following every cell which could hold a closer point.
+
+    >>> import numpy
+    >>> index = NearestIndex(numpy.array([[0.0, 0.0, 0.0], [10.0, 0.0, 0.0]]))
+    >>> found, dist = index.nearest(numpy.array([[1.0, 0.0, 0.0], [9.0, 0.0, 3.0]]))
+    >>> found.tolist(), dist.round(3).tolist()
+    ([0, 1], [1.0, 3.162])
+    """
+    def __init__(self, coords, leaf_size=8, top_size=64) :
+        """Create the index.
+
+         - coords    - N x 3 array of the points to search
+         - leaf_size - rough number of points in each of the smallest cells
+         - top_size  - most cells in the largest grid
+        """
+        coords = numpy.asarray(coords, float)
+        if len(coords.shape) != 2 or coords.shape[1] != 3 :
+            raise ValueError("Expected an N x 3 array of coordinates")
+        if not len(coords) :
+            raise ValueError("Need at least one point to search")
+        origin = coords.min(axis=0)
+        #Start from the cell size giving leaf_size points per cell if the
+        #points filled their box, then adjust for how many cells are used
+        #(e.g. points on a surface use fewer, so more points per cell)
+        extent = coords.max(axis=0) - origin
+        volume = numpy.prod(numpy.maximum(extent, 1.0))
+        cell_size = max((float(leaf_size) * volume / len(coords)) \
+                        ** (1 / 3.0), 1e-3)
+        for attempt in range(5) :
+            cells = numpy.floor((coords - origin) / cell_size).astype(int)
+            shape = cells.max(axis=0) + 1
+            keys = numpy.dot(cells, [shape[1] * shape[2], shape[2], 1])
+            mean = len(coords) / float(len(numpy.unique(keys)))
+            if 0.5 * leaf_size <= mean <= 2 * leaf_size :
+                break
+            #Assume the points per cell go as the area of a cell face
+            cell_size = max(cell_size * (leaf_size / mean) ** 0.5, 1e-3)
+        #Keys for each level of the pyramid, smallest cells first
+        level_keys = []
+        while True :
+            shape = cells.max(axis=0) + 1
+            keys = numpy.dot(cells, [shape[1] * shape[2], shape[2], 1])
+            level_keys.append(keys)
+            if len(numpy.unique(keys)) <= top_size :
+                break
+            cells = cells // 2
+        order = numpy.lexsort(level_keys)
+        self._coords = coords[order]
+        self._order = order
+        #For each level, the start of each cell in the sorted points (plus
+        #the end of the last), and the bounding boxes of the cells
+        self._starts = []
+        self._lows = []
+        self._highs = []
+        for keys in level_keys :
+            keys = keys[order]
+            starts = _group_starts(keys)
+            self._starts.append(numpy.concatenate((starts, [len(keys)])))
+            self._lows.append(numpy.minimum.reduceat(self._coords, starts))
+            self._highs.append(numpy.maximum.reduceat(self._coords, starts))
+        #For each cell above the smallest, its first cell in the level below
+        #(plus the end of the last)
+        self._children = [self._starts[0]]
+        for level in range(1, len(level_keys)) :
+            self._children.append(numpy.searchsorted(self._starts[level - 1],
+                                                     self._starts[level]))
+
+    def __len__(self) :
+        return len(self._coords)
+
+    def nearest(self, queries, block_size=2000) :
+        """Returns the nearest point to each query point.
+
+         - queries    - M x 3 array of the query points
+         - block_size - number of query points handled at a time
+
+        Returns an integer array of the index of the nearest point to each
+        query point, and a float array of the distances to them.
+        """
+        queries = numpy.asarray(queries, float).reshape(-1, 3)
+        best = numpy.zeros(len(queries), int)
+        best_sq = numpy.zeros(len(queries)) + numpy.inf
+        top = len(self._starts) - 1
+        top_cells = numpy.arange(len(self._lows[top]))
+        for start in xrange(0, len(queries), block_size) :
+            q = queries[start:start+block_size]
+            q_best = best[start:start+block_size]
+            q_best_sq = best_sq[start:start+block_size]
+            #Start with every query point paired with every top level cell
+            owner = numpy.repeat(numpy.arange(len(q)), len(top_cells))
+            cell = numpy.tile(top_cells, len(q))
+            self._closest(q, owner, cell, top, q_best, q_best_sq)
+            self._descend(q, owner, cell, top, q_best, q_best_sq)
+            best[start:start+block_size] = q_best
+            best_sq[start:start+block_size] = q_best_sq
+        return self._order[best], numpy.sqrt(best_sq)
+
+    def _children_of(self, owner, cell, level) :
+        """Returns the (query point, cell) pairs one level down (PRIVATE)."""
+        first = self._children[level][cell]
+        last = self._children[level][cell + 1]
+        return numpy.repeat(owner, last - first), _expand(first, last)
+
+    def _closest(self, queries, owner, cell, level, best, best_sq) :
+        """Finds a near point by following the closest cells (PRIVATE).
+
+        The owner and cell arrays give (query point, cell) pairs in order
+        of query point.
+        """
+        while True :
+            dist_sq = _box_dist_sq(queries[owner], self._lows[level][cell],
+                                   self._highs[level][cell])
+            #Keep the closest cell for each query point
+            groups = _group_starts(owner)
+            lowest = numpy.minimum.reduceat(dist_sq, groups)
+            counts = numpy.diff(numpy.concatenate((groups, [len(owner)])))
+            hit = numpy.flatnonzero(dist_sq == numpy.repeat(lowest, counts))
+            hit = hit[_group_starts(owner[hit])]
+            owner = owner[hit]
+            cell = cell[hit]
+            if not level :
+                break
+            owner, cell = self._children_of(owner, cell, level)
+            level -= 1
+        _nearest_candidates(self._coords, queries, owner,
+                            self._starts[0][cell], self._starts[0][cell + 1],
+                            best, best_sq)
+
+    def _descend(self, queries, owner, cell, level, best, best_sq) :
+        """Checks every cell which could hold a closer point (PRIVATE).
+
+        The owner and cell arrays give (query point, cell) pairs in order
+        of query point, and best and best_sq the index of the nearest point
+        found so far for each query point and the squared distance to it.
+        """
+        dist_sq = _box_dist_sq(queries[owner], self._lows[level][cell],
+                               self._highs[level][cell])
+        keep = numpy.flatnonzero(dist_sq < best_sq[owner])
+        owner = owner[keep]
+        cell = cell[keep]
+        first = self._children[level][cell]
+        last = self._children[level][cell + 1]
+        #Handle a limited number of candidates at a time, keeping the
+        #query points in order
+        total = numpy.cumsum(last - first)
+        i = 0
+        while i < len(owner) :
+            offset = total[i] - (last[i] - first[i])
+            j = max(numpy.searchsorted(total, offset + _MAX_CANDIDATES,
+                                       "right"), i + 1)
+            if level :
+                self._descend(queries,
+                              numpy.repeat(owner[i:j], last[i:j] - first[i:j]),
+                              _expand(first[i:j], last[i:j]), level - 1,
+                              best, best_sq)
+            else :
+                _nearest_candidates(self._coords, queries, owner[i:j],
+                                    first[i:j], last[i:j], best, best_sq)
+            i = j
+
+def nearest(coords, queries) :
+    """Returns the nearest point to each query point (see NearestIndex).
+
+     - coords  - N x 3 array of the points to search
+     - queries - M x 3 array of the query points
+
+    Returns an integer array of the index of the nearest point to each query
+    point, and a float array of the distances to them.
+    """
+    return NearestIndex(coords).nearest(queries)
+
+class CellGrid:
+    """Drop in replacement for Bio.KDTree's KDTree class.
+
+    e.g.
+
+    >>> import numpy
+    >>> grid = CellGrid(3)
+    >>> grid.set_coords(numpy.array([[0.0, 0.0, 0.0], [3.0, 4.0, 0.0]]))
+    >>> grid.search(numpy.array([0.0, 0.0, 0.0]), 5.0)
+    >>> grid.get_indices().tolist()
+    [0, 1]
+    >>> grid.get_radii().tolist()
+    [0.0, 5.0]
+    """
+    def __init__(self, dim=3, bucket_size=10) :
+        """Create an empty grid.
+
+        o dim - must be 3
+        o bucket_size - ignored, accepted for compatibility with KDTree
+        """
+        if dim != 3 :
+            raise ValueError("Only three dimensional points are supported")
+        self._coords = None
+        self._cells = None
+        self._indices = numpy.zeros(0, int)
+        self._radii = numpy.zeros(0, float)
+        self._pairs = numpy.zeros((0, 2), int)
+        self._pair_radii = numpy.zeros(0, float)
+
+    def set_coords(self, coords) :
+        """Add the N x 3 array of coordinates to search."""
+        coords = numpy.asarray(coords, float)
+        if len(coords.shape) != 2 or coords.shape[1] != 3 :
+            raise ValueError("Expected an N x 3 array of coordinates")
+        self._coords = coords
+        self._cells = None
+
+    def search(self, center, radius) :
+        """Search all points within radius of center (see get_indices)."""
+        if self._coords is None :
+            raise ValueError("No coordinates set")
+        if radius <= 0 :
+            raise ValueError("The radius must be positive")
+        center = numpy.asarray(center, float).reshape(3)
+        if not len(self._coords) :
+            self._indices = numpy.zeros(0, int)
+            self._radii = numpy.zeros(0, float)
+            return
+        #The grid is built on the first query and reused for others with
+        #a similar radius (so each query checks no more than 27 cells)
+        cells = self._cells
+        if cells is None or not (0.5 * cells.cell_size <= radius \
+                                 <= cells.cell_size) :
+            cells = self._cells = _Cells(self._coords, float(radius))
+        candidates = cells.neighbours(center)
+        diff = cells.coords[candidates] - center
+        dist_sq = (diff * diff).sum(axis=1)
+        close = numpy.flatnonzero(dist_sq <= radius * radius)
+        indices = cells.order[candidates[close]]
+        order = numpy.argsort(indices)
+        self._indices = indices[order]
+        self._radii = numpy.sqrt(dist_sq[close][order])
+
+    def get_indices(self) :
+        """Return the indices of the points found by the last search."""
+        return self._indices
+
+    def get_radii(self) :
+        """Return the distances of the points found by the last search."""
+        return self._radii
+
+    def all_search(self, radius) :
+        """Search all pairs of points within radius (see all_get_indices)."""
+        if self._coords is None :
+            raise ValueError("No coordinates set")
+        first, second = all_pairs(self._coords, radius)
+        self._pairs = numpy.column_stack((first, second))
+        diff = self._coords[first] - self._coords[second]
+        self._pair_radii = numpy.sqrt((diff * diff).sum(axis=1))
+
+    def all_get_indices(self) :
+        """Return the N x 2 array of index pairs found by the last all_search."""
+        return self._pairs
+
+    def all_get_radii(self) :
+        """Return the distances of the pairs found by the last all_search."""
+        return self._pair_radii
+
+def _test():
+    """Run the Bio.PDB.CellGrid module's doctests."""
+    print "Runing doctests..."
+    import doctest
+    doctest.testmod()
+    print "Done"
+
+if __name__ == "__main__":
+    _test()
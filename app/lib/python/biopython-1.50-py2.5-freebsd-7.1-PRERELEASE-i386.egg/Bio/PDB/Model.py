@@ -7,6 +7,7 @@ import os
 
 # My Stuff
 from Entity import Entity
+from AtomArray import AtomArray
 
 __doc__="Model class, used in Structure objects."
 
@@ -18,6 +19,8 @@ class Model(Entity):
     model will be present (with some exceptions). NMR structures 
     normally contain many different models. 
     """
+    # Default for Models pickled before the AtomArray was added
+    atom_array=None
 
     def __init__(self, id):
         """
@@ -25,6 +28,7 @@ class Model(Entity):
         o id - int
         """
         self.level="M"
+        self.atom_array=None
         Entity.__init__(self, id)
 
     # Private methods
@@ -65,3 +69,34 @@ class Model(Entity):
             for a in r:
                 yield a
 
+    def __getstate__(self):
+        """Return the state to pickle (or copy), without the AtomArray.
+
+        The Atoms are pickled without it too, so get_atom_array builds a
+        new one when it is needed.
+        """
+        state=self.__dict__.copy()
+        state["atom_array"]=None
+        return state
+
+    def build_atom_array(self, dtype="f"):
+        """Store the atom coordinates in a new AtomArray and return it.
+
+        The coordinates of all the atoms (including every alternative
+        location of disordered atoms) are copied into one N x 3 array,
+        and each Atom's coord becomes a view of its row, so that e.g.
+        AtomArray.transform moves the whole model with a single matrix
+        multiply.  Call this again after adding or removing atoms.
+
+        Arguments:
+        o dtype - type of the coordinate array
+        """
+        self.atom_array=AtomArray(self.get_atoms(), dtype)
+        return self.atom_array
+
+    def get_atom_array(self):
+        "Return the AtomArray of the model, building it if needed."
+        if self.atom_array is None:
+            return self.build_atom_array()
+        return self.atom_array
+
@@ -5,12 +5,19 @@
 
 import numpy
 
-from Bio.KDTree import *
+try:
+    from Bio.KDTree import KDTree
+except ImportError:
+    # Fall back on the NumPy cell grid if the C++ module is missing
+    from CellGrid import CellGrid as KDTree
 from PDBExceptions import PDBException
 from Selection import unfold_entities, get_unique_parents, entity_levels, \
      uniqueify
 
-__doc__="Fast atom neighbor lookup using a KD tree (implemented in C++)."
+__doc__="""Fast atom neighbor lookup using a KD tree (implemented in C++).
+
+If the Bio.KDTree C++ module is not available, a uniform cell grid
+implemented with NumPy (Bio.PDB.CellGrid) is used instead."""
 
 class NeighborSearch:
     """
@@ -23,6 +30,7 @@ class NeighborSearch:
     a fixed radius of each other.
 
     NeighborSearch makes use of the Bio.KDTree C++ module, so it's fast.
+    Without it, the vectorized cell grid in Bio.PDB.CellGrid is used.
     """
     def __init__(self, atom_list, bucket_size=10):
         """
@@ -82,7 +90,7 @@ class NeighborSearch:
         indices=self.kdt.get_indices()
         n_atom_list=[]
         atom_list=self.atom_list
-        for i in indices:
+        for i in indices.tolist():
             a=atom_list[i]
             n_atom_list.append(a)
         if level=="A":
@@ -104,11 +112,11 @@ class NeighborSearch:
         self.kdt.all_search(radius)
         indices=self.kdt.all_get_indices()
         atom_list=self.atom_list
-        atom_pair_list=[]
-        for i1, i2 in indices:
-            a1=atom_list[i1]
-            a2=atom_list[i2]
-            atom_pair_list.append((a1, a2))
+        # converting the two columns separately is much faster than
+        # making a list of index pairs
+        get_atom=atom_list.__getitem__
+        atom_pair_list=zip(map(get_atom, indices[:, 0].tolist()),
+                           map(get_atom, indices[:, 1].tolist()))
         if level=="A":
             # return atoms
             return atom_pair_list
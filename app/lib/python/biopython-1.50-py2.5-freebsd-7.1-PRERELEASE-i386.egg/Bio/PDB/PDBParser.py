@@ -5,11 +5,13 @@
 
 # Python stuff
 import sys
+import gc
 
 import numpy
 
 # My stuff
 from StructureBuilder import StructureBuilder
+from Atom import Atom
 from PDBExceptions import PDBConstructionException
 from parse_pdb_header import _parse_pdb_header_list
 
@@ -18,13 +20,75 @@ __doc__="Parser for PDB files."
 
 # If PDB spec says "COLUMNS 18-20" this means line[17:20]
 
+# Columns of the ATOM/HETATM record fields used by the fast parser
+_ATOM_COLUMNS={"serial" : (6, 11),
+               "fullname" : (12, 16),
+               "altloc" : (16, 17),
+               "resname" : (17, 20),
+               "chain" : (21, 22),
+               "resseq" : (22, 26),
+               "icode" : (26, 27),
+               "x" : (30, 38),
+               "y" : (38, 46),
+               "z" : (46, 54),
+               "occupancy" : (54, 60),
+               "bfactor" : (60, 66),
+               "segid" : (72, 76)}
+
+# Only the first 80 columns of a record are used
+_RECORD_LENGTH=80
+
+def _column(block, name):
+    """Return a field of all the records as an array of strings (PRIVATE).
+
+    Arguments:
+    o block - N x 80 character array of the records
+    o name - key of _ATOM_COLUMNS
+    """
+    start, end=_ATOM_COLUMNS[name]
+    field=numpy.ascontiguousarray(block[:, start:end])
+    return field.view("S%i" % (end-start)).ravel()
+
+def _convert(strings, type):
+    """Convert an array of strings, in one go if possible (PRIVATE).
+
+    Return the array of values (0 where a string could not be
+    converted), and a list of the indices of such strings.
+    """
+    try:
+        return strings.astype(type), []
+    except ValueError:
+        values=numpy.zeros(len(strings), type)
+        bad=[]
+        for i, text in enumerate(strings.tolist()):
+            try:
+                values[i]=type(text)
+            except ValueError:
+                bad.append(i)
+        return values, bad
+
+def _parse_extra(record_type, line):
+    """Return the array of an ANISOU, SIGUIJ or SIGATM record (PRIVATE)."""
+    if record_type=='ANISOU':
+        anisou=map(float, (line[28:35], line[35:42], line[43:49], line[49:56], line[56:63], line[63:70]))
+        # U's are scaled by 10^4 
+        return (numpy.array(anisou, 'f')/10000.0).astype('f')
+    elif record_type=='SIGUIJ':
+        siguij=map(float, (line[28:35], line[35:42], line[42:49], line[49:56], line[56:63], line[63:70]))
+        # U sigma's are scaled by 10^4
+        return (numpy.array(siguij, 'f')/10000.0).astype('f')
+    else:
+        sigatm=map(float, (line[30:38], line[38:45], line[46:54], line[54:60], line[60:66]))
+        return numpy.array(sigatm, 'f')
+
 
 class PDBParser:
     """
     Parse a PDB file and return a Structure object.
     """
 
-    def __init__(self, PERMISSIVE=1, get_header=0, structure_builder=None):
+    def __init__(self, PERMISSIVE=1, get_header=0, structure_builder=None,
+                 fast=0):
         """
         The PDB parser call a number of standard methods in an aggregated
         StructureBuilder object. Normally this object is instanciated by the
@@ -37,6 +101,11 @@ class PDBParser:
         caught, but some residues or atoms will be missing. THESE EXCEPTIONS 
         ARE DUE TO PROBLEMS IN THE PDB FILE!.
         o structure_builder - an optional user implemented StructureBuilder class. 
+        o fast - int, if 1 the file is read a line at a time rather than all
+        at once, the ATOM/HETATM records of each model are converted into 
+        arrays in one go, and (with the default StructureBuilder) residues 
+        without alternative locations are built in bulk.  The atoms of each 
+        model then share one coordinate array (each Atom's coord is a row).
         """
         if structure_builder!=None:
             self.structure_builder=structure_builder
@@ -46,6 +115,7 @@ class PDBParser:
         self.trailer=None
         self.line_counter=0
         self.PERMISSIVE=PERMISSIVE
+        self.fast=fast
 
     # Public methods
 
@@ -62,11 +132,37 @@ class PDBParser:
         self.structure_builder.init_structure(id)
         if isinstance(file, basestring):
             file=open(file)
-        self._parse(file.readlines())
+        if self.fast:
+            self._fast_parse(file)
+        else:
+            self._parse(file.readlines())
         self.structure_builder.set_header(self.header)
         # Return the Structure instance
         return self.structure_builder.get_structure()
 
+    def get_coordinates(self, file):
+        """Return the atom data of each model as arrays, without Atom objects.
+
+        Returns a list with a dictionary for each model, holding arrays of
+        the ATOM/HETATM record fields in file order: coord (N x 3), 
+        occupancy, bfactor, serial, resseq, hetero (boolean), and the 
+        strings name (stripped), fullname, altloc, resname, chain, icode 
+        and segid.  The header and trailer are read as in get_structure.
+
+        Arguments:
+        o file - name of the PDB file OR an open filehandle
+        """
+        self.header=None
+        self.trailer=None
+        if isinstance(file, basestring):
+            file=open(file)
+        models=[]
+        for model_id, lines, line_numbers, extras in self._iter_models(file):
+            fields=self._atom_fields(lines, line_numbers)
+            fields["name"]=numpy.char.strip(fields["fullname"])
+            models.append(fields)
+        return models
+
     def get_header(self):
         "Return the header."
         return self.header
@@ -233,6 +329,245 @@ class PDBParser:
         self.line_counter=self.line_counter+local_line_counter
         return []
 
+    def _iter_models(self, handle):
+        """Read the file a line at a time, yielding the atoms of each model.
+
+        Yields tuples of the model id, the list of ATOM/HETATM lines, their
+        line numbers, and a list of (atom index, record type, line, line
+        number) tuples for the ANISOU, SIGUIJ and SIGATM records (with the
+        index of the atom they follow in the model, or -1).  Sets the header
+        and trailer (PRIVATE).
+        """
+        header=[]
+        line=None
+        for line in handle:
+            if line[0:6] in ('ATOM  ', 'HETATM', 'MODEL '):
+                break
+            header.append(line)
+        else:
+            line=None
+        self.header=_parse_pdb_header_list(header)
+        self.trailer=[]
+        line_number=len(header)
+        model_id=0
+        lines=None
+        line_numbers=None
+        extras=None
+        while line is not None:
+            line_number+=1
+            record_type=line[0:6]
+            if record_type=='ATOM  ' or record_type=='HETATM':
+                # Initialize the Model - there was no explicit MODEL record
+                if lines is None:
+                    lines=[]
+                    line_numbers=[]
+                    extras=[]
+                lines.append(line)
+                line_numbers.append(line_number)
+            elif record_type in ('ANISOU', 'SIGUIJ', 'SIGATM'):
+                if lines is not None:
+                    extras.append((len(lines)-1, record_type, line, line_number))
+            elif record_type=='MODEL ':
+                if lines is not None:
+                    yield model_id, lines, line_numbers, extras
+                    model_id+=1
+                lines=[]
+                line_numbers=[]
+                extras=[]
+            elif record_type=='ENDMDL':
+                if lines is not None:
+                    yield model_id, lines, line_numbers, extras
+                    model_id+=1
+                lines=None
+            elif record_type=='END   ' or record_type=='CONECT':
+                # End of atomic data, the rest is the trailer
+                self.trailer=[line]
+                self.trailer.extend(handle)
+                break
+            try:
+                line=handle.next()
+            except StopIteration:
+                line=None
+        if lines is not None:
+            yield model_id, lines, line_numbers, extras
+        self.line_counter=line_number
+
+    def _atom_fields(self, lines, line_numbers):
+        """Convert the ATOM/HETATM lines of a model into arrays (PRIVATE).
+
+        The numeric fields are converted for all the lines at once.  The
+        other fields are returned as arrays of strings.
+        """
+        n=len(lines)
+        block=numpy.array(lines, "S%i" % _RECORD_LENGTH)
+        block=block.view("S1").reshape(n, _RECORD_LENGTH)
+        fields={}
+        coord=numpy.zeros((n, 3), 'f')
+        for i, axis in enumerate(("x", "y", "z")):
+            values, bad=_convert(_column(block, axis), float)
+            if bad:
+                raise PDBConstructionException(\
+                    "Invalid or missing coordinate(s) at line %i." \
+                    % line_numbers[bad[0]])
+            coord[:, i]=values
+        fields["coord"]=coord
+        for key, message in (("occupancy", "Invalid or missing occupancy"),
+                             ("bfactor", "Invalid or missing B factor")):
+            values, bad=_convert(_column(block, key), float)
+            for i in bad:
+                self._handle_PDB_exception(message, line_numbers[i])
+            fields[key]=values
+        # missing serial numbers are taken as 0
+        fields["serial"]=_convert(_column(block, "serial"), int)[0]
+        resseq, bad=_convert(_column(block, "resseq"), int)
+        for i in bad:
+            # raises the same error as the standard parser
+            resseq[i]=int(lines[i][22:26].split()[0])
+        fields["resseq"]=resseq
+        fields["hetero"]=(block[:, 0]=="H")
+        for key in ("fullname", "altloc", "resname", "chain", "icode",
+                    "segid"):
+            fields[key]=_column(block, key)
+        return fields
+
+    def _fast_parse(self, handle):
+        "Parse the PDB file a model at a time (PRIVATE)."
+        structure_builder=self.structure_builder
+        # The segid is not reset between models, as in _parse_coordinates
+        self._current_segid=None
+        # The new objects all stay alive, so the cyclic garbage collector
+        # (which would otherwise run over and over while they are built)
+        # is switched off until the structure is complete
+        gc_enabled=gc.isenabled()
+        gc.disable()
+        try:
+            for model_id, lines, line_numbers, extras in self._iter_models(handle):
+                structure_builder.set_line_counter(line_numbers and line_numbers[0] or self.line_counter)
+                structure_builder.init_model(model_id)
+                extra_dict={}
+                for index, record_type, line, line_number in extras:
+                    extra_dict.setdefault(index, []).append((record_type, line))
+                if lines:
+                    self._build_model(lines, line_numbers, extra_dict)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _build_model(self, lines, line_numbers, extra_dict):
+        "Add the atoms of a model to the structure (PRIVATE)."
+        structure_builder=self.structure_builder
+        fields=self._atom_fields(lines, line_numbers)
+        coord=fields["coord"]
+        bfactors=fields["bfactor"].tolist()
+        occupancies=fields["occupancy"].tolist()
+        serials=fields["serial"].tolist()
+        resseqs=fields["resseq"].tolist()
+        heteros=fields["hetero"].tolist()
+        fullnames=fields["fullname"].tolist()
+        altlocs=fields["altloc"].tolist()
+        resnames=fields["resname"].tolist()
+        chains=fields["chain"].tolist()
+        icodes=fields["icode"].tolist()
+        segids=fields["segid"].tolist()
+        # Atom names without the spaces, unless they have internal spaces
+        name_dict={}
+        for fullname in set(fullnames):
+            split_list=fullname.split()
+            if len(split_list)!=1:
+                name_dict[fullname]=fullname
+            else:
+                name_dict[fullname]=split_list[0]
+        # Residues can only be built in bulk by the standard StructureBuilder
+        bulk=(structure_builder.__class__ is StructureBuilder)
+        n=len(lines)
+        current_chain_id=None
+        current_residue_id=None
+        current_resname=None
+        start=0
+        while start<n:
+            # Find the atoms of this residue
+            chainid=chains[start]
+            resname=resnames[start]
+            resseq=resseqs[start]
+            icode=icodes[start]
+            hetero_flag=self._hetero_flag(heteros[start], resname)
+            residue_id=(hetero_flag, resseq, icode)
+            end=start+1
+            while end<n and chains[end]==chainid and resnames[end]==resname \
+                  and resseqs[end]==resseq and icodes[end]==icode \
+                  and heteros[end]==heteros[start]:
+                end+=1
+            line_number=line_numbers[start]
+            structure_builder.set_line_counter(line_number)
+            if self._current_segid!=segids[start]:
+                self._current_segid=segids[start]
+                structure_builder.init_seg(self._current_segid)
+            if current_chain_id!=chainid:
+                current_chain_id=chainid
+                structure_builder.init_chain(current_chain_id)
+                new_residue=1
+            else:
+                new_residue=(current_residue_id!=residue_id or current_resname!=resname)
+            if new_residue:
+                current_residue_id=residue_id
+                current_resname=resname
+                try:
+                    structure_builder.init_residue(resname, hetero_flag, resseq, icode)
+                except PDBConstructionException, message:
+                    self._handle_PDB_exception(message, line_number)
+            names=[name_dict[fullnames[i]] for i in range(start, end)]
+            residue=None
+            if bulk and new_residue:
+                residue=structure_builder.residue
+                if residue is None or residue.is_disordered() or len(residue) \
+                   or len(set(names))!=len(names) \
+                   or altlocs[start:end].count(" ")!=end-start:
+                    residue=None
+            if residue is not None:
+                # Plain residue without any alternative locations
+                for i in range(start, end):
+                    atom=Atom(names[i-start], coord[i], bfactors[i],
+                              occupancies[i], " ", fullnames[i], serials[i])
+                    atom.parent=residue
+                    residue.child_list.append(atom)
+                    residue.child_dict[atom.id]=atom
+                    for record_type, line in extra_dict.get(i, []):
+                        if record_type=='ANISOU':
+                            atom.set_anisou(_parse_extra(record_type, line))
+                        elif record_type=='SIGUIJ':
+                            atom.set_siguij(_parse_extra(record_type, line))
+                        else:
+                            atom.set_sigatm(_parse_extra(record_type, line))
+                structure_builder.atom=atom
+            else:
+                for i in range(start, end):
+                    structure_builder.set_line_counter(line_numbers[i])
+                    try:
+                        structure_builder.init_atom(names[i-start], coord[i],
+                                bfactors[i], occupancies[i], altlocs[i],
+                                fullnames[i], serials[i])
+                    except PDBConstructionException, message:
+                        self._handle_PDB_exception(message, line_numbers[i])
+                    for record_type, line in extra_dict.get(i, []):
+                        if record_type=='ANISOU':
+                            structure_builder.set_anisou(_parse_extra(record_type, line))
+                        elif record_type=='SIGUIJ':
+                            structure_builder.set_siguij(_parse_extra(record_type, line))
+                        else:
+                            structure_builder.set_sigatm(_parse_extra(record_type, line))
+            if self._current_segid!=segids[end-1]:
+                self._current_segid=segids[end-1]
+                structure_builder.init_seg(self._current_segid)
+            start=end
+
+    def _hetero_flag(self, hetero, resname):
+        "Return the hetero flag of a residue (PRIVATE)."
+        if hetero:
+            if resname=="HOH" or resname=="WAT":
+                return "W"
+            return "H"
+        return " "
+
     def _handle_PDB_exception(self, message, line_counter):
         """
         This method catches an exception that occurs in the StructureBuilder
@@ -7,9 +7,11 @@ import numpy
 import tempfile
 import os
 import sys
+import weakref
 
 from Bio.PDB import *
 from AbstractPropertyMap import AbstractPropertyMap
+from CellGrid import NearestIndex
 
 __doc__="""
 Calculation of residue depth (using Michel Sanner's MSMS program for the
@@ -44,6 +46,16 @@ Direct MSMS interface:
     of the atoms in a residue):
 
     rd=residue_depth(residue, surface)
+
+    The depths of all the atoms of the residue's structure are
+    calculated the first time (using an index of the surface 
+    vertices), and kept for the next residue using the same 
+    surface, until the surface is freed.  Atoms which have moved
+    since are measured again.
+
+    Distances of many atoms from the surface at once:
+
+        dists=min_dists(coords, surface)
 """
 
 def _read_vertex_array(filename):
@@ -97,9 +109,95 @@ def min_dist(coord, surface):
     and surface.
     """
     d=surface-coord
-    d2=sum(d*d, 1)
+    d2=numpy.sum(d*d, 1)
     return numpy.sqrt(min(d2))
 
+# For each surface in use (by id), a weak reference to it, the NearestIndex
+# of its vertices, and the depths of the atoms measured from it.  The
+# entry goes when the surface is freed.  The depths are kept by id(atom)
+# with the coordinates they were calculated for, so the cache keeps no
+# structure alive, and atoms which have moved are measured again.
+_surface_cache={}
+
+def _get_surface_cache(surface):
+    "Return the NearestIndex and atom depths dictionary of a surface (PRIVATE)."
+    key=id(surface)
+    entry=_surface_cache.get(key)
+    if entry is not None and entry[0]() is surface:
+        return entry[1], entry[2]
+    def forget(ref, key=key):
+        if key in _surface_cache and _surface_cache[key][0] is ref:
+            del _surface_cache[key]
+    entry=(weakref.ref(surface, forget), NearestIndex(surface), {})
+    _surface_cache[key]=entry
+    return entry[1], entry[2]
+
+def min_dists(coords, surface):
+    """
+    Return an array of the minimum distances between 
+    each of the coordinates (N x 3 array) and surface.
+    """
+    if not len(coords):
+        return numpy.zeros(0)
+    index, dists=_get_surface_cache(surface)[0].nearest(coords)
+    return dists
+
+def _get_atom_list(entity):
+    """Return all the atoms of an entity, including all altlocs (PRIVATE).
+
+    Unlike Selection.unfold_entities, this is fast for large structures.
+    """
+    if entity.get_level()=="R":
+        if entity.is_disordered()==2:
+            atom_list=[]
+            for residue in entity.disordered_get_list():
+                atom_list.extend(residue.get_unpacked_list())
+            return atom_list
+        return entity.get_unpacked_list()
+    atom_list=[]
+    for child in entity:
+        atom_list.extend(_get_atom_list(child))
+    return atom_list
+
+def _get_atom_depths(atom_list, surface):
+    """Return a list of the depths of the atoms (PRIVATE).
+
+    Depths are taken from the cache of the surface if the atom has not
+    moved since.  Otherwise the depths of all the atoms in the top level
+    entity containing the atom (normally the Structure) are calculated
+    at once, and cached for the next call using the same surface.
+    """
+    depths=_get_surface_cache(surface)[1]
+    answer=[]
+    for atom in atom_list:
+        coord=atom.get_coord().tolist()
+        try:
+            cached_coord, depth=depths[id(atom)]
+        except KeyError:
+            cached_coord=None
+        if cached_coord!=coord:
+            top=atom
+            while top.get_parent() is not None:
+                top=top.get_parent()
+            all_atoms=_get_atom_list(top)
+            if atom not in all_atoms:
+                # e.g. a detached atom
+                all_atoms=[atom]
+            coords=numpy.array([a.get_coord() for a in all_atoms], float)
+            for a, c, d in zip(all_atoms, coords.tolist(),
+                               min_dists(coords, surface).tolist()):
+                depths[id(a)]=(c, d)
+            depth=depths[id(atom)][1]
+        answer.append(depth)
+    return answer
+
+def clear_depth_cache():
+    """
+    Forget the surface indices and atom depths kept by residue_depth
+    and ca_depth (they are also forgotten when a surface is freed).
+    """
+    _surface_cache.clear()
+
 def residue_depth(residue, surface):
     """
     Return average distance to surface for all
@@ -108,17 +206,17 @@ def residue_depth(residue, surface):
     atom_list=residue.get_unpacked_list()
     length=len(atom_list)
     d=0
-    for atom in atom_list:
-        coord=atom.get_coord()
-        d=d+min_dist(coord, surface)
+    for depth in _get_atom_depths(atom_list, surface):
+        d=d+depth
     return d/length
 
 def ca_depth(residue, surface):
     if not residue.has_id("CA"):
         return None
     ca=residue["CA"]
-    coord=ca.get_coord()
-    return min_dist(coord, surface)
+    if ca.is_disordered():
+        ca=ca.disordered_get()
+    return _get_atom_depths([ca], surface)[0]
 
 class ResidueDepth(AbstractPropertyMap):
     """
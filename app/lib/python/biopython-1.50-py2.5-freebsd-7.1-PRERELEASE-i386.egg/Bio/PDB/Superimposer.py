@@ -7,6 +7,7 @@ import numpy
 
 from Bio.SVDSuperimposer import SVDSuperimposer
 from Bio.PDB.PDBExceptions import PDBException
+from Bio.PDB.AtomArray import AtomArray
 
 __doc__="Superimpose two structures."
 
@@ -45,12 +46,18 @@ class Superimposer:
     def apply(self, atom_list):
         """
         Rotate/translate a list of atoms.
+
+        An AtomArray (see Model.get_atom_array) is moved with a single
+        matrix multiply.
         """
         if self.rotran is None:
             raise PDBException("No transformation has been calculated yet")
         rot, tran=self.rotran
         rot=rot.astype('f')
         tran=tran.astype('f')
+        if isinstance(atom_list, AtomArray):
+            atom_list.transform(rot, tran)
+            return
         for atom in atom_list:
             atom.transform(rot, tran)
 
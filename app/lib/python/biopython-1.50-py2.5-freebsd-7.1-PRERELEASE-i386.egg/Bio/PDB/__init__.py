@@ -42,6 +42,9 @@ import Selection
 # Superimpose atom sets
 from Superimposer import Superimposer
 
+# Columnar coordinate storage for whole models
+from AtomArray import AtomArray
+
 # 3D vector class
 from Vector import Vector, calc_angle, calc_dihedral, refmat, rotmat, rotaxis,\
         vector_to_axis, m2rotaxis, rotaxis2m
@@ -67,7 +70,7 @@ from FragmentMapper import FragmentMapper
 from Dice import extract
 
 # Fast atom neighbor search
-# Depends on KDTree C++ module
+# Uses the KDTree C++ module, or a NumPy cell grid without it
 try:
     from NeighborSearch import NeighborSearch
 except ImportError:
@@ -80,6 +80,9 @@
 
 import re
 import itertools
+import os
+import marshal
+import hashlib
 
 #TODO - Remove this work around once we drop python 2.3 support
 try:
@@ -90,12 +93,114 @@ except NameError:
 from Bio.Seq import Seq, MutableSeq
 from Bio.Alphabet import IUPAC
 
-from Bio.Restriction.Restriction_Dictionary import rest_dict as enzymedict,\
-     typedict, suppliers as suppliers_dict
+def _cache_folder() :
+    """_cache_folder() -> folder for the user's marshalled dictionary or None.
+
+    for internal use only."""
+    folder = os.environ.get('XDG_CACHE_HOME')
+    if not folder :
+        home = os.path.expanduser('~')
+        if home.startswith('~') :
+            return None     # no home directory to write to.
+        folder = os.path.join(home, '.cache')
+    return os.path.join(folder, 'biopython')
+
+def _read_compiled(compiled, digest) :
+    """_read_compiled(compiled, digest) -> dictionaries or None.
+
+    for internal use only.
+
+    return the dictionaries marshalled in the file compiled if they were
+    made from the source with the given md5 digest."""
+    try :
+        handle = open(compiled, 'rb')
+        try :
+            saved_digest, dictionaries = marshal.load(handle)
+        finally :
+            handle.close()
+    except (IOError, EOFError, ValueError, TypeError) :
+        return None
+    if saved_digest == digest :
+        return dictionaries
+    return None
+
+def _write_compiled(folder, compiled, digest, dictionaries) :
+    """_write_compiled(folder, compiled, digest, dictionaries) -> None.
+
+    for internal use only.
+
+    marshal the dictionaries to the file compiled, doing nothing if it
+    can not be written."""
+    #
+    #   write to a temporary file first, so other processes never see
+    #   a partly written file.
+    #
+    temp = '%s.%i' % (compiled, os.getpid())
+    try :
+        if not os.path.isdir(folder) :
+            os.makedirs(folder)
+        handle = open(temp, 'wb')
+        try :
+            marshal.dump((digest, dictionaries), handle, 1)
+        finally :
+            handle.close()
+        if os.path.exists(compiled) :
+            #
+            #   rename does not replace an existing file on Windows.
+            #
+            os.remove(compiled)
+        os.rename(temp, compiled)
+    except (IOError, OSError) :
+        try :
+            os.remove(temp)
+        except OSError :
+            pass
+
+def _load_dictionary() :
+    """_load_dictionary() -> (rest_dict, typedict, suppliers).
+
+    for internal use only.
+
+    Restriction_Dictionary.py is large and slow to compile. A marshalled
+    copy of its dictionaries, Restriction_Dictionary.marshal, is shipped
+    next to it and loaded instead as long as it was made from the current
+    version of the module (checked with the md5 of the source). Otherwise
+    a copy kept in the user's cache folder (~/.cache/biopython) is tried,
+    and failing that the module is imported and the copy in the cache
+    folder remade when possible. The package folder itself is never
+    written to, as it is often read only."""
+    folder = os.path.dirname(os.path.abspath(__file__))
+    source = os.path.join(folder, 'Restriction_Dictionary.py')
+    name = 'Restriction_Dictionary.marshal'
+    try :
+        handle = open(source, 'rb')
+        digest = hashlib.md5(handle.read()).hexdigest()
+        handle.close()
+    except IOError :
+        digest = None
+    cache = _cache_folder()
+    if digest :
+        dictionaries = _read_compiled(os.path.join(folder, name), digest)
+        if dictionaries is None and cache :
+            dictionaries = _read_compiled(os.path.join(cache, name), digest)
+        if dictionaries is not None :
+            return dictionaries
+    from Bio.Restriction import Restriction_Dictionary as rd
+    dictionaries = rd.rest_dict, rd.typedict, rd.suppliers
+    if digest and cache :
+        _write_compiled(cache, os.path.join(cache, name), digest,
+                        dictionaries)
+    return dictionaries
+
+enzymedict, typedict, suppliers_dict = _load_dictionary()
 from Bio.Restriction.RanaConfig import *
 from Bio.Restriction.PrintFormat import PrintFormat
 from Bio.Restriction.DNAUtils import check_bases
 
+try :
+    import numpy
+except ImportError :
+    numpy = None
 
 
 matching = {'A' : 'ARWMHVDN', 'C' : 'CYSMHBVN', 'G' : 'GRSKBVDN',
@@ -219,7 +324,27 @@ class RestrictionType(type) :
         
         see below."""
         super(RestrictionType, cls).__init__(cls, name, bases, dct)
-        cls.compsite = re.compile(cls.compsite)
+
+    def _get_compsite(cls) :
+        """RE.compsite -> compiled regular expression of the site.
+
+        The regular expressions are only compiled when first needed as
+        compiling those of all the enzymes takes a long time at import.
+        The pattern is kept in the class dictionary under the same name
+        (or in that of the enzyme it derives from). The classes which are
+        not enzymes have no site and raise an AttributeError."""
+        try :
+            return cls.__dict__['_compsite']
+        except KeyError :
+            pass
+        for klass in cls.__mro__ :
+            if isinstance(klass, RestrictionType) \
+               and 'compsite' in klass.__dict__ :
+                compsite = re.compile(klass.__dict__['compsite'])
+                cls._compsite = compsite
+                return compsite
+        raise AttributeError("%s has no restriction site" % cls.__name__)
+    compsite = property(_get_compsite)
         
     def __add__(cls, other) :
         """RE.__add__(other) -> RestrictionBatch().
@@ -784,11 +909,21 @@ class Palindromic(AbstractCut) :
 
         implement the search method for palindromic and non palindromic enzyme.
         """
-        siteloc = self.dna.finditer(self.compsite,self.size)
+        return self._analyse(self.dna.finditer(self.compsite,self.size))
+    _search = classmethod(_search)
+
+    def _analyse(self, siteloc) :
+        """RE._analyse(siteloc) -> list.
+
+        for internal use only.
+
+        turn the sites found in self.dna (as returned by FormattedSeq.finditer)
+        into the list of cuts.
+        """
         self.results = [r for s,g in siteloc for r in self._modify(s)]
         if self.results : self._drop()
         return self.results
-    _search = classmethod(_search)
+    _analyse = classmethod(_analyse)
 
     def is_palindromic(self) :
         """RE.is_palindromic() -> bool.
@@ -813,7 +948,17 @@ class NonPalindromic(AbstractCut) :
 
         implement the search method for palindromic and non palindromic enzyme.
         """
-        iterator = self.dna.finditer(self.compsite, self.size)
+        return self._analyse(self.dna.finditer(self.compsite, self.size))
+    _search = classmethod(_search)
+
+    def _analyse(self, iterator) :
+        """RE._analyse(siteloc) -> list.
+
+        for internal use only.
+
+        turn the sites found in self.dna (as returned by FormattedSeq.finditer)
+        into the list of cuts.
+        """
         self.results = []
         modif = self._modify
         revmodif = self._rev_modify
@@ -829,7 +974,7 @@ class NonPalindromic(AbstractCut) :
             self.results.sort()
             self._drop()
         return self.results
-    _search = classmethod(_search)
+    _analyse = classmethod(_analyse)
 
     def is_palindromic(self) :
         """RE.is_palindromic() -> bool.
@@ -1765,6 +1910,223 @@ class Not_available(AbstractCut) :
     is_comm = classmethod(is_comm)
 
     
+###############################################################################  
+#                                                                             #
+#                       Batch search                                          #
+#                                                                             #
+###############################################################################
+#
+#   RestrictionBatch.search() looks for the sites of all its enzymes together
+#   instead of letting each enzyme run its own regular expression over the
+#   whole sequence :
+#       - enzymes which share a site (isoschizomers) share one search.
+#       - with numpy, the positions of each word of 4 bases in the sequence
+#         are indexed once. The candidate positions for a site are then
+#         looked up through the words its most specific 4 bases can form
+#         and checked against the rest of the site with array operations.
+#       - without numpy, each distinct site is found with one regular
+#         expression using a look-ahead (to get the overlapping sites).
+#   The sites are then screened to give exactly what re.finditer would give
+#   each enzyme (non overlapping sites, the site on the current strand taking
+#   precedence) and each enzyme turns them into cuts as usual.
+#
+
+_site_part = re.compile(r'^\(\?P<[^>]+>([^()|]*)\)$')
+_site_token = re.compile(r'\[[A-Z]+\]|[A-Z.]')
+_word_size = 4
+_word_bases = 'ACGT'
+#   site text -> list of the allowed letters at each position (None for any).
+_site_cache = {}
+
+def _parse_compsite(enzyme) :
+    """_parse_compsite(enzyme) -> tuple.
+
+    for internal use only.
+
+    return the sites on each strand of the enzyme compsite as lists of the
+    letters allowed at each position, or None if the compsite is not a
+    simple site of that kind."""
+    sites = []
+    for part in enzyme.compsite.pattern.split('|') :
+        m = _site_part.match(part)
+        if not m :
+            return None
+        text = m.group(1)
+        try :
+            sites.append((text, _site_cache[text]))
+            continue
+        except KeyError :
+            pass
+        tokens = _site_token.findall(text)
+        if not tokens or ''.join(tokens) != text :
+            return None
+        site = []
+        for token in tokens :
+            if token == '.' :
+                site.append(None)
+            else :
+                site.append(token.strip('[]'))
+        _site_cache[text] = site
+        sites.append((text, site))
+    if len(sites) not in (1, 2) or len(sites[-1][1]) != len(sites[0][1]) :
+        return None
+    return sites
+
+class _WordIndex(object) :
+    """_WordIndex(data) -> index of the words of 4 bases in data.
+
+    for internal use only. Requires numpy."""
+
+    def __init__(self, data) :
+        lut = numpy.zeros(256, numpy.uint8) + len(_word_bases)
+        for index, base in enumerate(_word_bases) :
+            lut[ord(base)] = index
+        self.codes = lut[numpy.fromstring(data, numpy.uint8)]
+        #
+        #   any other letter (or the leading space) gets the code 4.
+        #
+        size = len(data)
+        padded = numpy.concatenate((self.codes,
+                                    numpy.zeros(_word_size, numpy.uint8) + 4))
+        words = numpy.zeros(size, numpy.int32)
+        for j in range(_word_size) :
+            words *= 5
+            words += padded[j:j+size]
+        self.order = numpy.argsort(words, kind='mergesort')
+        self.bounds = numpy.searchsorted(words[self.order],
+                                         numpy.arange(5**_word_size + 1))
+
+    def positions(self, site) :
+        """WI.positions(site) -> list or None.
+
+        all the (possibly overlapping) positions where site is found.
+        None if the site can not be looked up this way."""
+        length = len(site)
+        if length < _word_size :
+            return None
+        allowed = []
+        for letters in site :
+            ok = numpy.zeros(5, bool)
+            if letters is None :
+                ok[:] = True
+            else :
+                for letter in letters :
+                    if letter not in _word_bases :
+                        return None
+                    ok[_word_bases.index(letter)] = True
+            allowed.append(ok)
+        #
+        #   the most specific word of the site.
+        #
+        counts = [int(ok.sum()) for ok in allowed]
+        best, start = None, 0
+        for i in range(length - _word_size + 1) :
+            n = 1
+            for c in counts[i:i+_word_size] :
+                n *= c
+            if best is None or n < best :
+                best, start = n, i
+        words = [0]
+        for ok in allowed[start:start+_word_size] :
+            digits = numpy.flatnonzero(ok).tolist()
+            words = [w * 5 + d for w in words for d in digits]
+        bounds, order = self.bounds, self.order
+        found = [order[bounds[w]:bounds[w+1]] for w in words]
+        if not found :
+            return []
+        candidates = numpy.sort(numpy.concatenate(found)) - start
+        candidates = candidates[(candidates >= 0) & \
+                                (candidates + length <= len(self.codes))]
+        for i, ok in enumerate(allowed) :
+            if start <= i < start + _word_size or ok.all() :
+                continue
+            candidates = candidates[ok[self.codes[candidates + i]]]
+        return candidates.tolist()
+
+def _regex_positions(text, data) :
+    """_regex_positions(text, data) -> list.
+
+    for internal use only.
+
+    all the (possibly overlapping) positions of the site text in data."""
+    return [m.start() for m in re.finditer('(?=%s)' % text, data)]
+
+def _on_current_strand(name) :
+    return name
+
+def _on_other_strand(name) :
+    return None
+
+def _batch_search(enzymes, dna) :
+    """_batch_search(enzymes, dna) -> dict.
+
+    for internal use only.
+
+    search dna (a FormattedSeq) for the sites of all the enzymes at once,
+    return a dictionary enzyme -> cuts, the same as enzyme.search(dna)."""
+    mapping = {}
+    todo = []
+    for enzyme in enzymes :
+        sites = _parse_compsite(enzyme)
+        if sites is None :
+            mapping[enzyme] = enzyme.search(dna)
+        else :
+            todo.append((enzyme, sites))
+    if not todo :
+        return mapping
+    #
+    #   for circular sequences, FormattedSeq.finditer adds the start of the
+    #   sequence (size bases) at the end. Do it once for the largest size.
+    #
+    data = dna.data
+    linear = dna.is_linear()
+    if not linear :
+        data += dna.data[1:max([enzyme.size for enzyme, s in todo])+1]
+    if numpy is not None :
+        index = _WordIndex(data)
+    else :
+        index = None
+    found = {}
+    for enzyme, sites in todo :
+        if linear :
+            limit = len(dna.data)
+        else :
+            limit = len(dna.data) + len(dna.data[1:enzyme.size+1])
+        length = len(sites[0][1])
+        hits = []
+        for strand, (text, site) in enumerate(sites) :
+            if strand and text == sites[0][0] :
+                break   # the same site on both strands.
+            try :
+                positions = found[text]
+            except KeyError :
+                positions = None
+                if index is not None :
+                    positions = index.positions(site)
+                if positions is None :
+                    positions = _regex_positions(text, data)
+                found[text] = positions
+            hits += [(p, strand) for p in positions]
+        hits.sort()
+        #
+        #   keep the sites re.finditer would find.
+        #
+        siteloc = []
+        end = 0
+        for p, strand in hits :
+            if p + length > limit :
+                break
+            if p < end :
+                continue
+            end = p + length
+            if strand :
+                siteloc.append((p, _on_other_strand))
+            else :
+                siteloc.append((p, _on_current_strand))
+        enzyme.dna = dna
+        mapping[enzyme] = enzyme._analyse(siteloc)
+    return mapping
+
 ###############################################################################  
 #                                                                             #
 #                       Restriction Batch                                     #
@@ -1978,14 +2340,14 @@ class RestrictionBatch(set) :
             else :
                 self.already_mapped = dna, linear
                 fseq = FormattedSeq(dna, linear)
-                self.mapping = dict([(x, x.search(fseq)) for x in self])
+                self.mapping = _batch_search(self, fseq)
                 return self.mapping
         elif isinstance(dna, FormattedSeq) :
             if (dna, dna.linear) == self.already_mapped :
                 return self.mapping
             else :
                 self.already_mapped = dna, dna.linear
-                self.mapping = dict([(x, x.search(dna)) for x in self])
+                self.mapping = _batch_search(self, dna)
                 return self.mapping
         raise TypeError("Expected Seq or MutableSeq instance, got %s instead"\
                         %type(dna))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+#
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+#
+
+"""Benchmark of the time and memory taken to import Bio.Restriction.
+
+for internal use only.
+
+Each import is timed in a new Python process, reading the memory used
+(VmRSS in /proc/self/status, so on Linux only) before and after. Two ways
+of importing are compared :
+
+    source   : the REBASE dictionaries are read from Restriction_Dictionary.py
+               and the site of every enzyme compiled at import, as older
+               versions of Bio.Restriction did.
+    marshal  : the current import, reading the marshalled dictionaries and
+               compiling the sites only when they are first used.
+
+For cold import times, delete the .pyc files of Bio.Restriction first (the
+first source run then includes compiling Restriction_Dictionary.py).
+
+    python -m Bio.Restriction._benchmark [number of runs]
+"""
+
+import os
+import sys
+import subprocess
+
+_child = """
+import os, sys, time, marshal
+def rss() :
+    try :
+        for line in open('/proc/self/status') :
+            if line.startswith('VmRSS:') :
+                return int(line.split()[1])
+    except IOError :
+        pass
+    return 0
+import Bio.Seq
+if sys.argv[1] == 'source' :
+    def load(handle) :
+        raise ValueError('ignore the marshalled dictionaries')
+    def dump(value, handle, version=None) :
+        raise IOError('do not write a marshalled copy')
+    marshal.load = load
+    marshal.dump = dump
+before = rss()
+start = time.time()
+from Bio.Restriction import Restriction
+if sys.argv[1] == 'source' :
+    for enzyme in Restriction.AllEnzymes :
+        enzyme.compsite
+print time.time() - start, rss() - before
+"""
+
+def _run(mode) :
+    """_run(mode) -> (seconds, kB) for one import in a new process."""
+    path = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    child = subprocess.Popen([sys.executable, '-c',
+                              'import sys; sys.path.insert(0, sys.argv[2]);'
+                              ' exec sys.stdin.read()', mode, path],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    output = child.communicate(_child)[0]
+    seconds, kb = output.split()
+    return float(seconds), int(kb)
+
+def _median(values) :
+    values = sorted(values)
+    return values[len(values)//2]
+
+def main(runs=5) :
+    for mode in ('source', 'marshal') :
+        results = [_run(mode) for i in range(runs)]
+        print '%-8s import : %0.3f s, +%0.1f MB RSS (median of %i runs)' \
+              % (mode, _median([r[0] for r in results]),
+                 _median([r[1] for r in results]) / 1024.0, runs)
+
+if __name__ == '__main__' :
+    if len(sys.argv) > 1 :
+        main(int(sys.argv[1]))
+    else :
+        main()
@@ -6,6 +6,7 @@
 # This functionality may be of general use, in which case this module should
 # be moved out of the SCOP package.
 
+import os
 import warnings
 warnings.warn("Bio.SCOP.FileIndex was deprecated, as it does not seem to have any users. If you do use this module, please contact the Biopython developers at biopython-dev@biopython.org to avoid permanent removal of this module")
 
@@ -28,8 +29,18 @@ class FileIndex(dict) :
 
     The class can be used to turn a file into a read-only
     database.
+
+    If an index file name is given the offsets are saved to it (in the
+    format of Bio.Index), and later instances read them from there rather
+    than scanning the whole file again, as long as the index is newer
+    than the file.  The offsets are then looked up in the index file, so
+    the dictionary itself stays empty.
+
+    Like indexing, get, values, items and their iterator versions return
+    the items read from the file.  Older versions returned the file
+    offsets from these methods (but not from indexing).
     """
-    def __init__(self, filename, iterator_gen, key_gen ) :
+    def __init__(self, filename, iterator_gen, key_gen, indexname=None ) :
         """
         Arguments:
         
@@ -41,12 +52,22 @@ class FileIndex(dict) :
 
           key_gen -- A function that generates an index key from the items
                      created by the iterator. 
+
+          indexname -- Optional name of a file to keep the offsets in.
         """
         dict.__init__(self)
         
         self.filename = filename
         self.iterator_gen = iterator_gen
+        self._index = None
+
+        if indexname is not None and os.path.exists(indexname) and \
+           os.path.getmtime(indexname) >= os.path.getmtime(filename) :
+            from Bio import Index
+            self._index = Index.Index(indexname)
+            return
         
+        lengths = {}
         f = open(self.filename)
         try:
             loc = 0
@@ -55,15 +76,76 @@ class FileIndex(dict) :
                 next_thing = i.next()
                 if next_thing is None : break
                 key = key_gen(next_thing)
+                end = f.tell()
                 if key != None :
                     self[key]=loc
-                loc = f.tell()
+                    lengths[key] = end - loc
+                loc = end
         finally :
             f.close()
 
+        if indexname is not None :
+            from Bio import Index
+            index = Index.Index(indexname, truncate=1)
+            for key, loc in dict.iteritems(self) :
+                index[key] = loc, lengths[key]
+            index.close()
+
+    def _location(self, key) :
+        if self._index is not None :
+            return self._index[key][0]
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key) :
+        if self._index is not None :
+            return key in self._index
+        return dict.__contains__(self, key)
+
+    has_key = __contains__
+
+    def __len__(self) :
+        if self._index is not None :
+            return len(self._index)
+        return dict.__len__(self)
+
+    def __iter__(self) :
+        if self._index is not None :
+            return iter(self._index)
+        return dict.__iter__(self)
+
+    def keys(self) :
+        if self._index is not None :
+            return self._index.keys()
+        return dict.keys(self)
+
+    def iterkeys(self) :
+        return iter(self)
+
+    # The dictionary only holds the offsets (and is empty when they are
+    # read from an index file), so these all go through __getitem__
+
+    def get(self, key, default=None) :
+        if key in self :
+            return self[key]
+        return default
+
+    def itervalues(self) :
+        for key in self :
+            yield self[key]
+
+    def iteritems(self) :
+        for key in self :
+            yield key, self[key]
+
+    def values(self) :
+        return list(self.itervalues())
+
+    def items(self) :
+        return list(self.iteritems())
+
     def __getitem__(self, key) :
         """ Return an item from the indexed file. """
-        loc = dict.__getitem__(self,key)
+        loc = self._location(key)
 
         f = open(self.filename)
         try:
@@ -28,6 +28,12 @@ from Alphabet import IUPAC
 from Data.IUPACData import ambiguous_dna_complement, ambiguous_rna_complement
 from Bio.Data import CodonTable
 
+try :
+    import numpy
+except ImportError :
+    #Only used to speed up translation of long sequences
+    numpy = None
+
 def _maketrans(complement_mapping) :
     """Makes a python string translation table (PRIVATE).
 
@@ -1460,6 +1466,233 @@ def back_transcribe(rna):
     else:
         return rna.replace('U','T').replace('u','t')
     
+#Markers used in the precompiled lookup tables, replaced by the caller's
+#stop_symbol and pos_stop once a whole protein has been assembled:
+_STOP_MARKER = "\x00"
+_POS_STOP_MARKER = "\x01"
+
+#Below this length the NumPy set up costs more than the dictionary lookups.
+_NUMPY_MIN_LENGTH = 300
+
+class _CodonTranslator(object) :
+    """Precompiled translation engine for a single CodonTable (PRIVATE).
+
+    Every codon which can be spelt using the table's nucleotide alphabet
+    (including ambiguous codons like TAN or NNN) is resolved ONCE when the
+    engine is built, giving a dictionary keyed by codon string and, if NumPy
+    is available, a lookup array indexed by the packed codon (two bits per
+    nucleotide for unambiguous tables giving 64 entries, four bits for the
+    ambiguous tables giving 4096 entries).
+
+    Use the _get_translator function rather than creating these directly,
+    as the engine is cached on the codon table.
+    """
+    def __init__(self, table) :
+        if table.nucleotide_alphabet.letters is not None :
+            letters = table.nucleotide_alphabet.letters.upper()
+        else :
+            #Assume the worst case, ambiguous DNA or RNA:
+            letters = IUPAC.ambiguous_dna.letters.upper() + \
+                      IUPAC.ambiguous_rna.letters.upper()
+        unique = []
+        for letter in letters :
+            if letter not in unique : unique.append(letter)
+        letters = "".join(unique)
+        self.table = table
+        self.letters = letters
+        self.valid_letters = set(letters)
+
+        stop_codons = table.stop_codons
+        forward_table = table.forward_table
+        lookup = {}
+        for c1 in letters :
+            for c2 in letters :
+                for c3 in letters :
+                    codon = c1+c2+c3
+                    try :
+                        lookup[codon] = forward_table[codon]
+                    except (KeyError, CodonTable.TranslationError) :
+                        if codon in stop_codons :
+                            lookup[codon] = _STOP_MARKER
+                        else :
+                            #Possible stop codon (e.g. NNN or TAN)
+                            lookup[codon] = _POS_STOP_MARKER
+        self.lookup = lookup
+
+        if numpy is not None :
+            bits = 1
+            while (1 << bits) < len(letters) : bits += 1
+            self._bits = bits
+            code_lut = numpy.zeros(256, numpy.uint16)
+            invalid_lut = numpy.ones(256, numpy.bool_)
+            for index, letter in enumerate(letters) :
+                for c in (letter, letter.lower()) :
+                    code_lut[ord(c)] = index
+                    invalid_lut[ord(c)] = False
+            amino_lut = numpy.zeros(1 << (3*bits), numpy.uint8)
+            amino_lut[:] = ord(_POS_STOP_MARKER)
+            for codon, amino in lookup.iteritems() :
+                packed = (letters.index(codon[0]) << (2*bits)) \
+                       | (letters.index(codon[1]) << bits) \
+                       | letters.index(codon[2])
+                amino_lut[packed] = ord(amino)
+            self._code_lut = code_lut
+            self._invalid_lut = invalid_lut
+            self._amino_lut = amino_lut
+
+    def _encode(self, sequence) :
+        """Returns the sequence as an array of nucleotide codes, or None.
+
+        None is returned if the sequence holds any letter outside the
+        table's alphabet, in which case the caller should fall back on the
+        codon by codon translation (which gives the precise error)."""
+        raw = numpy.fromstring(sequence, numpy.uint8)
+        if self._invalid_lut[raw].any() :
+            return None
+        return self._code_lut[raw]
+
+    def _pack(self, first, second, third) :
+        bits = self._bits
+        return (first << (2*bits)) | (second << bits) | third
+
+    def _finish(self, protein, stop_symbol, to_stop, pos_stop) :
+        if to_stop :
+            i = protein.find(_STOP_MARKER)
+            if i != -1 : protein = protein[:i]
+        return protein.replace(_STOP_MARKER, stop_symbol) \
+                      .replace(_POS_STOP_MARKER, pos_stop)
+
+    def _translate_markers(self, sequence) :
+        """Translates using the lookup markers, or returns None (PRIVATE)."""
+        n = len(sequence)
+        if numpy is not None and n >= _NUMPY_MIN_LENGTH :
+            codes = self._encode(sequence[:n-n%3])
+            if codes is None : return None
+            codes = codes.reshape(-1,3)
+            packed = self._pack(codes[:,0], codes[:,1], codes[:,2])
+            return self._amino_lut[packed].tostring()
+        sequence = sequence.upper()
+        lookup = self.lookup
+        try :
+            return "".join([lookup[sequence[i:i+3]] \
+                            for i in xrange(0,n-n%3,3)])
+        except KeyError :
+            return None
+
+    def translate(self, sequence, stop_symbol="*", to_stop=False,
+                  pos_stop="X") :
+        """Translates a nucleotide string in frame one, returns a string."""
+        protein = self._translate_markers(sequence)
+        if protein is None :
+            return self._translate_codons(sequence, stop_symbol,
+                                          to_stop, pos_stop)
+        return self._finish(protein, stop_symbol, to_stop, pos_stop)
+
+    def translate_frames(self, sequence, stop_symbol="*", pos_stop="X") :
+        """Translates all three forward frames, returns a tuple of strings.
+
+        With NumPy every codon start is packed and looked up in one pass,
+        and each frame is then just every third entry of the result."""
+        n = len(sequence)
+        if numpy is not None and n >= _NUMPY_MIN_LENGTH :
+            codes = self._encode(sequence)
+            if codes is not None :
+                packed = self._pack(codes[:-2], codes[1:-1], codes[2:])
+                aminos = self._amino_lut[packed]
+                return tuple([self._finish(aminos[frame::3].tostring(),
+                                           stop_symbol, False, pos_stop) \
+                              for frame in range(3)])
+        return tuple([self.translate(sequence[frame:], stop_symbol,
+                                     False, pos_stop) \
+                      for frame in range(3)])
+
+    def translate_many(self, sequences, stop_symbol="*", to_stop=False,
+                       pos_stop="X") :
+        """Translates a list of nucleotide strings, returns a list of strings.
+
+        Each sequence is trimmed to a whole number of codons and the lot
+        translated as a single string, which is then cut back up."""
+        sequences = [s[:len(s)-len(s)%3] for s in sequences]
+        proteins = self._translate_markers("".join(sequences))
+        if proteins is None :
+            #At least one invalid codon, find it the slow way
+            return [self.translate(s, stop_symbol, to_stop, pos_stop) \
+                    for s in sequences]
+        answer = []
+        start = 0
+        for s in sequences :
+            end = start + len(s) // 3
+            answer.append(self._finish(proteins[start:end], stop_symbol,
+                                       to_stop, pos_stop))
+            start = end
+        return answer
+
+    def _translate_codons(self, sequence, stop_symbol, to_stop, pos_stop) :
+        """Codon by codon translation, used for invalid sequences (PRIVATE).
+
+        Codons missing from the lookup (e.g. using X, which the ambiguous
+        forward tables accept but is not in the alphabet) are resolved as
+        before using the table itself.  This stops at the first in frame
+        stop codon if to_stop is set, otherwise raises a TranslationError
+        for the first invalid codon."""
+        sequence = sequence.upper()
+        amino_acids = []
+        lookup = self.lookup
+        n = len(sequence)
+        for i in xrange(0,n-n%3,3) :
+            codon = sequence[i:i+3]
+            try :
+                amino = lookup[codon]
+            except KeyError :
+                amino = self._resolve(codon)
+            if amino == _STOP_MARKER :
+                if to_stop : break
+                amino = stop_symbol
+            elif amino == _POS_STOP_MARKER :
+                amino = pos_stop
+            amino_acids.append(amino)
+        return "".join(amino_acids)
+
+    def _resolve(self, codon) :
+        """Translates a codon not in the lookup, returns an amino acid or marker.
+
+        Raises a TranslationError if the codon is invalid (PRIVATE)."""
+        try :
+            return self.table.forward_table[codon]
+        except (KeyError, CodonTable.TranslationError) :
+            #Todo? Treat "---" as a special case (gapped translation)
+            if codon in self.table.stop_codons :
+                return _STOP_MARKER
+            elif self.valid_letters.issuperset(set(codon)) :
+                #Possible stop codon (e.g. NNN or TAN)
+                return _POS_STOP_MARKER
+            raise CodonTable.TranslationError(\
+                "Codon '%s' is invalid" % codon)
+
+def _get_translator(table) :
+    """Returns the (cached) precompiled translation engine for a table (PRIVATE).
+
+    The engine is stored in the table's instance dictionary, bypassing the
+    attribute forwarding done by AmbiguousCodonTable (which would otherwise
+    find the engine of the wrapped unambiguous table)."""
+    try :
+        return table.__dict__["_translator"]
+    except KeyError :
+        translator = _CodonTranslator(table)
+        table.__dict__["_translator"] = translator
+        return translator
+
+def _get_codon_table(table) :
+    """Returns an ambiguous generic CodonTable given a name or id (PRIVATE).
+
+    A CodonTable object is returned unchanged."""
+    if isinstance(table, CodonTable.CodonTable) :
+        return table
+    try :
+        return CodonTable.ambiguous_generic_by_id[int(table)]
+    except ValueError :
+        return CodonTable.ambiguous_generic_by_name[table]
+
 def _translate_str(sequence, table, stop_symbol="*",
                    to_stop=False, pos_stop="X") :
     """Helper function to translate a nucleotide string (PRIVATE).
@@ -1493,34 +1726,8 @@ def _translate_str(sequence, table, stop_symbol="*",
        ...
     TranslationError: Codon 'TA?' is invalid
     """
-    sequence = sequence.upper()
-    amino_acids = []
-    forward_table = table.forward_table
-    stop_codons = table.stop_codons
-    if table.nucleotide_alphabet.letters is not None :
-        valid_letters = set(table.nucleotide_alphabet.letters.upper())
-    else :
-        #Assume the worst case, ambiguous DNA or RNA:
-        valid_letters = set(IUPAC.ambiguous_dna.letters.upper() + \
-                            IUPAC.ambiguous_rna.letters.upper())
-
-    n = len(sequence)
-    for i in xrange(0,n-n%3,3) :
-        codon = sequence[i:i+3]
-        try :
-            amino_acids.append(forward_table[codon])
-        except (KeyError, CodonTable.TranslationError) :
-            #Todo? Treat "---" as a special case (gapped translation)
-            if codon in table.stop_codons :
-                if to_stop : break
-                amino_acids.append(stop_symbol)
-            elif valid_letters.issuperset(set(codon)) :
-                #Possible stop codon (e.g. NNN or TAN)
-                amino_acids.append(pos_stop)
-            else :
-                raise CodonTable.TranslationError(\
-                    "Codon '%s' is invalid" % codon)
-    return "".join(amino_acids)
+    return _get_translator(table).translate(sequence, stop_symbol,
+                                            to_stop, pos_stop)
 
 def translate(sequence, table="Standard", stop_symbol="*", to_stop=False):
     """Translate a nucleotide sequence into amino acids.
@@ -1582,12 +1789,45 @@ def translate(sequence, table="Standard", stop_symbol="*", to_stop=False):
         return sequence.toseq().translate(table, stop_symbol, to_stop)
     else:
         #Assume its a string, return a string
-        try :
-            codon_table = CodonTable.ambiguous_generic_by_id[int(table)]
-        except ValueError :
-            codon_table = CodonTable.ambiguous_generic_by_name[table]
-        return _translate_str(sequence, codon_table, stop_symbol, to_stop)
+        return _translate_str(sequence, _get_codon_table(table),
+                              stop_symbol, to_stop)
       
+def translate_frames(sequence, table="Standard", stop_symbol="*"):
+    """Translate the three forward reading frames of a nucleotide string.
+
+    Returns a tuple of three strings, the translations starting at the
+    first, second and third letter (i.e. sequence[0:], sequence[1:] and
+    sequence[2:]).  For the reverse frames, use this function on the
+    reverse complement.  The arguments are as for the translate function.
+
+    >>> translate_frames("AUGGCCAUUGUAAUGGGCCGCUGAAAGGGUGCCCGAUAGUA")
+    ('MAIVMGR*KGAR*', 'WPL*WAAERVPDS', 'GHCNGPLKGCPIV')
+
+    Given a Seq or MutableSeq, it is translated as a plain string.  For
+    long sequences (and if NumPy is installed) every codon is looked up
+    in one pass, which is much faster than three separate translations.
+    """
+    return _get_translator(_get_codon_table(table)).translate_frames( \
+        str(sequence), stop_symbol)
+
+def translate_many(sequences, table="Standard", stop_symbol="*",
+                   to_stop=False):
+    """Translate a list of nucleotide strings into amino acids.
+
+    Returns a list of protein strings, one for each nucleotide sequence,
+    exactly as if the translate function had been called on each in turn
+    (the arguments are the same), but much faster for many sequences as
+    they are all handled in a single call to the translation engine.
+
+    >>> translate_many(["ATGGCCTAA", "GTGAAANNN", "TTG"])
+    ['MA*', 'VKX', 'L']
+    >>> translate_many(["ATGGCCTAA", "GTGAAANNN", "TTG"], to_stop=True)
+    ['MA', 'VKX', 'L']
+    """
+    sequences = [str(s) for s in sequences]
+    return _get_translator(_get_codon_table(table)).translate_many( \
+        sequences, stop_symbol, to_stop)
+
 def reverse_complement(sequence):
     """Returns the reverse complement sequence of a nucleotide string.
 
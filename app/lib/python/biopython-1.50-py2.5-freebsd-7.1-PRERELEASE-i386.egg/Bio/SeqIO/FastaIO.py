@@ -129,18 +129,78 @@ class FastaWriter(SequentialSequenceWriter):
 
         assert "\n" not in title
         assert "\r" not in title
-        self.handle.write(">%s\n" % title)
 
         data = self._get_seq_string(record) #Catches sequence being None
 
         assert "\n" not in data
         assert "\r" not in data
 
-        if self.wrap :
-            for i in range(0, len(data), self.wrap):
-                self.handle.write(data[i:i+self.wrap] + "\n")
-        else :
-            self.handle.write(data + "\n")
+        #Build the whole record, and write it in one go
+        self.handle.write(">%s\n%s" % (title, _wrap(data, self.wrap)))
+
+def _wrap(data, wrap) :
+    """Returns the sequence split into lines, each ending with a newline (PRIVATE).
+
+    >>> print _wrap("ACGTACGTAC", 4),
+    ACGT
+    ACGT
+    AC
+    """
+    if not wrap :
+        return data + "\n"
+    if len(data) <= wrap :
+        if data :
+            return data + "\n"
+        return ""
+    lines = [data[i:i+wrap] for i in range(0, len(data), wrap)]
+    lines.append("")
+    return "\n".join(lines)
+
+def write_simple_fasta(entries, handle, wrap=60) :
+    """Writes (title, sequence) string pairs to a handle as FASTA.
+
+    entries - A list or iterator of (title, sequence) tuples of strings,
+              where the title is everything after the > on the title line.
+    handle  - Handle to an output file, e.g. as returned
+              by open(filename, "w")
+    wrap    - Optional line length used to wrap sequence lines.  Use
+              zero (or None) for no wrapping.
+
+    This is a fast path for exporting sequences you already have as plain
+    strings (e.g. from a database query), skipping the SeqRecord objects
+    and any checking of the titles and sequences.  The output is written
+    in large blocks.  Returns the number of records written.
+
+    >>> import sys
+    >>> count = write_simple_fasta([("Alpha", "ACCGGATGTA"),
+    ...                             ("Beta test", "AGGCTCGGTTA")], sys.stdout, 5)
+    >Alpha
+    ACCGG
+    ATGTA
+    >Beta test
+    AGGCT
+    CGGTT
+    A
+    >>> count
+    2
+    """
+    if wrap and wrap < 1 :
+        raise ValueError("Invalid wrap length %s" % repr(wrap))
+    count = 0
+    pieces = []
+    size = 0
+    for title, data in entries :
+        text = ">%s\n%s" % (title, _wrap(data, wrap))
+        pieces.append(text)
+        size += len(text)
+        count += 1
+        if size >= 1000000 :
+            handle.write("".join(pieces))
+            pieces = []
+            size = 0
+    if pieces :
+        handle.write("".join(pieces))
+    return count
 
 if __name__ == "__main__" :
     print "Running quick self test"
@@ -240,12 +240,16 @@ class GenBankWriter(SequentialSequenceWriter) :
 
         data = self._get_seq_string(record) #Catches sequence being None
         seq_len = len(data)
-        for line_number in range(0,seq_len,LETTERS_PER_LINE):
-            self.handle.write(str(line_number+1).rjust(SEQUENCE_INDENT))
-            for words in range(line_number,min(line_number+LETTERS_PER_LINE,seq_len),10):
-                self.handle.write(" %s" % data[words:words+10])
-            self.handle.write("\n")
-        
+        #Split into blocks of ten letters, then build each line with a
+        #join, and write the whole sequence in one go
+        words = [data[i:i+10] for i in range(0, seq_len, 10)]
+        per_line = LETTERS_PER_LINE // 10
+        lines = ["%s %s\n" % (str(line_number+1).rjust(SEQUENCE_INDENT),
+                              " ".join(words[line_number//10:
+                                             line_number//10+per_line]))
+                 for line_number in range(0, seq_len, LETTERS_PER_LINE)]
+        self.handle.write("".join(lines))
+
     def write_record(self, record):
         """Write a single record to the output file."""
         handle = self.handle
@@ -184,6 +184,32 @@ class SequenceWriter:
         # You SHOULD subclass this                          #
         #####################################################
 
+class _BufferedHandle :
+    """Collects small writes, passing them on in large blocks (PRIVATE).
+
+    Used by SequentialSequenceWriter.write_records() so that the writers
+    can write a record a line (or a word) at a time without the overhead
+    of calling the real handle's write method for each piece.
+    """
+    def __init__(self, handle, buffer_size) :
+        self.handle = handle
+        self.buffer_size = buffer_size
+        self._pieces = []
+        self._size = 0
+
+    def write(self, text) :
+        self._pieces.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size :
+            self.flush()
+
+    def flush(self) :
+        """Write any pending text to the real handle (but don't flush it)."""
+        if self._pieces :
+            self.handle.write("".join(self._pieces))
+            self._pieces = []
+            self._size = 0
+
 class SequentialSequenceWriter(SequenceWriter):
     """This class should be subclassed.
 
@@ -204,7 +230,13 @@ class SequentialSequenceWriter(SequenceWriter):
     
     Note that write_header() cannot require any assumptions about
     the number of records.
+
+    The write_records() method collects the output for many records in
+    memory, writing it to the handle in blocks of about buffer_size
+    characters (the output is complete once write_records() returns).
     """
+    buffer_size = 1000000
+
     def __init__(self, handle):
         self.handle = handle
         self._header_written = False
@@ -254,9 +286,16 @@ class SequentialSequenceWriter(SequenceWriter):
         assert self._header_written, "You must call write_header() first"
         assert not self._footer_written, "You have already called write_footer()"
         count = 0
-        for record in records :
-            self.write_record(record)
-            count += 1
+        #Pass the output on in large blocks, not a line at a time
+        handle = self.handle
+        self.handle = _BufferedHandle(handle, self.buffer_size)
+        try :
+            for record in records :
+                self.write_record(record)
+                count += 1
+        finally :
+            self.handle.flush()
+            self.handle = handle
         #Mark as true, even if there where no records
         self._record_written = True
         return count
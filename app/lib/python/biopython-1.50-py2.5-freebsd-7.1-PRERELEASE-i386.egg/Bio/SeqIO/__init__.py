@@ -86,6 +86,13 @@ The above code will work as long as the file contains at least one record.
 Note that if there is more than one record, the remaining records will be
 silently ignored.
 
+Input - Multiple processes
+==========================
+For large GenBank, EMBL, SwissProt or FASTA files, Bio.SeqIO.parse_parallel
+(which takes a filename rather than a handle) splits the file into chunks
+of whole records and parses them in several processes at once, using the
+multiprocessing module from Python 2.6 onwards.
+
 Input - Alignments
 ==================
 You can read in alignment files as Alignment objects using Bio.AlignIO.
@@ -404,6 +411,79 @@ def parse(handle, format, alphabet=None) :
     else :
         raise ValueError("Unknown format '%s'" % format)
 
+def parse_parallel(filename, format, alphabet=None, workers=None,
+                   ordered=True, chunk_size=4000000, in_flight=None) :
+    """Turns a sequence file into an iterator, parsing with several processes.
+
+     - filename   - name of the file (not a handle, as the file is split up
+                    by byte offset and each piece is read separately).
+     - format     - lower case string describing the file format, one of
+                    "genbank" (or "gb"), "genbank-cds", "embl", "embl-cds",
+                    "swiss" or "fasta".
+     - alphabet   - optional Alphabet object, as for the parse function.
+     - workers    - number of worker processes, defaults to the number of
+                    CPUs.
+     - ordered    - boolean, should the records be returned in the same
+                    order as in the file?  If False, the records from each
+                    chunk are returned as soon as that chunk has been
+                    parsed, which keeps the workers busier.
+     - chunk_size - approximate size (in bytes) of the pieces of the file
+                    handed to each worker.  Each piece is extended to the
+                    next record boundary.
+     - in_flight  - maximum number of pieces handed out at once, defaults
+                    to twice the number of workers.  This limits the memory
+                    used to roughly in_flight * chunk_size of records.
+
+    This uses the multiprocessing module (included with Python 2.6 onwards)
+    which is required unless workers=1.  The records (SeqRecord objects
+    with their features) are pickled to send them back from the workers.
+
+    >>> from Bio import SeqIO
+    >>> for record in SeqIO.parse_parallel("Fasta/f002", "fasta", workers=1) :
+    ...     print record.id, len(record)
+    gi|1348912|gb|G26680|G26680 633
+    gi|1348917|gb|G26685|G26685 413
+    gi|1592936|gb|G29385|G29385 471
+    """
+    import _parallel
+
+    #Try and give helpful error messages:
+    if not isinstance(filename, basestring) :
+        raise TypeError("Need a filename, not a handle")
+    if not isinstance(format, basestring) :
+        raise TypeError("Need a string for the file format (lower case)")
+    if format != format.lower() :
+        raise ValueError("Format string '%s' should be lower case" % format)
+    if format not in _parallel._RecordEnd \
+    and format not in _parallel._RecordStart :
+        if format in _FormatToIterator :
+            raise ValueError("Format '%s' cannot be split for parallel " \
+                             "parsing, use the parse function" % format)
+        raise ValueError("Unknown format '%s'" % format)
+    if alphabet is not None and not (isinstance(alphabet, Alphabet) or \
+                                     isinstance(alphabet, AlphabetEncoder)) :
+        raise ValueError("Invalid alphabet, %s" % repr(alphabet))
+    if workers is None :
+        if _parallel.multiprocessing is None :
+            workers = 1
+        else :
+            workers = _parallel.multiprocessing.cpu_count()
+    if workers < 1 :
+        raise ValueError("Need at least one worker process")
+    if workers > 1 and _parallel.multiprocessing is None :
+        raise ImportError("Parsing with more than one worker process needs " \
+                          "the multiprocessing module (Python 2.6 or later)")
+    if chunk_size < 1 :
+        raise ValueError("The chunk size must be positive")
+    if in_flight is None :
+        in_flight = 2 * workers
+    elif in_flight < 1 :
+        raise ValueError("Need at least one chunk in flight")
+    if not os.path.isfile(filename) :
+        raise IOError("No such file: '%s'" % filename)
+    return _parallel.parse_parallel(filename, format, alphabet, workers,
+                                    ordered, chunk_size, in_flight)
+
 #This is a generator function
 def _iterate_via_AlignIO(handle, format, alphabet) :
     """Iterate over all records in several alignments (PRIVATE)."""
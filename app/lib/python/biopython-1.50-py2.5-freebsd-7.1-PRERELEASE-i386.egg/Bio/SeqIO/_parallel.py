@@ -0,0 +1,180 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Parsing sequence files with several processes (PRIVATE).
+
+You are expected to use this via the Bio.SeqIO.parse_parallel function.
+
+The file is split into chunks of whole records by byte offset, looking
+for the record boundaries (the line after a terminating // line for
+GenBank, EMBL and SwissProt, or a > title line for FASTA).  Each chunk
+is parsed by a worker process from the multiprocessing module (included
+with Python 2.6 onwards), and the resulting SeqRecord objects are sent
+back to the main process.  Only a limited number of chunks are handed
+out at once, so the memory used does not depend on the file size.
+"""
+
+from cStringIO import StringIO
+
+try :
+    import multiprocessing
+except ImportError :
+    multiprocessing = None
+
+#Formats which can be split, giving the line prefix which ends a record
+#(the boundary is the start of the following line) or starts one.
+_RecordEnd = {"genbank" : "//",
+              "gb" : "//",
+              "genbank-cds" : "//",
+              "embl" : "//",
+              "embl-cds" : "//",
+              "swiss" : "//",
+              }
+_RecordStart = {"fasta" : ">"}
+
+def _find_boundary(handle, offset, format, block_size=65536) :
+    """Returns the first record boundary at or after offset (PRIVATE).
+
+    The handle should be opened in binary mode.  Returns None if there are
+    no more record boundaries (i.e. the rest of the file belongs to the
+    record already started).
+    """
+    if format in _RecordEnd :
+        marker = "\n" + _RecordEnd[format]
+    else :
+        marker = "\n" + _RecordStart[format]
+    #Start one byte early so a marker right at the offset is found
+    #(the offset is always after the start of the file)
+    start = offset - 1
+    handle.seek(start)
+    data = ""
+    while True :
+        block = handle.read(block_size)
+        if not block :
+            return None
+        data += block
+        index = data.find(marker)
+        if index == -1 :
+            #Keep enough to find a marker split between blocks
+            keep = len(marker) - 1
+            start += len(data) - keep
+            data = data[-keep:]
+            continue
+        if format in _RecordStart :
+            return start + index + 1
+        #Need the end of the // line, which may be in the next block
+        line_end = data.find("\n", index + 1)
+        while line_end == -1 :
+            block = handle.read(block_size)
+            if not block :
+                return None
+            data += block
+            line_end = data.find("\n", index + 1)
+        return start + line_end + 1
+
+def _split_file(filename, format, chunk_size) :
+    """Yields (start, end) byte offsets of chunks of whole records (PRIVATE)."""
+    handle = open(filename, "rb")
+    try :
+        handle.seek(0, 2)
+        file_size = handle.tell()
+        start = 0
+        while start < file_size :
+            end = _find_boundary(handle, start + chunk_size, format)
+            if end is None or end >= file_size :
+                yield start, file_size
+                break
+            yield start, end
+            start = end
+    finally :
+        handle.close()
+
+def _parse_chunk(filename, format, alphabet, start, end) :
+    """Parses a chunk of the file into a list of SeqRecords (PRIVATE).
+
+    This is run in the worker processes.
+    """
+    from Bio import SeqIO
+    handle = open(filename, "rb")
+    try :
+        handle.seek(start)
+        data = handle.read(end - start)
+    finally :
+        handle.close()
+    #Mimic universal newlines mode
+    if "\r" in data :
+        data = data.replace("\r\n", "\n").replace("\r", "\n")
+    return list(SeqIO.parse(StringIO(data), format, alphabet))
+
+def _parse_ordered(pool, tasks, in_flight) :
+    """Yields records from the chunks in file order (PRIVATE)."""
+    pending = []
+    for task in tasks :
+        pending.append(pool.apply_async(_parse_chunk, task))
+        if len(pending) >= in_flight :
+            for record in pending.pop(0).get() :
+                yield record
+    while pending :
+        for record in pending.pop(0).get() :
+            yield record
+
+def _parse_unordered(pool, tasks, in_flight) :
+    """Yields records from the chunks as soon as each is parsed (PRIVATE)."""
+    #The AsyncResult objects are checked in turn, rather than using a
+    #callback, so that any exception from a worker reaches the caller.
+    pending = []
+    tasks = iter(tasks)
+    more = True
+    while pending or more :
+        while more and len(pending) < in_flight :
+            try :
+                task = tasks.next()
+            except StopIteration :
+                more = False
+                break
+            pending.append(pool.apply_async(_parse_chunk, task))
+        if not pending :
+            break
+        #Wait on the oldest chunk, but take any which finish sooner
+        done = None
+        while done is None :
+            for result in pending :
+                if result.ready() :
+                    done = result
+                    break
+            else :
+                pending[0].wait(0.05)
+        pending.remove(done)
+        for record in done.get() :
+            yield record
+
+def parse_parallel(filename, format, alphabet, workers, ordered,
+                   chunk_size, in_flight) :
+    """Iterates over the records in a file, parsing with several processes.
+
+    The arguments are assumed to have been checked already by the
+    Bio.SeqIO.parse_parallel function.
+    """
+    tasks = ((filename, format, alphabet, start, end) \
+             for (start, end) in _split_file(filename, format, chunk_size))
+    if workers == 1 :
+        #Nothing to gain from a separate process
+        for task in tasks :
+            for record in _parse_chunk(*task) :
+                yield record
+        return
+
+    pool = multiprocessing.Pool(workers)
+    try :
+        if ordered :
+            records = _parse_ordered(pool, tasks, in_flight)
+        else :
+            records = _parse_unordered(pool, tasks, in_flight)
+        for record in records :
+            yield record
+        pool.close()
+    finally :
+        #Stops the workers if the caller gives up early, or on an error
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,268 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Search a nucleotide sequence for many ambiguous patterns at once.
+
+The patterns (e.g. primers, probes or restriction sites) may use the
+IUPAC ambiguity codes (N = A or C or G or T, R = A or G etc.), and can be
+matched allowing up to a given number of mismatches (substitutions).  By
+default both strands are searched, looking for the reverse complement of
+each pattern on the given sequence.
+
+The search is bit-parallel over the sequence positions: for each base
+the positions holding it are set as bits of a (long) integer, so one
+shift and one AND compare a pattern letter against a whole block of
+sequence, and the mismatches are counted with a few more integer
+operations per letter.  The sequence is read a block at a time, so it can
+be given as an iterable of strings (e.g. lines of a file) as well as a
+string or Seq object.
+
+>>> from Bio.SeqUtils.NtSearch import PatternSet
+>>> patterns = PatternSet({"EcoRI" : "GAATTC", "probe" : "ACGTNNAC"})
+>>> for hit in patterns.search("TTGAATTCAAACGTTTACGG") :
+...     print hit
+(2, 8, 'EcoRI', 1, 0)
+(2, 8, 'EcoRI', -1, 0)
+(10, 18, 'probe', 1, 0)
+
+Each hit is a tuple of the start and end of the match on the given
+sequence (Python style, counting from zero), the pattern name, the
+strand (1 or -1) and the number of mismatches.  Allowing one mismatch:
+
+>>> patterns = PatternSet(["GAATTC"], mismatches=1, both_strands=False)
+>>> for hit in patterns.search("GAATTCGTATTC") :
+...     print hit
+(0, 6, 'GAATTC', 1, 0)
+(6, 12, 'GAATTC', 1, 1)
+"""
+
+import re
+from Bio.Data import IUPACData
+
+_bases = "ACGT"
+_nonzero = re.compile("[^0]")
+
+def _reverse_complement(pattern):
+    """Reverse complement of an IUPAC DNA pattern (PRIVATE)."""
+    complement = IUPACData.ambiguous_dna_complement
+    letters = [complement[letter] for letter in pattern]
+    letters.reverse()
+    return "".join(letters)
+
+def _positions(bits):
+    """Return the positions of the set bits of an integer, in order (PRIVATE).
+
+    This works on the hexadecimal string of the integer, so only the
+    nonzero digits are looked at in Python.
+    """
+    digits = "%x" % bits
+    end = len(digits) - 1
+    positions = []
+    for match in _nonzero.finditer(digits):
+        value = int(match.group(), 16)
+        base = 4 * (end - match.start())
+        for bit in (0, 1, 2, 3):
+            if value >> bit & 1:
+                positions.append(base + bit)
+    positions.sort()
+    return positions
+
+class PatternSet:
+    """A set of IUPAC nucleotide patterns to search for together.
+
+    Attributes:
+    patterns     - list of (name, pattern, strand) tuples searched for,
+                   including the reverse complements
+    mismatches   - maximum number of mismatches allowed in a hit
+    ignore_case  - if the sequence case is ignored
+    """
+    def __init__(self, patterns, mismatches=0, both_strands=True,
+                 ignore_case=True):
+        """Compile the patterns.
+
+        patterns     - a dictionary of names and patterns, or a list of
+                       patterns (which are then also used as the names)
+        mismatches   - maximum number of mismatches allowed in a hit
+        both_strands - also search for the reverse complement of each
+                       pattern (reported on strand -1)
+        ignore_case  - match lower case letters in the sequence too (the
+                       patterns themselves must use upper case IUPAC codes)
+        """
+        if hasattr(patterns, "items"):
+            items = patterns.items()
+            items.sort()
+        else:
+            items = [(str(pattern), pattern) for pattern in patterns]
+        if mismatches < 0:
+            raise ValueError("The number of mismatches cannot be negative")
+        self.mismatches = mismatches
+        self.ignore_case = ignore_case
+        self.patterns = []
+        for name, pattern in items:
+            pattern = str(pattern)
+            if not pattern:
+                raise ValueError("Empty pattern %r" % (name,))
+            for letter in pattern:
+                if letter not in IUPACData.ambiguous_dna_values:
+                    raise ValueError("Pattern %r has a non IUPAC letter %r" \
+                                     % (name, letter))
+            self.patterns.append((name, pattern, 1))
+            if both_strands:
+                self.patterns.append((name, _reverse_complement(pattern), -1))
+        self._max_length = max([len(p[1]) for p in self.patterns])
+
+        # One translation table per base, mapping it to "1" and all else
+        # to "0", used to turn a block of sequence into bit sets
+        self._tables = {}
+        for base in _bases:
+            table = ["0"] * 256
+            table[ord(base)] = "1"
+            if ignore_case:
+                table[ord(base.lower())] = "1"
+            self._tables[base] = "".join(table)
+
+    def __repr__(self):
+        return "<PatternSet of %i patterns, %i mismatches>" \
+               % (len(self.patterns), self.mismatches)
+
+    def _letter_bits(self, block):
+        """Return a dictionary of the bit sets of each IUPAC letter (PRIVATE).
+
+        Bit i is set if position i of the block matches the letter.
+        """
+        base_bits = {}
+        for base in _bases:
+            #Reversed, so that the first letter is the lowest bit
+            digits = block.translate(self._tables[base])[::-1]
+            base_bits[base] = long(digits, 2)
+        bits = {}
+        for letter, values in IUPACData.ambiguous_dna_values.iteritems():
+            value = 0
+            for base in values:
+                value |= base_bits[base]
+            bits[letter] = value
+        return bits
+
+    def _search_block(self, block, bits, last):
+        """Find the hits in a block of sequence (PRIVATE).
+
+        Returns a list of (start, end, name, strand, mismatches) tuples,
+        with the positions relative to the start of the block.  Unless
+        this is the last block, matches starting in the final (maximum
+        pattern length - 1) positions are left for the next block.
+        """
+        size = len(block)
+        full = (1L << size) - 1
+        k = self.mismatches
+        hits = []
+        for name, pattern, strand in self.patterns:
+            length = len(pattern)
+            if length > size:
+                continue
+            if last:
+                starts = size - length + 1
+            else:
+                starts = size - self._max_length + 1
+            if k == 0:
+                found = (1L << starts) - 1
+                for i, letter in enumerate(pattern):
+                    found &= bits[letter] >> i
+                    if not found:
+                        break
+            else:
+                # counts[t] has bit i set where there have been more
+                # than t mismatches for the match starting at i
+                counts = [0] * (k + 1)
+                for i, letter in enumerate(pattern):
+                    wrong = full ^ (bits[letter] >> i)
+                    for t in range(k, 0, -1):
+                        counts[t] |= counts[t-1] & wrong
+                    counts[0] |= wrong
+                found = ((1L << starts) - 1) & ~counts[k]
+            if not found:
+                continue
+            values = IUPACData.ambiguous_dna_values
+            for start in _positions(found):
+                if k:
+                    text = block[start:start+length]
+                    if self.ignore_case:
+                        text = text.upper()
+                    wrong = 0
+                    for letter, base in zip(pattern, text):
+                        if base not in values[letter]:
+                            wrong += 1
+                else:
+                    wrong = 0
+                hits.append((start, start + length, name, strand, wrong))
+        return hits
+
+    def search(self, sequence, block_size=1000000):
+        """Iterate over the hits on a sequence, in order of their start.
+
+        sequence   - a string or Seq object, or an iterable of strings
+                     (e.g. the lines of the sequence) read in turn
+        block_size - number of letters to search at a time
+
+        Returns (start, end, name, strand, mismatches) tuples, where start
+        and end are on the given sequence, and strand is -1 for a match to
+        the reverse complement of the pattern.  Overlapping hits are all
+        reported.  The white space around each string of an iterable is
+        removed, so the positions are on the joined up sequence, while a
+        single string is searched as it is.
+        """
+        if isinstance(sequence, str):
+            chunks = [sequence]
+        elif hasattr(sequence, "tostring"):
+            chunks = [sequence.tostring()]
+        else:
+            chunks = (chunk.strip() for chunk in sequence)
+        block_size = max(block_size, 2 * self._max_length)
+        overlap = self._max_length - 1
+        offset = 0
+        pending = []
+        pending_size = 0
+        for chunk in chunks:
+            pending.append(chunk)
+            pending_size += len(pending[-1])
+            if pending_size < block_size:
+                continue
+            block = "".join(pending)
+            start = 0
+            while len(block) - start >= block_size:
+                piece = block[start:start + block_size]
+                for hit in self._sorted_hits(piece, offset, False):
+                    yield hit
+                start += block_size - overlap
+                offset += block_size - overlap
+            pending = [block[start:]]
+            pending_size = len(pending[0])
+        block = "".join(pending)
+        if block:
+            for hit in self._sorted_hits(block, offset, True):
+                yield hit
+
+    def _sorted_hits(self, block, offset, last):
+        hits = self._search_block(block, self._letter_bits(block), last)
+        #By position, then the forward strand first
+        hits.sort(key=lambda hit : (hit[0], hit[1], hit[2], -hit[3]))
+        return [(start + offset, end + offset, name, strand, wrong) \
+                for (start, end, name, strand, wrong) in hits]
+
+def search(sequence, patterns, mismatches=0, both_strands=True):
+    """Search a sequence for IUPAC nucleotide patterns, returning a list of hits.
+
+    This compiles the patterns into a PatternSet and returns the list of
+    (start, end, name, strand, mismatches) tuples from its search method.
+    """
+    return list(PatternSet(patterns, mismatches, both_strands).search(sequence))
+
+def _test():
+    """Run the Bio.SeqUtils.NtSearch module's doctests."""
+    print "Runing doctests..."
+    import doctest
+    doctest.testmod()
+    print "Done"
+
+if __name__ == "__main__":
+    _test()
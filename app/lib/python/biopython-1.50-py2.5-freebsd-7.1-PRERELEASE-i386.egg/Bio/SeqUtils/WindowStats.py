@@ -0,0 +1,230 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+
+"""Single pass sliding window statistics for nucleotide sequences.
+
+The sliding_windows function reads a sequence once, in chunks, and
+reports the base composition, GC content, GC skew, AT skew and
+(optionally) the dinucleotide counts for each window.  The sequence can
+be a python string, a Seq object, a BioSQL DBSeq (which is fetched from
+the database a chunk at a time) or a file handle holding the plain
+sequence or a single FASTA record, so a whole chromosome never needs to
+be held in memory.
+
+e.g.
+
+>>> from Bio.SeqUtils.WindowStats import sliding_windows
+>>> for w in sliding_windows("GGGCCATTAAAAGCGC", window=8) :
+...     print w.start, w.end, w.gc, w.gc_skew, w.at_skew
+0 8 62.5 0.2 -0.333333333333
+8 16 50.0 0.0 1.0
+
+If NumPy is installed, each chunk is turned into cumulative count arrays
+and every window in the chunk is computed with a single subtraction,
+otherwise the letters in each window are counted using string methods.
+"""
+
+import re
+
+try :
+    import numpy
+except ImportError :
+    numpy = None
+
+#S (G or C) is counted towards the GC content, as in Bio.SeqUtils.GC
+_BASES = "ACGTS"
+_DINUCLEOTIDES = [a+b for a in "ACGT" for b in "ACGT"]
+_dinucleotide_re = re.compile("(?=(%s))" % "|".join(_DINUCLEOTIDES))
+
+if numpy is not None :
+    #Maps (upper case) letters to an index in _BASES, anything else to 5
+    _code_lut = numpy.zeros(256, numpy.uint8) + len(_BASES)
+    for _i, _letter in enumerate(_BASES) :
+        _code_lut[ord(_letter)] = _i
+    del _i, _letter
+
+class WindowStats(object) :
+    """Statistics for a single window of a nucleotide sequence.
+
+    Attributes:
+     - start, end    - the window's location (python style, zero based)
+     - counts        - dictionary of the A, C, G, T (including U) and S
+                       counts (case insensitive)
+     - gc            - G+C content as a percentage of the window length
+                       (including S, as in Bio.SeqUtils.GC)
+     - gc_skew       - (G-C)/(G+C), zero if there are no G or C
+     - at_skew       - (A-T)/(A+T), zero if there are no A or T
+     - dinucleotides - dictionary of the (overlapping) counts of the 16
+                       unambiguous dinucleotides, or None if not requested
+    """
+    def __init__(self, start, end, counts, dinucleotides=None) :
+        self.start = start
+        self.end = end
+        self.counts = counts
+        self.dinucleotides = dinucleotides
+        g, c, a, t = counts["G"], counts["C"], counts["A"], counts["T"]
+        try :
+            self.gc = (g + c + counts["S"]) * 100.0 / (end - start)
+        except ZeroDivisionError :
+            self.gc = 0.0
+        self.gc_skew = _skew(g, c)
+        self.at_skew = _skew(a, t)
+
+    def __len__(self) :
+        return self.end - self.start
+
+    def __repr__(self) :
+        return "WindowStats(%i, %i, %s)" % (self.start, self.end,
+                                            repr(self.counts))
+
+def _skew(x, y) :
+    if x + y :
+        return (x - y) / float(x + y)
+    return 0.0
+
+def _iter_chunks(source, chunk_size) :
+    """Yields upper case string chunks from a sequence or handle (PRIVATE)."""
+    if hasattr(source, "readline") :
+        #File handle, plain sequence or a single FASTA record
+        lines = []
+        size = 0
+        for line in source :
+            if line.startswith(">") : continue
+            line = "".join(line.split())
+            lines.append(line)
+            size += len(line)
+            if size >= chunk_size :
+                yield "".join(lines).upper().replace("U", "T")
+                lines = []
+                size = 0
+        if lines :
+            yield "".join(lines).upper().replace("U", "T")
+    else :
+        #String, Seq, MutableSeq or DBSeq - only slice a chunk at a time
+        for start in xrange(0, len(source), chunk_size) :
+            chunk = str(source[start:start+chunk_size])
+            yield chunk.upper().replace("U", "T")
+
+def _count_windows_numpy(text, starts, ends, dinucleotides) :
+    """Returns lists of counts dictionaries for the windows (PRIVATE)."""
+    codes = _code_lut[numpy.fromstring(text, numpy.uint8)]
+    starts = numpy.asarray(starts)
+    ends = numpy.asarray(ends)
+    cumulative = numpy.zeros(len(text) + 1, numpy.int32)
+    columns = {}
+    for i, letter in enumerate(_BASES) :
+        numpy.cumsum(codes == i, out=cumulative[1:])
+        columns[letter] = (cumulative[ends] - cumulative[starts]).tolist()
+    counts = [dict(zip(_BASES, values)) for values \
+              in zip(*[columns[letter] for letter in _BASES])]
+    if not dinucleotides :
+        return counts, None
+    #Dinucleotide i covers letters i and i+1, so a window [s:e] has those
+    #starting in [s:e-1]
+    pairs = codes[:-1] * 4 + codes[1:]
+    pairs[(codes[:-1] > 3) | (codes[1:] > 3)] = 16
+    cumulative = cumulative[:len(pairs)+1]
+    last = numpy.maximum(ends - 1, starts)
+    columns = []
+    for i in range(16) :
+        numpy.cumsum(pairs == i, out=cumulative[1:])
+        columns.append((cumulative[last] - cumulative[starts]).tolist())
+    pairs = [dict(zip(_DINUCLEOTIDES, values)) for values in zip(*columns)]
+    return counts, pairs
+
+def _count_windows_python(text, starts, ends, dinucleotides) :
+    """Returns lists of counts dictionaries for the windows (PRIVATE)."""
+    counts = []
+    pairs = []
+    for start, end in zip(starts, ends) :
+        window = text[start:end]
+        counts.append(dict([(letter, window.count(letter)) \
+                            for letter in _BASES]))
+        if dinucleotides :
+            pair_counts = dict.fromkeys(_DINUCLEOTIDES, 0)
+            for pair in _dinucleotide_re.findall(window) :
+                pair_counts[pair] += 1
+            pairs.append(pair_counts)
+    if not dinucleotides :
+        pairs = None
+    return counts, pairs
+
+def sliding_windows(source, window=1000, step=None, dinucleotides=False,
+                    partial=False, chunk_size=1000000) :
+    """Iterates over sliding windows of a sequence, yielding WindowStats.
+
+    Arguments:
+     - source        - the sequence, as a string, Seq object, DBSeq, or a
+                       file handle (plain sequence or a single FASTA record)
+     - window        - window size, integer
+     - step          - distance between window starts, defaults to the
+                       window size (i.e. adjacent windows)
+     - dinucleotides - boolean, also count the dinucleotides?
+     - partial       - boolean, also report the windows which run off the
+                       end of the sequence (truncated at the end)?
+     - chunk_size    - how much of the sequence to read at a time
+
+    The sequence is read once, with at most one chunk plus one window of
+    it held in memory.
+
+    >>> [w.counts["G"] for w in sliding_windows("GGGAGGAAG", 4, 2)]
+    [3, 3, 2]
+    >>> [w.counts["G"] for w in sliding_windows("GGGAGGAAG", 4, 2, partial=True)]
+    [3, 3, 2, 1, 1]
+    >>> w = sliding_windows("ACGTTA", 6, dinucleotides=True).next()
+    >>> w.dinucleotides["TT"], w.dinucleotides["TA"], w.dinucleotides["AA"]
+    (1, 1, 0)
+    """
+    if step is None :
+        step = window
+    if window < 1 or step < 1 :
+        raise ValueError("The window size and step must be positive")
+    if numpy is not None :
+        count_windows = _count_windows_numpy
+    else :
+        count_windows = _count_windows_python
+    chunk_size = max(chunk_size, window)
+
+    buffer = ""
+    offset = 0 #position of buffer[0] in the full sequence
+    next_start = 0 #next window start, in the full sequence
+    for chunk in _iter_chunks(source, chunk_size) :
+        buffer += chunk
+        starts = range(next_start - offset, len(buffer) - window + 1, step)
+        if starts :
+            ends = [start + window for start in starts]
+            counts, pairs = count_windows(buffer, starts, ends, dinucleotides)
+            for i, start in enumerate(starts) :
+                if pairs is None :
+                    yield WindowStats(offset + start, offset + ends[i],
+                                      counts[i])
+                else :
+                    yield WindowStats(offset + start, offset + ends[i],
+                                      counts[i], pairs[i])
+            next_start = offset + starts[-1] + step
+        #Only keep the part of the sequence still needed
+        drop = min(next_start - offset, len(buffer))
+        buffer = buffer[drop:]
+        offset += drop
+
+    if partial and buffer :
+        starts = range(0, len(buffer), step)
+        ends = [min(start + window, len(buffer)) for start in starts]
+        counts, pairs = count_windows(buffer, starts, ends, dinucleotides)
+        for i, start in enumerate(starts) :
+            if pairs is None :
+                yield WindowStats(offset + start, offset + ends[i], counts[i])
+            else :
+                yield WindowStats(offset + start, offset + ends[i],
+                                  counts[i], pairs[i])
+
+def _test():
+    """Run the Bio.SeqUtils.WindowStats module's doctests."""
+    print "Runing doctests..."
+    import doctest
+    doctest.testmod()
+    print "Done"
+
+if __name__ == "__main__":
+    _test()
@@ -68,17 +68,20 @@ def GC123(seq):
     Copes with mixed case sequences, but does NOT deal with ambiguous
     nucleotides.
     """
+    try :
+        #Assume its a string
+        upper = seq.upper()
+    except AttributeError :
+        #Should be a Seq object then
+        upper = seq.tostring().upper()
     d= {}
     for nt in ['A','T','G','C']:
        d[nt] = [0,0,0]
-
-    for i in range(0,len(seq),3):
-        codon = seq[i:i+3]
-        if len(codon) <3: codon += '  '
-        for pos in range(0,3):
-            for nt in ['A','T','G','C']:
-                if codon[pos] == nt or codon[pos] == nt.lower():
-                    d[nt][pos] += 1
+    #Count each codon position in one go, rather than codon by codon
+    for pos in range(0,3):
+        position = upper[pos::3]
+        for nt in ['A','T','G','C']:
+            d[nt][pos] = position.count(nt)
     gc = {}
     gcall = 0
     nall = 0
@@ -101,17 +104,15 @@ def GC_skew(seq, window = 100):
     Returns a list of ratios (floats), controlled by the length of the sequence
     and the size of the window.
 
-    Does NOT look at any ambiguous nucleotides.
+    Does NOT look at any ambiguous nucleotides.  Windows without any G or
+    C give a skew of zero.
+
+    The sequence is read once, see Bio.SeqUtils.WindowStats for the other
+    statistics which can be collected at the same time (and for reading
+    the sequence from a BioSQL database or a file handle).
     """
-    # 8/19/03: Iddo: added lowercase 
-    values = []
-    for i in range(0, len(seq), window):
-        s = seq[i: i + window]
-        g = s.count('G') + s.count('g')
-        c = s.count('C') + s.count('c')
-        skew = (g-c)/float(g+c)
-        values.append(skew)
-    return values
+    from Bio.SeqUtils.WindowStats import sliding_windows
+    return [w.gc_skew for w in sliding_windows(seq, window, partial=True)]
 
 from math import pi, sin, cos, log
 def xGC_skew(seq, window = 1000, zoom = 100,
@@ -190,7 +191,13 @@ def nt_search(seq, subseq):
 
     use ambiguous values (like N = A or T or C or G, R = A or G etc.)
     searches only on forward strand
+
+    Returns a list of the equivalent regular expression followed by the
+    start positions of the (possibly overlapping) matches.  To search for
+    many patterns at once, on both strands or allowing mismatches, see
+    Bio.SeqUtils.NtSearch.
     """
+    from Bio.SeqUtils.NtSearch import PatternSet
     pattern = ''
     for nt in subseq:
         value = IUPACData.ambiguous_dna_values[nt]
@@ -199,16 +206,10 @@ def nt_search(seq, subseq):
         else:
             pattern += '[%s]' % value
 
-    pos = -1
     result = [pattern]
-    l = len(seq)
-    while True:
-        pos+=1
-        s = seq[pos:]
-        m = re.search(pattern, s)
-        if not m: break
-        pos += int(m.start(0))
-        result.append(pos)
+    matcher = PatternSet([subseq], both_strands=False, ignore_case=False)
+    for hit in matcher.search(str(seq)):
+        result.append(hit[0])
     return result
 
 # }}}
@@ -338,14 +339,17 @@ def six_frame_translations(seq, genetic_code = 1):
     from Bio.SeqUtils import six_frame_translations
     print six_frame_translations("AUGGCCAUUGUAAUGGGCCGCUGA")
     """
-    from Bio.Seq import reverse_complement, translate
+    from Bio.Seq import reverse_complement, translate_frames
     anti = reverse_complement(seq)
     comp = anti[::-1]
     length = len(seq)
     frames = {}
+    #Each call translates all three frames in a single pass
+    forward = translate_frames(seq, genetic_code)
+    backward = translate_frames(anti, genetic_code)
     for i in range(0,3):
-        frames[i+1]  = translate(seq[i:], genetic_code)
-        frames[-(i+1)] = reverse(translate(anti[i:], genetic_code))
+        frames[i+1]  = forward[i]
+        frames[-(i+1)] = reverse(backward[i])
 
     # create header
     if length > 20:
@@ -359,24 +363,25 @@ def six_frame_translations(seq, genetic_code = 1):
         header += '%s:%d ' % (nt, seq.count(nt.upper()))
       
     header += '\nSequence: %s, %d nt, %0.2f %%GC\n\n\n' % (short.lower(),length, GC(seq))       
-    res = header
+    #Collect the pieces in a list, repeated string addition is quadratic
+    res = [header]
    
     for i in range(0,length,60):
         subseq = seq[i:i+60]
         csubseq = comp[i:i+60]
         p = i/3
-        res = res + '%d/%d\n' % (i+1, i/3+1)
-        res = res + '  ' + '  '.join(map(None,frames[3][p:p+20])) + '\n'
-        res = res + ' ' + '  '.join(map(None,frames[2][p:p+20])) + '\n'
-        res = res + '  '.join(map(None,frames[1][p:p+20])) + '\n'
+        res.append('%d/%d\n' % (i+1, i/3+1))
+        res.append('  ' + '  '.join(map(None,frames[3][p:p+20])) + '\n')
+        res.append(' ' + '  '.join(map(None,frames[2][p:p+20])) + '\n')
+        res.append('  '.join(map(None,frames[1][p:p+20])) + '\n')
         # seq
-        res = res + subseq.lower() + '%5d %%\n' % int(GC(subseq))
-        res = res + csubseq.lower() + '\n'
+        res.append(subseq.lower() + '%5d %%\n' % int(GC(subseq)))
+        res.append(csubseq.lower() + '\n')
         # - frames
-        res = res + '  '.join(map(None,frames[-2][p:p+20]))  +' \n'
-        res = res + ' ' + '  '.join(map(None,frames[-1][p:p+20])) + '\n'
-        res = res + '  ' + '  '.join(map(None,frames[-3][p:p+20])) + '\n\n'
-    return res
+        res.append('  '.join(map(None,frames[-2][p:p+20]))  +' \n')
+        res.append(' ' + '  '.join(map(None,frames[-1][p:p+20])) + '\n')
+        res.append('  ' + '  '.join(map(None,frames[-3][p:p+20])) + '\n\n')
+    return "".join(res)
 
 # }}}
 
@@ -54,8 +54,26 @@ Because the parser doesn't see this data until the final record, it cannot be ad
 the appropriate records.  Instead these tags will be returned with the last contig record.
 Thus an ace file does not entirerly suit the concept of iterating. If WA, CT, RT, WR tags
 are needed, the 'read' function rather than the 'parse' function might be more appropriate.
+
+3) For very large assemblies, the function 'index' scans a (seekable) ace file once,
+noting where each contig and read starts, and returns an AceIndex:
+
+        from Bio.Sequencing import Ace
+        ace=Ace.index(open('my_ace_file.ace'))
+        for contig in ace:
+            print contig.name, contig.nreads
+        contig=ace['Contig1']
+        read=contig.reads[0]
+
+The contigs are LazyContig objects, which only read their sequence, quality, af and bs
+data from the file when first used, and their reads each time they are used, so only
+the offsets of the reads are kept in memory.  The consensus quality is an array of
+bytes rather than a list.  The WA, CT, RT and WR tags are read during the scan and
+sorted into place as by the 'read' function.
 """
 
+import array
+
 
 class rd:
     """RD (reads), store a read with its name, sequence etc."""
@@ -263,11 +281,13 @@ def parse(handle):
 
         record = Contig(line)
 
+        seq = []
         for line in handle:
             line = line.strip()
             if not line:
                 break
-            record.sequence+=line
+            seq.append(line)
+        record.sequence = "".join(seq)
 
         for line in handle:
             if line.strip():
@@ -330,11 +350,13 @@ def parse(handle):
 
             record.reads.append(Reads(line))
 
+            seq = []
             for line in handle:
                 line = line.strip()
                 if not line:
                     break
-                record.reads[-1].rd.sequence+=line
+                seq.append(line)
+            record.reads[-1].rd.sequence = "".join(seq)
 
             for line in handle:
                 if line.strip():
@@ -516,6 +538,247 @@ def read(handle):
     record.sort()
     return record
 
+# Offsets into the file, as C longs if they are big enough
+if array.array('l').itemsize >= 8:
+    _offset_type = 'l'
+else:
+    _offset_type = 'd'
+
+def _read_block(handle):
+    """Read lines up to the next blank line, stripped (PRIVATE)."""
+    lines = []
+    while True:
+        line = handle.readline()
+        if not line:
+            break
+        line = line.strip()
+        if not line:
+            break
+        lines.append(line)
+    return lines
+
+def _next_line(handle):
+    """Return the next non-blank line, or an empty string at the end (PRIVATE)."""
+    while True:
+        line = handle.readline()
+        if not line or line.strip():
+            return line
+
+def _read_tag(handle, line, ace):
+    """Read a WA, CT, RT or WR tag block into an AceIndex (PRIVATE)."""
+    if line.startswith("RT{") or line.startswith("WR{"):
+        if line.startswith("RT{"):
+            tags, tag_class = ace._rt, rt
+        else:
+            tags, tag_class = ace._wr, wr
+        tag_type = line[:2]
+        while True:
+            line = handle.readline()
+            if not line:
+                raise ValueError("Unexpected end of %s block" % tag_type)
+            line = line.strip()
+            if line == '}':
+                break
+            tag = tag_class(line)
+            tags.setdefault(tag.name, []).append(tag)
+    elif line.startswith("WA{"):
+        line = handle.readline()
+        if not line:
+            raise ValueError("Failed to read WA block")
+        tag = wa(line)
+        if ace.wa is None:
+            ace.wa = []
+        ace.wa.append(tag)
+        while True:
+            line = handle.readline()
+            if not line or line.strip() == '}':
+                break
+            tag.info.append(line.strip())
+    else:
+        line = handle.readline()
+        if not line:
+            raise ValueError("Failed to read CT block")
+        tag = ct(line)
+        ace._ct.setdefault(tag.name, []).append(tag)
+        while True:
+            line = handle.readline()
+            if not line:
+                break
+            line = line.strip()
+            if line == "COMMENT{":
+                while True:
+                    line = handle.readline()
+                    if not line:
+                        break
+                    line = line.strip()
+                    if line.endswith("C}"):
+                        break
+                    tag.comment.append(line)
+            elif line == '}':
+                break
+            else:
+                tag.info.append(line)
+
+class _LazyReads:
+    """The reads of a LazyContig, read from the file when used (PRIVATE)."""
+    def __init__(self, contig):
+        self._contig = contig
+
+    def __len__(self):
+        return len(self._contig._read_offsets)
+
+    def __getitem__(self, i):
+        offset = self._contig._read_offsets[i]
+        return self._contig._index._read_read(long(offset))
+
+    def __iter__(self):
+        for offset in self._contig._read_offsets:
+            yield self._contig._index._read_read(long(offset))
+
+class LazyContig(Contig):
+    """Contig of an AceIndex, with its data read from the file when used.
+
+    The CO header values are read with the index.  The sequence, quality,
+    af and bs attributes are read from the file the first time one of them
+    is used, and kept.  The reads attribute is a sequence which reads each
+    Reads object from the file when it is accessed, without keeping it.
+    The quality is an array of bytes, rather than a list of integers.
+    """
+    def __init__(self, index, line, offset):
+        # Not calling Contig.__init__, that would set the lazy attributes
+        header = line.split()
+        self.name = header[1]
+        self.nbases = int(header[2])
+        self.nreads = int(header[3])
+        self.nsegments = int(header[4])
+        self.uorc = header[5]
+        self.wa = None
+        self._index = index
+        self._offset = offset
+        self._read_offsets = array.array(_offset_type)
+
+    def __getattr__(self, name):
+        if name in ("sequence", "quality", "af", "bs"):
+            self._index._read_contig(self)
+            return self.__dict__[name]
+        elif name == "reads":
+            return _LazyReads(self)
+        elif name == "ct":
+            return self._index._ct.get(self.name)
+        raise AttributeError(name)
+
+class AceIndex:
+    """Index of the contigs and reads of an ACE file, made in one pass.
+
+    Attributes:
+    ncontigs, nreads - the values from the AS line
+    contigs          - list of LazyContig objects, in the file order
+    wa               - list of the WA tags (or None)
+
+    The index can be iterated over (giving the contigs), and the contigs
+    can be looked up by name.  The handle must stay open (and seekable)
+    for as long as the contigs are used.
+    """
+    def __init__(self, handle):
+        self._handle = handle
+        self.contigs = []
+        self._names = {}
+        self.wa = None
+        self._ct = {}
+        self._rt = {}
+        self._wr = {}
+
+        handle.seek(0)
+        line = handle.readline()
+        if not line.startswith('AS'):
+            raise ValueError("File does not start with 'AS'.")
+        self.ncontigs, self.nreads = map(int, line.split()[1:3])
+
+        contig = None
+        # The positions come from tell, not by adding up the line lengths,
+        # which differ from the bytes in the file if the newlines have been
+        # translated (e.g. a file with CRLF newlines opened in "rU" mode)
+        readline = handle.readline
+        tell = handle.tell
+        while True:
+            offset = tell()
+            line = readline()
+            if not line:
+                break
+            start = line[:3]
+            if start == "RD ":
+                if contig is None:
+                    raise ValueError("RD line before the first CO line")
+                contig._read_offsets.append(offset)
+            elif start == "CO ":
+                contig = LazyContig(self, line, offset)
+                self._names[contig.name] = len(self.contigs)
+                self.contigs.append(contig)
+            elif start in ("CT{", "RT{", "WA{", "WR{"):
+                _read_tag(handle, line, self)
+
+    def __len__(self):
+        return len(self.contigs)
+
+    def __iter__(self):
+        return iter(self.contigs)
+
+    def __getitem__(self, name):
+        return self.contigs[self._names[name]]
+
+    def keys(self):
+        return [contig.name for contig in self.contigs]
+
+    def _read_contig(self, contig):
+        handle = self._handle
+        handle.seek(contig._offset)
+        handle.readline()
+        contig.sequence = "".join(_read_block(handle))
+        line = _next_line(handle)
+        if not line.startswith("BQ"):
+            raise ValueError("Failed to find BQ line")
+        contig.quality = array.array('B',
+                             map(int, " ".join(_read_block(handle)).split()))
+        contig.af = []
+        contig.bs = []
+        line = _next_line(handle)
+        while line.startswith("AF "):
+            contig.af.append(af(line))
+            line = handle.readline()
+        if not line.strip():
+            line = _next_line(handle)
+        while line.startswith("BS "):
+            contig.bs.append(bs(line))
+            line = handle.readline()
+
+    def _read_read(self, offset):
+        handle = self._handle
+        handle.seek(offset)
+        read = Reads(handle.readline())
+        read.rd.sequence = "".join(_read_block(handle))
+        line = _next_line(handle)
+        if not line.startswith("QA "):
+            raise ValueError("Failed to find QA line")
+        read.qa = qa(line)
+        line = _next_line(handle)
+        if line.startswith("DS "):
+            read.ds = ds(line)
+        read.rt = self._rt.get(read.rd.name)
+        read.wr = self._wr.get(read.rd.name)
+        return read
+
+def index(handle):
+    """Index an ACE file in one pass, returning an AceIndex.
+
+    handle - a seekable file-like object, which must stay open while the
+             contigs are used
+
+    Only the positions of the contigs and reads (and any WA, CT, RT and
+    WR tags) are kept in memory, the contig and read data are read from
+    the file when used.
+    """
+    return AceIndex(handle)
+
 #### Everything below is deprecated
     
 from Bio import File
@@ -700,26 +963,26 @@ class _Scanner:
     def _scan_bq_data(self, uhandle, consumer):
         """Scans multiple lines of quality data and concatenates them."""
         
-        qual=''
+        qual=[]
         while 1:
             line=uhandle.readline()
             if is_blank_line(line):
                 uhandle.saveline(line)
                 break
-            qual+=' '+line
-        return qual
+            qual.append(line)
+        return ' '.join(qual)
    
     def _scan_sequence_data(self,uhandle):
         """Scans multiple lines of sequence data and concatenates them."""
         
-        seq=''
+        seq=[]
         while 1:
             line=uhandle.readline()
             if is_blank_line(line):
                 uhandle.saveline(line)
                 break
-            seq+=line.strip()
-        return seq
+            seq.append(line.strip())
+        return ''.join(seq)
      
     def _scan_bracket_tags(self,uhandle):
         """Reads the data lines of a {} tag."""
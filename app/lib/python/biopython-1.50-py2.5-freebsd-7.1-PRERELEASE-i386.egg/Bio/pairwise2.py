@@ -94,6 +94,19 @@ localds(sequenceA, sequenceB, match_dict, open, extend) -> alignments
 #   value of the function is the score.
 # - one_alignment_only: boolean
 #   Only recover one alignment.
+# - linear_space: boolean
+#   Use a divide and conquer (Hirschberg style) dynamic programming
+#   algorithm which only holds a few rows of the matrices at a time,
+#   rather than the full score and traceback matrices.  Only recovers
+#   one alignment.  Requires NumPy and affine gap penalties.
+# - band: integer
+#   Only fill in the cells of the matrices within this distance of the
+#   diagonal(s) joining the two corners (banded alignment).  Only
+#   recovers one alignment.  Requires NumPy and affine gap penalties.
+# - memory_report: dictionary
+#   If given, this is filled in with the number of dynamic programming
+#   cells held in memory at once ("cells"), and for the linear_space and
+#   band modes, an estimate of the bytes used for them ("bytes").
 
 from types import *
 
@@ -240,7 +253,10 @@ alignment occurs.
                 ('gap_char', '-'),
                 ('force_generic', 0),
                 ('score_only', 0),
-                ('one_alignment_only', 0)
+                ('one_alignment_only', 0),
+                ('linear_space', 0),
+                ('band', None),
+                ('memory_report', None),
                 ]
             for name, default in default_params:
                 keywds[name] = keywds.get(name, default)
@@ -258,10 +274,44 @@ align = align()
 def _align(sequenceA, sequenceB, match_fn, gap_A_fn, gap_B_fn,
            penalize_extend_when_opening, penalize_end_gaps,
            align_globally, gap_char, force_generic, score_only,
-           one_alignment_only):
+           one_alignment_only, linear_space=0, band=None,
+           memory_report=None):
     if not sequenceA or not sequenceB:
         return []
 
+    if linear_space or band is not None:
+        if not (type(gap_A_fn) is InstanceType and \
+                gap_A_fn.__class__ is affine_penalty and \
+                type(gap_B_fn) is InstanceType and \
+                gap_B_fn.__class__ is affine_penalty):
+            raise ValueError("The linear_space and band modes need " \
+                             "affine gap penalties")
+        aligner = _AffineAligner(
+            sequenceA, sequenceB, match_fn,
+            gap_A_fn.open, gap_A_fn.extend, gap_B_fn.open, gap_B_fn.extend,
+            penalize_extend_when_opening, penalize_end_gaps, band)
+        if align_globally:
+            x = aligner.align_global(score_only, gap_char)
+        else:
+            x = aligner.align_local(score_only, gap_char)
+        if memory_report is not None:
+            memory_report["cells"] = aligner.peak_cells
+            memory_report["bytes"] = aligner.peak_bytes
+        if score_only:
+            return x
+        seqA, seqB, score, begin, end = x
+        if isinstance(sequenceA, str) and isinstance(sequenceB, str) \
+        and isinstance(gap_char, str):
+            seqA, seqB = "".join(seqA), "".join(seqB)
+        else:
+            seqA = reduce(lambda x, y: x + y, seqA, sequenceA[0:0])
+            seqB = reduce(lambda x, y: x + y, seqB, sequenceB[0:0])
+        return [(seqA, seqB, score, begin, end)]
+    if memory_report is not None:
+        #Full score and traceback matrices
+        memory_report["cells"] = 2 * len(sequenceA) * len(sequenceB)
+        memory_report["bytes"] = None
+
     if (not force_generic) and \
        type(gap_A_fn) is InstanceType and \
        gap_A_fn.__class__ is affine_penalty and \
@@ -531,6 +581,346 @@ def _make_score_matrix_fast(
                     
     return score_matrix, trace_matrix
     
+# States used by the linear_space and band modes.  The alignment is
+# built up from columns pairing two residues (M), a residue in sequenceA
+# against a gap (X) and a gap against a residue in sequenceB (Y).  As in
+# the score matrices above, a gap in one sequence is never directly
+# followed by a gap in the other.
+_M, _X, _Y = 0, 1, 2
+
+class _AffineAligner:
+    """Row by row dynamic programming using NumPy (PRIVATE).
+
+    This scores alignments exactly as _make_score_matrix_fast does, but
+    only holds the current and previous rows of the matrices (one row
+    per state).  Cell (i, j) of a row is the best score for aligning
+    sequenceA[:i] with sequenceB[:j] ending in that state.
+
+    One best alignment is recovered either by divide and conquer
+    (Hirschberg style: find the column and state where the best path
+    leaves the middle row, then align each half the same way), or for
+    banded alignments by keeping the traceback for the band only.
+    """
+    # Boxes with fewer cells than this are aligned with a full traceback.
+    small = 10000
+
+    def __init__(self, sequenceA, sequenceB, match_fn,
+                 open_A, extend_A, open_B, extend_B,
+                 penalize_extend_when_opening, penalize_end_gaps, band):
+        import numpy
+        self.numpy = numpy
+        self.sequenceA, self.sequenceB = sequenceA, sequenceB
+        self.lenA, self.lenB = len(sequenceA), len(sequenceB)
+        self.penalize_end_gaps = penalize_end_gaps
+        self.band = band
+        self.peak_cells, self.peak_bytes = 0, 0
+
+        # Turn the residues into integer codes, and the match function
+        # into a table of scores between those codes.
+        codes = {}
+        residues = []
+        for seq in (sequenceA, sequenceB):
+            for residue in seq:
+                if residue not in codes:
+                    codes[residue] = len(residues)
+                    residues.append(residue)
+        self.codesA = numpy.array([codes[r] for r in sequenceA], numpy.int32)
+        self.codesB = numpy.array([codes[r] for r in sequenceB], numpy.int32)
+        table = numpy.zeros((len(residues), len(residues)), numpy.float64)
+        for i in range(len(residues)):
+            for j in range(len(residues)):
+                table[i, j] = match_fn(residues[i], residues[j])
+        self.table = table
+
+        # A Y column (gap in sequenceA) always lies along a row, and an X
+        # column (gap in sequenceB) down a column, so end gaps are those
+        # in the first or last row (Y) or column (X).
+        self.first_A = calc_affine_penalty(1, open_A, extend_A,
+                                           penalize_extend_when_opening)
+        self.extend_A = extend_A
+        self.first_B = calc_affine_penalty(1, open_B, extend_B,
+                                           penalize_extend_when_opening)
+        self.extend_B = extend_B
+
+    def _gap_costs_Y(self, row):
+        if not self.penalize_end_gaps and row in (0, self.lenA):
+            return 0, 0
+        return self.first_A, self.extend_A
+
+    def _gap_costs_X(self, b0, b1):
+        numpy = self.numpy
+        open_X = numpy.zeros(b1-b0+1) + self.first_B
+        extend_X = numpy.zeros(b1-b0+1) + self.extend_B
+        if not self.penalize_end_gaps:
+            if b0 == 0:
+                open_X[0] = extend_X[0] = 0
+            if b1 == self.lenB:
+                open_X[-1] = extend_X[-1] = 0
+        return open_X, extend_X
+
+    def _window(self, row, a0, b0, b1):
+        # Columns (relative to b0) to fill in for this row (relative to
+        # a0), for banded alignments those near the corner to corner
+        # diagonals of the full matrix.
+        if self.band is None:
+            return 0, b1 - b0
+        diff = self.lenB - self.lenA
+        lo = a0 + row + min(0, diff) - self.band - b0
+        hi = a0 + row + max(0, diff) + self.band - b0
+        return max(0, lo), min(b1 - b0, hi)
+
+    def _scan_Y(self, M, Y, lo, hi, open_Y, extend_Y):
+        # Fill in Y[lo+1:hi+1], where Y[j] = max(M[j-1] + open_Y,
+        # Y[j-1] + extend_Y), in one go using a running maximum.  Returns
+        # the column each gap was opened from (lo may mean Y[lo] itself,
+        # if from_first), or None for an empty window.
+        numpy = self.numpy
+        if hi <= lo:
+            return None, False
+        k = numpy.arange(lo, hi)
+        D = M[lo:hi] + open_Y - (k+1)*extend_Y
+        from_first = Y[lo] - lo*extend_Y > D[0]
+        if from_first:
+            D[0] = Y[lo] - lo*extend_Y
+        run = numpy.maximum.accumulate(D)
+        Y[lo+1:hi+1] = (k+1)*extend_Y + run
+        source = numpy.maximum.accumulate(numpy.where(D == run, k, lo))
+        return source, from_first
+
+    def _fill(self, a0, a1, b0, b1, state_in, trace=0, cross_row=None,
+              local=0):
+        """Fills in the rows of a box, returns (M, X, Y, extra).
+
+        The box covers sequenceA[a0:a1] and sequenceB[b0:b1], and paths
+        enter its top left corner in state_in.  M, X and Y are the last
+        row.  extra is the traceback for each row (if trace), the column
+        and state where the best path into each cell of the last row
+        left cross_row (if cross_row, as 3*column+state), or for local
+        alignments the best score and its end and start residue pairs.
+        """
+        numpy = self.numpy
+        NEG = -numpy.inf
+        m = b1 - b0
+        open_X, extend_X = self._gap_costs_X(b0, b1)
+        M, X, Y = numpy.empty(m+1), numpy.empty(m+1), numpy.empty(m+1)
+        M.fill(NEG); X.fill(NEG); Y.fill(NEG)
+        [M, X, Y][state_in][0] = 0
+        lo, hi = self._window(0, a0, b0, b1)
+        open_Y, extend_Y = self._gap_costs_Y(a0)
+        self._scan_Y(M, Y, lo, hi, open_Y, extend_Y)
+
+        tracebacks = []
+        cells = 3 * 2 * (m+1)
+        trace_cells = 0
+        if trace:
+            # The first row can only hold Y columns.
+            tracebacks.append((lo, 1, None, None,
+                               M[lo:hi] + open_Y >= Y[lo:hi] + extend_Y))
+        payload = None
+        if local or cross_row is not None:
+            payload = [numpy.zeros(m+1, numpy.int64) - 1 for s in range(3)]
+            effective_M = payload[_M]
+            cells += 3 * 2 * (m+1)
+        best = (NEG, None, None)
+
+        for row in range(1, a1 - a0 + 1):
+            lo, hi = self._window(row, a0, b0, b1)
+            mlo = max(lo, 1)
+            prevM, prevX, prevY = M, X, Y
+            M, X, Y = numpy.empty(m+1), numpy.empty(m+1), numpy.empty(m+1)
+            if self.band is not None:
+                M.fill(NEG); X.fill(NEG); Y.fill(NEG)
+            else:
+                M[0] = Y[0] = NEG
+            # M: pair sequenceA[a0+row-1] with sequenceB[b0+j-1]
+            from_M = None
+            if hi >= mlo:
+                scores = self.table[self.codesA[a0+row-1],
+                                    self.codesB[b0+mlo-1:b0+hi]]
+                before_M = prevM[mlo-1:hi]
+                before_X = prevX[mlo-1:hi]
+                before = numpy.maximum(numpy.maximum(before_M, before_X),
+                                       prevY[mlo-1:hi])
+                if trace or (payload is not None and \
+                             (local or row > cross_row - a0)):
+                    # Preferring M, then X, then Y on ties
+                    from_M = numpy.where(before_M == before, _M,
+                             numpy.where(before_X == before, _X, _Y))
+                    from_M = from_M.astype(numpy.uint8)
+                M[mlo:hi+1] = scores + before
+                if local and a0 + row > 1 and hi >= 2:
+                    # As in _make_score_matrix_fast, scores away from the
+                    # first row and column are never below zero.
+                    start = max(mlo, 2)
+                    numpy.maximum(M[start:hi+1], 0, M[start:hi+1])
+            # X: sequenceA[a0+row-1] against a gap
+            opened = prevM[lo:hi+1] + open_X[lo:hi+1]
+            extended = prevX[lo:hi+1] + extend_X[lo:hi+1]
+            from_X = opened >= extended
+            X[lo:hi+1] = numpy.where(from_X, opened, extended)
+            # Y: a gap against sequenceB[b0+j-1], along the row
+            open_Y, extend_Y = self._gap_costs_Y(a0 + row)
+            source, from_first = self._scan_Y(M, Y, lo, hi,
+                                              open_Y, extend_Y)
+
+            if trace:
+                tracebacks.append((lo, mlo, from_M, from_X,
+                                   M[lo:hi] + open_Y >= Y[lo:hi] + extend_Y))
+                trace_cells += 3 * (hi - lo + 1)
+            if payload is not None and (local or row > cross_row - a0):
+                here = None
+                if local:
+                    here = (a0 + row - 1) * (self.lenB + 1) \
+                           + b0 + numpy.arange(mlo, hi+1) - 1
+                payload, effective_M = self._carry(
+                    payload, effective_M, lo, hi, mlo, from_M, from_X,
+                    source, from_first, M, here)
+            if cross_row is not None and row == cross_row - a0:
+                columns = numpy.arange(m+1, dtype=numpy.int64) * 3
+                payload = [columns + _M, columns + _X, columns + _Y]
+                effective_M = payload[_M]
+            if local and hi >= mlo:
+                j = mlo + M[mlo:hi+1].argmax()
+                if M[j] > best[0]:
+                    best = (M[j], (a0+row-1, b0+j-1), payload[_M][j])
+
+        # Rows of floats and integers, one byte per traceback entry
+        self.peak_cells = max(self.peak_cells, cells + trace_cells)
+        self.peak_bytes = max(self.peak_bytes, 8 * cells + trace_cells)
+        if trace:
+            return M, X, Y, tracebacks
+        if local:
+            return M, X, Y, best
+        return M, X, Y, payload
+
+    def _carry(self, payload, effective_M, lo, hi, mlo, from_M, from_X,
+               source, from_first, M, here):
+        # Pass each cell's payload along the best path into it.  For
+        # local alignments, the payload is the first residue pair of the
+        # path, and a path only carries on from a pair scoring above
+        # zero (otherwise the next pair starts a new one).
+        numpy = self.numpy
+        prevM, prevX, prevY = payload
+        newM = numpy.zeros(len(prevM), numpy.int64) - 1
+        newX = newM.copy()
+        newY = newM.copy()
+        if from_M is not None:
+            picked = numpy.choose(from_M, [effective_M[mlo-1:hi],
+                                           prevX[mlo-1:hi], prevY[mlo-1:hi]])
+            if here is not None:
+                picked = numpy.where(picked == -1, here, picked)
+            newM[mlo:hi+1] = picked
+        if here is not None:
+            new_effective_M = numpy.where(M > 0, newM, -1)
+        else:
+            new_effective_M = newM
+        newX[lo:hi+1] = numpy.where(from_X, effective_M[lo:hi+1],
+                                    prevX[lo:hi+1])
+        if source is not None:
+            newY[lo+1:hi+1] = new_effective_M[source]
+            if from_first:
+                newY[lo+1:hi+1][source == lo] = newY[lo]
+        return [newM, newX, newY], new_effective_M
+
+    def _traceback(self, tracebacks, row, col, state):
+        # Follow the traceback from the bottom right corner of the box,
+        # returns the list of column states from the top left corner.
+        states = []
+        while row or col:
+            states.append(state)
+            lo, mlo, from_M, from_X, from_Y = tracebacks[row]
+            if state == _M:
+                state = from_M[col-mlo]
+                row, col = row-1, col-1
+            elif state == _X:
+                if not from_X[col-lo]:
+                    state = _X
+                else:
+                    state = _M
+                row -= 1
+            else:
+                if not from_Y[col-1-lo]:
+                    state = _Y
+                else:
+                    state = _M
+                col -= 1
+        states.reverse()
+        return states
+
+    def _best_state(self, M, X, Y, state_out):
+        if state_out is None:
+            ends = [M[-1], X[-1], Y[-1]]
+            state_out = ends.index(max(ends))
+        return state_out, [M, X, Y][state_out][-1]
+
+    def _path(self, a0, a1, b0, b1, state_in, state_out):
+        # Returns the best score and its column states through the box,
+        # entering in state_in and leaving in state_out (None for any).
+        n, m = a1 - a0, b1 - b0
+        if self.band is not None or n < 2 or (n+1)*(m+1) <= self.small:
+            M, X, Y, tracebacks = self._fill(a0, a1, b0, b1, state_in,
+                                             trace=1)
+            state_out, score = self._best_state(M, X, Y, state_out)
+            return score, self._traceback(tracebacks, n, m, state_out)
+        middle = a0 + n // 2
+        M, X, Y, payload = self._fill(a0, a1, b0, b1, state_in,
+                                      cross_row=middle)
+        state_out, score = self._best_state(M, X, Y, state_out)
+        col, state = divmod(int(payload[state_out][-1]), 3)
+        top = self._path(a0, middle, b0, b0+col, state_in, state)[1]
+        bottom = self._path(middle, a1, b0+col, b1, state, state_out)[1]
+        return score, top + bottom
+
+    def _pieces(self, states, a0, b0, gap_char):
+        # Turn column states into lists of pieces of the two sequences.
+        seqA, seqB = [], []
+        i, j = a0, b0
+        for state in states:
+            if state == _Y:
+                seqA.append(gap_char)
+            else:
+                seqA.append(self.sequenceA[i:i+1])
+                i += 1
+            if state == _X:
+                seqB.append(gap_char)
+            else:
+                seqB.append(self.sequenceB[j:j+1])
+                j += 1
+        return seqA, seqB
+
+    def align_global(self, score_only, gap_char):
+        if score_only:
+            M, X, Y, payload = self._fill(0, self.lenA, 0, self.lenB, _M)
+            return float(self._best_state(M, X, Y, None)[1])
+        score, states = self._path(0, self.lenA, 0, self.lenB, _M, None)
+        seqA, seqB = self._pieces(states, 0, 0, gap_char)
+        return seqA, seqB, float(score), 0, len(seqA)
+
+    def align_local(self, score_only, gap_char):
+        M, X, Y, best = self._fill(0, self.lenA, 0, self.lenB, _M, local=1)
+        score, (endA, endB), start = best
+        if score_only:
+            return float(score)
+        startA, startB = divmod(int(start), self.lenB + 1)
+        # The best path must end with the residue pair at its end.
+        states = self._path(startA, endA+1, startB, endB+1, _M, _M)[1]
+        seqA, seqB = self._pieces(states, startA, startB, gap_char)
+        # As for the other local alignments, show the full sequences with
+        # the parts before and after the aligned region.
+        prefixA = [self.sequenceA[i:i+1] for i in range(startA)]
+        prefixB = [self.sequenceB[j:j+1] for j in range(startB)]
+        pad = len(prefixA) - len(prefixB)
+        prefixA = [gap_char] * -pad + prefixA
+        prefixB = [gap_char] * pad + prefixB
+        suffixA = [self.sequenceA[i:i+1] for i in range(endA+1, self.lenA)]
+        suffixB = [self.sequenceB[j:j+1] for j in range(endB+1, self.lenB)]
+        pad = len(suffixA) - len(suffixB)
+        suffixA = suffixA + [gap_char] * -pad
+        suffixB = suffixB + [gap_char] * pad
+        begin = len(prefixA)
+        return prefixA + seqA + suffixA, prefixB + seqB + suffixB, \
+               float(score), begin, begin + len(seqA)
+
 def _recover_alignments(sequenceA, sequenceB, starts,
                         score_matrix, trace_matrix, align_globally,
                         penalize_end_gaps, gap_char, one_alignment_only):
@@ -14,6 +14,7 @@ database, and is compatible with the BioSQL standards.
 import BioSeq
 import Loader
 import DBUtils
+import Taxonomy
 
 def open_database(driver = "MySQLdb", **kwargs):
     """Main interface for loading a existing BioSQL-style database.
@@ -146,6 +147,21 @@ class DBServer:
             raise ValueError("Module %s not supported by the loader." %
                     (self.module_name))
 
+    def load_ncbi_taxonomy(self, nodes_file, names_file):
+        """Load the NCBI taxonomy into the taxon and taxon_name tables.
+
+        nodes_file and names_file are the paths to the nodes.dmp and
+        names.dmp files from the NCBI taxonomy dump (taxdump.tar.gz).
+        See BioSQL.Taxonomy for details.  Returns the number of taxa.
+        """
+        nodes = open(nodes_file)
+        names = open(names_file)
+        try:
+            return Taxonomy.load_ncbi_taxonomy(self.adaptor, nodes, names)
+        finally:
+            nodes.close()
+            names.close()
+
     def commit(self):
         """Commits the current transaction to the database."""
         return self.adaptor.commit()
@@ -167,6 +183,10 @@ class Adaptor:
     def last_id(self, table):
         return self.dbutils.last_id(self.cursor, table)
 
+    def reset_id(self, table):
+        """Make new rows get ids after any inserted explicitly."""
+        return self.dbutils.reset_id(self.cursor, table)
+
     def autocommit(self, y=True):
         """Set the autocommit mode. True values enable; False value disable."""
         return self.dbutils.autocommit(self.conn, y)
@@ -307,6 +327,10 @@ class Adaptor:
                      from biosequence where bioentry_id = %s""",
             (start+1, length, seqid))[0]
 
+    def executemany(self, sql, args_list):
+        """Execute the SQL once for each tuple of arguments in the list."""
+        self.cursor.executemany(sql, args_list)
+
     def execute_and_fetch_col0(self, sql, args=None):
         self.cursor.execute(sql, args or ())
         return [field[0] for field in self.cursor.fetchall()]
@@ -325,6 +349,17 @@ _allowed_lookups = {
     'version':    "fetch_seqid_by_version",
     }
 
+def _batches(record_iterator, size):
+    """Iterate over lists of (up to) size records (PRIVATE)."""
+    batch = []
+    for record in record_iterator :
+        batch.append(record)
+        if len(batch) == size :
+            yield batch
+            batch = []
+    if batch :
+        yield batch
+
 class BioSeqDatabase:
     def __init__(self, adaptor, name):
         self.adaptor = adaptor
@@ -437,7 +472,14 @@ class BioSeqDatabase:
         db_loader = Loader.DatabaseLoader(self.adaptor, self.dbid, \
                                           fetch_NCBI_taxonomy)
         num_records = 0
-        for cur_record in record_iterator :
-            num_records += 1
-            db_loader.load_seqrecord(cur_record)
+        if fetch_NCBI_taxonomy :
+            #Fetch the taxonomy for a batch of records at a time
+            batches = _batches(record_iterator, 1000)
+        else :
+            batches = ([record] for record in record_iterator)
+        for batch in batches :
+            db_loader.prefetch_taxonomy(batch)
+            for cur_record in batch :
+                num_records += 1
+                db_loader.load_seqrecord(cur_record)
         return num_records
@@ -38,6 +38,11 @@ class Generic_dbutils:
         # Let's hope it was not really needed
         pass
 
+    def reset_id(self, cursor, table):
+        # Called after inserting rows with explicit ids; nothing to do
+        # where the next id always follows the largest (as in MySQL)
+        pass
+
 class Mysql_dbutils(Generic_dbutils):
     def last_id(self, cursor, table):
         try :
@@ -66,6 +71,13 @@ class Psycopg_dbutils(Generic_dbutils):
         rv = cursor.fetchone()
         return rv[0]
 
+    def reset_id(self, cursor, table):
+        # Move the sequence past rows inserted with explicit ids
+        table = self.tname(table)
+        sql = r"select setval('%s_pk_seq', (select max(%s_id) from %s))" \
+              % (table, table, table)
+        cursor.execute(sql)
+
     def autocommit(self, conn, y = True):
         conn.autocommit(y)
 
@@ -97,6 +109,13 @@ class Pgdb_dbutils(Generic_dbutils):
         rv = cursor.fetchone()
         return rv[0]
 
+    def reset_id(self, cursor, table):
+        # Move the sequence past rows inserted with explicit ids
+        table = self.tname(table)
+        sql = r"select setval('%s_pk_seq', (select max(%s_id) from %s))" \
+              % (table, table, table)
+        cursor.execute(sql)
+
     def autocommit(self, conn, y = True):
         raise NotImplementedError("pgdb does not support this!")
 
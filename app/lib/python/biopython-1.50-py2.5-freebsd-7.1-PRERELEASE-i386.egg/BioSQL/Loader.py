@@ -43,6 +43,56 @@ class DatabaseLoader:
         self.adaptor = adaptor
         self.dbid = dbid
         self.fetch_NCBI_taxonomy = fetch_NCBI_taxonomy
+        #NCBI taxonomy records fetched ahead by prefetch_taxonomy,
+        #keyed by NCBI taxon id (as a string)
+        self._taxonomy = {}
+        #Taxon ids (database keys) keyed by NCBI taxon id (as an integer),
+        #see _get_taxon_id_from_map
+        self._taxon_ids = None
+
+    def _get_taxon_id_from_map(self, ncbi_taxon_id):
+        """Get the taxon id for an NCBI taxon ID, or None if missing (PRIVATE).
+
+        Rather than one SELECT for each record, the whole mapping of NCBI
+        taxon ids to taxon ids in the taxon table is read into memory when
+        first needed, and kept up to date as taxa are added by this loader.
+        Taxa added by anything else in the meantime are not seen.
+        """
+        if self._taxon_ids is None :
+            self._taxon_ids = {}
+            for taxon, taxon_id in self.adaptor.execute_and_fetchall(
+                "SELECT ncbi_taxon_id, taxon_id FROM taxon" \
+                " WHERE ncbi_taxon_id IS NOT NULL") :
+                self._taxon_ids[int(taxon)] = taxon_id
+        return self._taxon_ids.get(int(ncbi_taxon_id))
+
+    def prefetch_taxonomy(self, records):
+        """Fetch the NCBI taxonomy for a batch of SeqRecords in one go.
+
+        Rather than one Entrez query for each new species when each record
+        is loaded, the taxonomy of all the species in the records which
+        are not yet in the taxon table is fetched with a few batched
+        queries, and kept until the records are loaded.
+
+        Does nothing unless the fetch_NCBI_taxonomy flag is set.
+        """
+        if not self.fetch_NCBI_taxonomy :
+            return
+        wanted = []
+        for record in records :
+            ncbi_taxon_id = self._get_ncbi_taxon_id(record)
+            if not ncbi_taxon_id :
+                continue
+            ncbi_taxon_id = str(ncbi_taxon_id)
+            if ncbi_taxon_id in self._taxonomy or ncbi_taxon_id in wanted :
+                continue
+            if self._get_taxon_id_from_map(ncbi_taxon_id) is None :
+                wanted.append(ncbi_taxon_id)
+        if not wanted :
+            return
+        for taxonomic_record in Entrez.efetch_records(db="taxonomy",
+                                                      ids=wanted) :
+            self._taxonomy[str(taxonomic_record["TaxId"])] = taxonomic_record
     
     def load_seqrecord(self, record):
         """Load a Biopython SeqRecord into the database.
@@ -125,28 +175,11 @@ class DatabaseLoader:
            " VALUES (%s, %s, %s)", (dbname, accession, version))
        return self.adaptor.last_id("dbxref")
            
-    def _get_taxon_id(self, record):
-        """Get the taxon id for this record (PRIVATE).
+    def _get_ncbi_taxon_id(self, record):
+        """Get the NCBI taxon ID for this record, or None (PRIVATE).
 
         record - a SeqRecord object
-
-        This searches the taxon/taxon_name tables using the
-        NCBI taxon ID, scientific name and common name to find
-        the matching taxon table entry's id.
-        
-        If the species isn't in the taxon table, and we have at
-        least the NCBI taxon ID, scientific name or common name,
-        at least a minimal stub entry is created in the table.
-
-        Returns the taxon id (database key for the taxon table,
-        not an NCBI taxon ID), or None if the taxonomy information
-        is missing.
-
-        See also the BioSQL script load_ncbi_taxonomy.pl which
-        will populate and update the taxon/taxon_name tables
-        with the latest information from the NCBI.
         """
-        
         # To find the NCBI taxid, first check for a top level annotation
         ncbi_taxon_id = None
         if "ncbi_taxid" in record.annotations :
@@ -167,6 +200,30 @@ class DatabaseLoader:
                                 ncbi_taxon_id = int(db_xref[6:])
                                 break
                 if ncbi_taxon_id: break
+        return ncbi_taxon_id
+
+    def _get_taxon_id(self, record):
+        """Get the taxon id for this record (PRIVATE).
+
+        record - a SeqRecord object
+
+        This searches the taxon/taxon_name tables using the
+        NCBI taxon ID, scientific name and common name to find
+        the matching taxon table entry's id.
+        
+        If the species isn't in the taxon table, and we have at
+        least the NCBI taxon ID, scientific name or common name,
+        at least a minimal stub entry is created in the table.
+
+        Returns the taxon id (database key for the taxon table,
+        not an NCBI taxon ID), or None if the taxonomy information
+        is missing.
+
+        See also the BioSQL script load_ncbi_taxonomy.pl which
+        will populate and update the taxon/taxon_name tables
+        with the latest information from the NCBI.
+        """
+        ncbi_taxon_id = self._get_ncbi_taxon_id(record)
 
         try :
             scientific_name = record.annotations["organism"][:255]
@@ -350,12 +407,10 @@ class DatabaseLoader:
         """
         assert ncbi_taxon_id
 
-        taxon_id = self.adaptor.execute_and_fetch_col0(
-            "SELECT taxon_id FROM taxon WHERE ncbi_taxon_id = %s",
-            (ncbi_taxon_id,))
-        if taxon_id:
+        taxon_id = self._get_taxon_id_from_map(ncbi_taxon_id)
+        if taxon_id is not None:
             #Good, we have mapped the NCBI taxid to a taxon table entry
-            return taxon_id[0]
+            return taxon_id
 
         # At this point, as far as we can tell, this species isn't
         # in the taxon table already.  So we'll have to add it.
@@ -372,8 +427,12 @@ class DatabaseLoader:
         
         if self.fetch_NCBI_taxonomy :
             #Go online to get the parent taxon ID!
-            handle = Entrez.efetch(db="taxonomy",id=ncbi_taxon_id,retmode="XML")
-            taxonomic_record = Entrez.read(handle)
+            if str(ncbi_taxon_id) in self._taxonomy :
+                #Already fetched by prefetch_taxonomy
+                taxonomic_record = [self._taxonomy.pop(str(ncbi_taxon_id))]
+            else :
+                handle = Entrez.efetch(db="taxonomy",id=ncbi_taxon_id,retmode="XML")
+                taxonomic_record = Entrez.read(handle)
             if len(taxonomic_record) == 1:
                 assert taxonomic_record[0]["TaxId"] == str(ncbi_taxon_id), \
                        "%s versus %s" % (taxonomic_record[0]["TaxId"],
@@ -422,6 +481,7 @@ class DatabaseLoader:
                                                      None,
                                                      None))
         taxon_id = self.adaptor.last_id("taxon")
+        self._taxon_ids[int(ncbi_taxon_id)] = taxon_id
 
         #Record the scientific name, common name, etc
         for name_class, name in species_names :
@@ -450,17 +510,11 @@ class DatabaseLoader:
         ncbi_taxon_id = taxonomic_lineage[-1]["TaxId"]
 
         #Is this in the database already?  Check the taxon table...
-        taxon_id = self.adaptor.execute_and_fetch_col0(
-            "SELECT taxon_id FROM taxon" \
-            " WHERE ncbi_taxon_id=%s" % ncbi_taxon_id)
-        if taxon_id:
+        taxon_id = self._get_taxon_id_from_map(ncbi_taxon_id)
+        if taxon_id is not None:
             # we could verify that the Scientific Name etc in the database
             # is the same and update it or print a warning if not...
-            if isinstance(taxon_id, list) :
-                assert len(taxon_id)==1
-                return taxon_id[0]
-            else :
-                return taxon_id
+            return taxon_id
 
         #We have to record this.
         if len(taxonomic_lineage) > 1 :
@@ -477,6 +531,7 @@ class DatabaseLoader:
                 " VALUES (%s, %s, %s)", (ncbi_taxon_id, parent_taxon_id, rank))
         taxon_id = self.adaptor.last_id("taxon")
         assert isinstance(taxon_id, int) or isinstance(taxon_id, long), repr(taxon_id)
+        self._taxon_ids[int(ncbi_taxon_id)] = taxon_id
         # ... and its name in taxon_name
         scientific_name = taxonomic_lineage[-1].get("ScientificName", None)
         if scientific_name :
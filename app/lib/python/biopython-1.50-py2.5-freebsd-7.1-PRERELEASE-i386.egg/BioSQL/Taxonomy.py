@@ -0,0 +1,192 @@
+# This code is part of the Biopython distribution and governed by its
+# license.  Please see the LICENSE file that should have been included
+# as part of this package.
+#
+# Note that BioSQL (including the database schema and scripts) is
+# available and licensed separately.  Please consult www.biosql.org
+
+"""Load the NCBI taxonomy into the taxon tables of a BioSQL database.
+
+This does the job of the BioSQL script load_ncbi_taxonomy.pl: the
+nodes.dmp and names.dmp files of the NCBI taxonomy dump (from
+ftp://ftp.ncbi.nih.gov/pub/taxonomy/taxdump.tar.gz) are read into memory,
+the nested set values (left_value and right_value) of the whole tree are
+calculated in one pass, and the taxon and taxon_name tables are filled
+with bulk inserts.  You shouldn't normally need this module directly,
+rather call the load_ncbi_taxonomy() method of a DBServer object:
+
+from BioSQL import BioSeqDatabase
+server = BioSeqDatabase.open_database(driver="MySQLdb", user="root",
+                                      passwd="", host="localhost",
+                                      db="bioseqdb")
+server.load_ncbi_taxonomy("nodes.dmp", "names.dmp")
+server.commit()
+"""
+
+#Number of rows sent to the database at a time
+BATCH_SIZE = 10000
+
+def _fields(line):
+    """Split a line of an NCBI taxonomy dump file into fields (PRIVATE)."""
+    return line.rstrip("\n").rstrip("\t|").split("\t|\t")
+
+def read_nodes(handle):
+    """Read the nodes.dmp file of an NCBI taxonomy dump.
+
+    Returns a dictionary mapping each NCBI taxon id (an integer) to a
+    tuple of the parent's NCBI taxon id, the rank, the genetic code and
+    the mitochondrial genetic code.
+    """
+    nodes = {}
+    for line in handle:
+        fields = _fields(line)
+        nodes[int(fields[0])] = (int(fields[1]), fields[2],
+                                 fields[6], fields[8])
+    return nodes
+
+def read_names(handle):
+    """Iterate over the names in the names.dmp file of an NCBI taxonomy dump.
+
+    Returns tuples of the NCBI taxon id (an integer), the name and the name
+    class (e.g. "scientific name").
+    """
+    for line in handle:
+        fields = _fields(line)
+        yield int(fields[0]), fields[1], fields[3]
+
+def nested_set(nodes):
+    """Calculate the nested set values for a taxonomy tree.
+
+    nodes is a dictionary mapping NCBI taxon ids to tuples starting with
+    the parent's id, as returned by read_nodes.  Nodes which are their own
+    parent (such as the root of the NCBI taxonomy), or whose parent is
+    missing, are taken as roots.
+
+    Returns two dictionaries mapping the NCBI taxon ids to their left and
+    right values, which are numbered in a depth first walk of the tree
+    (taking the children in order of their ids).
+    """
+    children = {}
+    roots = []
+    for taxon, node in nodes.iteritems():
+        parent = node[0]
+        if parent == taxon or parent not in nodes:
+            roots.append(taxon)
+        else:
+            children.setdefault(parent, []).append(taxon)
+    roots.sort()
+    for kids in children.itervalues():
+        kids.sort()
+
+    left = {}
+    right = {}
+    value = 1
+    for root in roots:
+        left[root] = value
+        value += 1
+        #Iterative rather than recursive, the tree can be very deep
+        stack = [(root, iter(children.get(root, ())))]
+        while stack:
+            taxon, kids = stack[-1]
+            for child in kids:
+                left[child] = value
+                value += 1
+                stack.append((child, iter(children.get(child, ()))))
+                break
+            else:
+                stack.pop()
+                right[taxon] = value
+                value += 1
+    return left, right
+
+def _in_batches(adaptor, sql, rows):
+    """Execute the SQL for all the rows, BATCH_SIZE at a time (PRIVATE)."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            adaptor.executemany(sql, batch)
+            batch = []
+    if batch:
+        adaptor.executemany(sql, batch)
+
+def load_ncbi_taxonomy(adaptor, nodes_handle, names_handle):
+    """Load the NCBI taxonomy into the taxon and taxon_name tables.
+
+    adaptor - the Adaptor of a BioSQL database connection
+    nodes_handle - handle to the nodes.dmp file
+    names_handle - handle to the names.dmp file
+
+    Taxa already in the taxon table (matched by NCBI taxon id) are updated
+    and have their names replaced, while new taxa are added with ids
+    following the largest one in the table, so that the parent of each
+    can be given as it is inserted.  The root of the tree gets no parent.
+    Returns the number of taxa in the dump.
+
+    The changes are not committed.
+    """
+    nodes = read_nodes(nodes_handle)
+    left, right = nested_set(nodes)
+
+    #Map the NCBI taxon ids to taxon ids (database keys), old and new
+    existing = {}
+    for ncbi_taxon_id, taxon_id in adaptor.execute_and_fetchall(
+        "SELECT ncbi_taxon_id, taxon_id FROM taxon" \
+        " WHERE ncbi_taxon_id IS NOT NULL"):
+        existing[int(ncbi_taxon_id)] = taxon_id
+    taxon_ids = existing.copy()
+    next_id = adaptor.execute_and_fetch_col0(
+        "SELECT MAX(taxon_id) FROM taxon")[0] or 0
+    new = [taxon for taxon in nodes if taxon not in existing]
+    new.sort()
+    for taxon in new:
+        next_id += 1
+        taxon_ids[taxon] = next_id
+
+    def parent_id(taxon):
+        parent = nodes[taxon][0]
+        if parent == taxon or parent not in nodes:
+            return None
+        return taxon_ids[parent]
+
+    #The nested set values must be unique, so clear the old ones first
+    adaptor.execute("UPDATE taxon SET left_value = NULL, right_value = NULL")
+    _in_batches(adaptor,
+        "INSERT INTO taxon(taxon_id, ncbi_taxon_id, parent_taxon_id," \
+        " node_rank, genetic_code, mito_genetic_code, left_value," \
+        " right_value) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+        ((taxon_ids[taxon], taxon, parent_id(taxon), nodes[taxon][1],
+          nodes[taxon][2], nodes[taxon][3], left[taxon], right[taxon]) \
+         for taxon in new))
+    if new:
+        adaptor.reset_id("taxon")
+    old = [taxon for taxon in existing if taxon in nodes]
+    _in_batches(adaptor,
+        "UPDATE taxon SET parent_taxon_id = %s, node_rank = %s," \
+        " genetic_code = %s, mito_genetic_code = %s, left_value = %s," \
+        " right_value = %s WHERE taxon_id = %s",
+        ((parent_id(taxon), nodes[taxon][1], nodes[taxon][2],
+          nodes[taxon][3], left[taxon], right[taxon], taxon_ids[taxon]) \
+         for taxon in old))
+
+    #Replace the names of the taxa we already had
+    _in_batches(adaptor, "DELETE FROM taxon_name WHERE taxon_id = %s",
+                ((existing[taxon],) for taxon in old))
+    def names():
+        #Skip repeated names, which would break the unique key.  The
+        #names of each taxon are on consecutive lines.
+        current = None
+        for taxon, name, name_class in read_names(names_handle):
+            if taxon not in nodes:
+                continue
+            if taxon != current:
+                current = taxon
+                seen = {}
+            # Note: The maximum length for taxon names in the schema is 255.
+            row = (taxon_ids[taxon], name[:255], name_class)
+            if row not in seen:
+                seen[row] = None
+                yield row
+    _in_batches(adaptor, "INSERT INTO taxon_name(taxon_id, name, name_class)" \
+                " VALUES (%s, %s, %s)", names())
+    return len(nodes)